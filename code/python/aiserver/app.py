@@ -2,8 +2,13 @@ import asyncio
 import traceback
 from fastapi import FastAPI, Depends
 from contextlib import asynccontextmanager
-from bots.configured_bots import get_all_bots
+from bots.configured_bots import get_all_bots, get_bot_registry
 from mylangchain.retriever_manager import retriever_manager
+from mylangchain.checkpointer_service import CheckpointerService, CHECKPOINT_PRUNE_INTERVAL
+from llms.http_clients import aclose_http_clients
+from mylangchain.sql_database_registry import close_sql_databases
+from llms.model_discovery import model_discovery
+from toolkits.browser_pool import browser_pool, BROWSER_POOL_WARM_UP, BROWSER_POOL_HEALTH_CHECK_INTERVAL
 from routes.all_routers import include_all_routers
 
 
@@ -17,14 +22,39 @@ async def lifespan(app: FastAPI):
     # Start check_imports as a background task
     check_imports_task = asyncio.create_task(run_check_imports())
 
+    # Periodically evict idle bot instances
+    evict_idle_bots_task = asyncio.create_task(run_evict_idle_bots(app))
+
+    # Periodically prune old checkpoints
+    prune_checkpoints_task = asyncio.create_task(run_prune_checkpoints())
+
+    # Fetch the provider model lists in the background so the first UI load is served from the cache
+    warm_models_task = asyncio.create_task(model_discovery.get_providers())
+
+    # Bind the scraping browser pool to the server loop, so sync tools in worker threads use it too, then
+    # launch the browser ahead of the first request and keep it healthy
+    browser_pool.bind_loop()
+    browser_health_task = asyncio.create_task(run_browser_health_checks(BROWSER_POOL_WARM_UP))
+
     yield  # The application runs here
 
     # Shutdown: Cancel any running tasks if needed
-    check_imports_task.cancel()
-    try:
-        await check_imports_task
-    except asyncio.CancelledError:
-        pass
+    for task in (check_imports_task, evict_idle_bots_task, prune_checkpoints_task, warm_models_task,
+                 browser_health_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Background task failed: {str(e)}")
+
+    # Release browsers, checkpointers etc held by the remaining bot instances
+    await get_bot_registry(app).close_all()
+    await browser_pool.close()
+    await CheckpointerService.close_all()
+    await aclose_http_clients()
+    close_sql_databases()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -39,6 +69,39 @@ async def run_check_imports():
         print("An error occurred during import checking:")
         traceback.print_exc()
 
+async def run_evict_idle_bots(app: FastAPI, interval: float = 60):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            get_bot_registry(app).evict_expired()
+        except Exception as e:
+            print("An error occurred while evicting idle bots:")
+            traceback.print_exc()
+
+async def run_prune_checkpoints(interval: float = CHECKPOINT_PRUNE_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await CheckpointerService.prune_checkpoints()
+        except Exception as e:
+            print("An error occurred while pruning checkpoints:")
+            traceback.print_exc()
+
+async def run_browser_health_checks(warm_up: bool, interval: float = BROWSER_POOL_HEALTH_CHECK_INTERVAL):
+    if warm_up:
+        try:
+            await browser_pool.warm_up()
+        except Exception as e:
+            print("An error occurred while warming up the browser pool:")
+            traceback.print_exc()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await browser_pool.check_health()
+        except Exception as e:
+            print("An error occurred while checking the browser pool:")
+            traceback.print_exc()
+
 
 if __name__ == "__main__":
     import uvicorn
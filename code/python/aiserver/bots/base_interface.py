@@ -3,6 +3,11 @@ from typing import Dict, Any
 
 
 class BaseInterface(ABC):
+    # Set to True if all per-conversation state is keyed by thread_id (e.g. in a checkpointer) so that
+    # a single instance can serve every thread for a given LLM provider and model. Opt-in per bot class, as
+    # stateful tools (Python REPL, browser pages) must not be shared between conversations
+    shared_across_threads: bool = False
+
     @property
     @abstractmethod
     def bot_type(self) -> str:
@@ -23,4 +28,11 @@ class BaseInterface(ABC):
         :return: A dictionary where keys are option names and values are option metadata
         (e.g., type, description, possible values)
         """
+        pass
+
+    async def aclose(self):
+        """
+        Release any resources held by this bot instance (browsers, connections etc).
+        Called when the instance is evicted from the bot registry or on shutdown.
+        """
         pass
\ No newline at end of file
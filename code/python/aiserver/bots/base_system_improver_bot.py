@@ -17,6 +17,8 @@ class State(TypedDict):
 
 
 class BaseSystemImproverBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+
     def __init__(self, system_src: str = '/system_src'):
         super().__init__()
         self.system_src = system_src
@@ -55,7 +57,8 @@ class BaseSystemImproverBot(AsyncLangchainBotInterface):
             else:
                 debug_print(f"Error reading hints.md: {hints_content}")
 
-            prompt = f"""
+            # The instructions never change, so they go first and stay cached when the file tree or hints change
+            prompt = """
             As an AI assistant, you are tasked with analyzing and suggesting improvements for a software system.
             Follow these guidelines:
             1. Review the system structure tree below and answer questions about the system and suggest improvements where appropriate.
@@ -89,18 +92,21 @@ class BaseSystemImproverBot(AsyncLangchainBotInterface):
                 c. Use the file_content tool to retrieve the contents of these similar files for reference.
             11. Ensure that new code generation and modifications align with the existing codebase's style and best practices.
 
+            IMPORTANT: Remember to ask for specific file contents using the file_content tool when needed.
+            Context: You are improving and analyzing a complex software system. Your goal is to provide comprehensive and well-thought-out suggestions for improvement.
+            VERY IMPORTANT: When generating new code or modifying existing code always provide the FULL SOURCE CODE and do not just provide a diff.
+            """
+
+            system_structure = f"""
             The system structure is as follows:
             {file_structure}
 
             {hints_section}
-
-            IMPORTANT: Remember to ask for specific file contents using the file_content tool when needed.
-            Context: You are improving and analyzing a complex software system. Your goal is to provide comprehensive and well-thought-out suggestions for improvement.
-            VERY IMPORTANT: When generating new code or modifying existing code always provide the FULL SOURCE CODE and do not just provide a diff.
             """
 
             prompt_message = HumanMessage(content=prompt)
-            messages = [system_message, prompt_message] + messages
+            system_structure_message = HumanMessage(content=system_structure)
+            messages = self.with_static_prefix(messages, [system_message, prompt_message], [system_structure_message])
             result = {"messages": [self.llm.invoke(messages)]}
             debug_print(f"Chatbot output: {result}")
             return result
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from bots.base_interface import BaseInterface
+from utils.debug_utils import debug_print
+
+
+class BotInstanceRegistry:
+    """
+    LRU registry of bot instances keyed by (thread_id, bot_type), or by (bot_type, llm_provider, llm_model)
+    for bots shared across threads.
+
+    Instances are evicted when the registry grows beyond max_instances (least recently used first)
+    or when they have been idle for longer than idle_timeout seconds. Evicted bots have their
+    aclose() hook run so they can release browsers, checkpointers etc. Instances still serving a request
+    (from get_or_create with in_use set until release) are never evicted, the registry grows beyond
+    max_instances instead.
+    """
+
+    def __init__(self, max_instances: Optional[int] = None, idle_timeout: Optional[float] = None):
+        self.max_instances = max_instances or int(os.getenv("BOT_INSTANCES_MAX", "100"))
+        self.idle_timeout = idle_timeout or float(os.getenv("BOT_INSTANCE_IDLE_TIMEOUT", "3600"))
+        self.instances: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self.created_count = 0
+        self.evicted_count = 0
+        self.expired_count = 0
+        # Requests in progress per bot instance (by id), and the registry key of each instance
+        self.in_use_counts: Dict[int, int] = {}
+        self.instance_keys: Dict[int, Tuple] = {}
+        self._close_tasks = set()
+
+    def get_or_create(self, key: Tuple, factory: Callable[[], BaseInterface], in_use: bool = False) -> BaseInterface:
+        """
+        :param key: The registry key
+        :param factory: Creates the bot when there is no instance for the key
+        :param in_use: Mark the bot as serving a request until release is called, so it can't be evicted and
+                       closed in the meantime (also not by the eviction sweep of this lookup)
+        """
+        now = time.monotonic()
+
+        entry = self.instances.get(key)
+        if entry is None:
+            debug_print(f"Creating new bot instance for {key}")
+            entry = {"bot": factory(), "last_used": now}
+            self.instances[key] = entry
+            self.instance_keys[id(entry["bot"])] = key
+            self.created_count += 1
+        else:
+            entry["last_used"] = now
+            self.instances.move_to_end(key)
+        if in_use:
+            bot_id = id(entry["bot"])
+            self.in_use_counts[bot_id] = self.in_use_counts.get(bot_id, 0) + 1
+
+        self.evict_expired(now)
+        excess = len(self.instances) - self.max_instances
+        if excess > 0:
+            # Least recently used first, skipping instances which are serving a request or about to
+            evicted_keys = [evicted_key for evicted_key, evicted_entry in self.instances.items()
+                            if evicted_key != key and not self.is_in_use(evicted_entry["bot"])][:excess]
+            for evicted_key in evicted_keys:
+                debug_print(f"Bot registry full ({self.max_instances}), evicting {evicted_key}")
+                self.evicted_count += 1
+                self._remove(evicted_key)
+
+        return entry["bot"]
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        now = now or time.monotonic()
+        expired_keys = [key for key, entry in self.instances.items()
+                        if now - entry["last_used"] > self.idle_timeout and not self.is_in_use(entry["bot"])]
+        for key in expired_keys:
+            self.expired_count += 1
+            debug_print(f"Bot instance {key} idle for more than {self.idle_timeout}s, evicting")
+            self._remove(key)
+        return len(expired_keys)
+
+    def is_in_use(self, bot: BaseInterface) -> bool:
+        return self.in_use_counts.get(id(bot), 0) > 0
+
+    def release(self, bot: BaseInterface):
+        """
+        End a request started with get_or_create(..., in_use=True). The idle time counts from here.
+        """
+        bot_id = id(bot)
+        self.in_use_counts[bot_id] -= 1
+        if not self.in_use_counts[bot_id]:
+            del self.in_use_counts[bot_id]
+        entry = self.instances.get(self.instance_keys.get(bot_id))
+        if entry is not None and entry["bot"] is bot:
+            entry["last_used"] = time.monotonic()
+
+    async def close_all(self):
+        debug_print(f"Closing {len(self.instances)} bot instances")
+        bots = [entry["bot"] for entry in self.instances.values()]
+        self.instances.clear()
+        self.instance_keys.clear()
+        await asyncio.gather(*(self._close(bot) for bot in bots))
+        if self._close_tasks:
+            await asyncio.gather(*self._close_tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live": len(self.instances),
+            "in_use": len(self.in_use_counts),
+            "created": self.created_count,
+            "evicted": self.evicted_count,
+            "expired": self.expired_count,
+            "max_instances": self.max_instances,
+            "idle_timeout": self.idle_timeout,
+        }
+
+    def _remove(self, key: Tuple):
+        bot = self.instances.pop(key)["bot"]
+        self.instance_keys.pop(id(bot), None)
+        self._schedule_close(bot)
+
+    def _schedule_close(self, bot: BaseInterface):
+        try:
+            task = asyncio.get_running_loop().create_task(self._close(bot))
+        except RuntimeError:
+            debug_print(f"No running event loop, unable to close evicted bot {bot.bot_type}")
+            return
+        self._close_tasks.add(task)
+        task.add_done_callback(self._close_tasks.discard)
+
+    @staticmethod
+    async def _close(bot: BaseInterface):
+        try:
+            await bot.aclose()
+        except Exception as e:
+            debug_print(f"Error closing bot {bot.bot_type}: {str(e)}")
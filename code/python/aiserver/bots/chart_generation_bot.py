@@ -14,6 +14,11 @@ class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class ChartGenerationBot(AsyncLangchainBotInterface):
+    # The Python REPL tool keeps its globals per instance, so each thread needs its own bot
+    shared_across_threads = False
+    thread_id_in_prompt = True
+    llm_cache = False
+
     def __init__(self):
         super().__init__(default_llm_provider="openai", default_llm_model="gpt-4o")
         self.tools = [TavilySearchResults(max_results=3), PythonREPLTool()]
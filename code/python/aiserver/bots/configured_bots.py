@@ -1,3 +1,4 @@
+import os
 from collections import OrderedDict
 from fastapi import FastAPI
 from bots.simple_bot import SimpleBot
@@ -14,6 +15,7 @@ from bots.fast_mlx_bot import FastMlxBot
 from bots.simple_db_bot import SimpleDBBot
 from bots.webscraping_bot import WebScrapingBot
 from bots.webscraping_db_bot import WebScrapingDBBot
+from bots.bot_registry import BotInstanceRegistry
 
 def get_bot_factories():
     return OrderedDict([
@@ -34,21 +36,31 @@ def get_bot_factories():
         ("webscraping-engineer-bot", WebScrapingEngineerBot)
     ])
 
-def get_bot(app: FastAPI, bot_type: str, thread_id: str):
+# When enabled, bots that support it keep one instance (and compiled graph) per LLM provider/model for all threads
+SHARE_BOT_INSTANCES = os.getenv("SHARE_BOT_INSTANCES", "true").lower() == "true"
+
+def get_bot(app: FastAPI, bot_type: str, thread_id: str, llm_provider: str = None, llm_model: str = None,
+            in_use: bool = False):
+    """
+    Get the bot instance for the thread. With in_use set it is marked as serving a request, so it can't be
+    evicted until get_bot_registry(app).release(bot) is called.
+    """
     bot_factories = get_bot_factories()
     if bot_type not in bot_factories:
         return None
-    
+
+    bot_factory = bot_factories[bot_type]
+    if SHARE_BOT_INSTANCES and bot_factory.shared_across_threads:
+        key = (bot_type, llm_provider, llm_model)
+    else:
+        key = (thread_id, bot_type)
+
+    return get_bot_registry(app).get_or_create(key, bot_factory, in_use=in_use)
+
+def get_bot_registry(app: FastAPI) -> BotInstanceRegistry:
     if not hasattr(app.state, 'bot_instances'):
-        app.state.bot_instances = {}
-    
-    if thread_id not in app.state.bot_instances:
-        app.state.bot_instances[thread_id] = {}
-    
-    if bot_type not in app.state.bot_instances[thread_id]:
-        app.state.bot_instances[thread_id][bot_type] = bot_factories[bot_type]()
-    
-    return app.state.bot_instances[thread_id][bot_type]
+        app.state.bot_instances = BotInstanceRegistry()
+    return app.state.bot_instances
 
 def get_all_bots(app: FastAPI):
     return get_bot_factories()
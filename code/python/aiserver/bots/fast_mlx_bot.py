@@ -1,14 +1,21 @@
 import os
+import httpx
 import requests
-import json
-from typing import Dict, Any
+from typing import Dict, Any, AsyncGenerator, List, Tuple
 from bots.simple_bot_interface import SimpleBotInterface
+from llms.chat_completions import chat_completion, completion_timeout, error_message, stream_chat_completion
 from utils.debug_utils import debug_print
 
 
 class FastMlxBot(SimpleBotInterface):
+    # Stateless, every request is sent to the model on its own
+    shared_across_threads = True
+
     def __init__(self):
         self.base_url = os.getenv('FASTMLX_BASE_URL', 'http://0.0.0.0:8000')
+        # Requests go through the shared keep-alive HTTP client, the timeout applies while waiting for each token
+        self.timeout = completion_timeout(float(os.getenv('FASTMLX_REQUEST_TIMEOUT', '300')),
+                                          float(os.getenv('FASTMLX_CONNECT_TIMEOUT', '10')))
         debug_print(f"FastMlxBot initialized with base URL: {self.base_url}")
 
     @property
@@ -19,7 +26,7 @@ class FastMlxBot(SimpleBotInterface):
     def description(self) -> str:
         return "FastMlx Bot - Direct interaction with FastMlx models"
 
-    async def simple_process_request(self, user_input: str, context: str, **kwargs) -> str:
+    def prepare_request(self, user_input: str, context: str, **kwargs) -> Tuple[str, List[Dict[str, str]]]:
         debug_print(f"FastMlxBot processing request. User input: {user_input}")
         debug_print(f"Context: {context}")
         debug_print(f"Additional kwargs: {kwargs}")
@@ -31,42 +38,29 @@ class FastMlxBot(SimpleBotInterface):
             {"role": "user", "content": user_input}
         ]
         debug_print(f"Prepared messages: {messages}")
+        debug_print(f"Sending POST request to {self.base_url}/v1/chat/completions")
+        return model, messages
 
+    async def simple_process_request(self, user_input: str, context: str, **kwargs) -> str:
+        model, messages = self.prepare_request(user_input, context, **kwargs)
         try:
-            debug_print(f"Sending POST request to {self.base_url}/v1/chat/completions")
-            debug_print("Request payload:")
-            debug_print(json.dumps({
-                "model": model,
-                "messages": messages,
-                "max_tokens": 500
-            }, indent=2))
-
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions",
-                headers={"Content-Type": "application/json"},
-                data=json.dumps({
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": 500
-                })
-            )
-            debug_print(f"Response status code: {response.status_code}")
-            debug_print(f"Response headers: {response.headers}")
-
-            response.raise_for_status()
-            result = response.json()
-            debug_print("API Response:")
-            debug_print(json.dumps(result, indent=2))
-
-            answer = result['choices'][0]['message']['content'].strip()
-
+            answer = (await chat_completion(self.base_url, model, messages, self.timeout, max_tokens=500)).strip()
             debug_print(f"FastMlxBot response: {answer}")
             return answer
-        except requests.RequestException as e:
-            error_message = f"Error communicating with FastMlx API: {str(e)}"
-            debug_print(error_message)
-            debug_print(f"Response content (if any): {getattr(e.response, 'text', 'N/A')}")
-            return error_message
+        except httpx.HTTPError as e:
+            message = error_message("FastMlx API", e)
+            debug_print(message)
+            return message
+
+    async def simple_stream_request(self, user_input: str, context: str, **kwargs) -> AsyncGenerator[str, None]:
+        model, messages = self.prepare_request(user_input, context, **kwargs)
+        try:
+            async for delta in stream_chat_completion(self.base_url, model, messages, self.timeout, max_tokens=500):
+                yield delta
+        except httpx.HTTPError as e:
+            message = error_message("FastMlx API", e)
+            debug_print(message)
+            yield message
 
     def get_config_options(self) -> Dict[str, Any]:
         return {
@@ -78,6 +72,11 @@ class FastMlxBot(SimpleBotInterface):
             "llm_model": {
                 "type": "string",
                 "description": "The FastMlx model to use",
+            },
+            "stream_tokens": {
+                "type": "boolean",
+                "description": "Stream the response as 'delta' responses while it is generated",
+                "default": self.stream_tokens
             }
         }
 
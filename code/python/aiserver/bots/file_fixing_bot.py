@@ -9,6 +9,8 @@ class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class FileFixingBot(LangchainBotInterface):
+    shared_across_threads = True
+
     def __init__(self, retriever_name: Optional[str] = None):
         super().__init__(retriever_name)
         self.tools = []  # FileFixingBot doesn't use any tools
@@ -54,5 +56,6 @@ class FileFixingBot(LangchainBotInterface):
         graph_builder = StateGraph(State)
         graph_builder.add_node("chatbot", self.create_chatbot())
         graph_builder.set_entry_point("chatbot")
-        mycheckpointer = self.get_checkpointer()
+        # Every merge is independent, so nothing is kept in the shared durable checkpointer
+        mycheckpointer = self.get_checkpointer("sqlite", conn_string=":memory:")
         return graph_builder.compile(checkpointer=mycheckpointer)
\ No newline at end of file
@@ -1,13 +1,20 @@
 import os
-import requests
-from typing import Dict, Any
+import httpx
+from typing import Dict, Any, AsyncGenerator, List, Tuple
 from bots.simple_bot_interface import SimpleBotInterface
+from llms.chat_completions import chat_completion, completion_timeout, error_message, stream_chat_completion
 from utils.debug_utils import debug_print
 
 
 class OllamaBot(SimpleBotInterface):
+    # Stateless, every request is sent to the model on its own
+    shared_across_threads = True
+
     def __init__(self):
         self.base_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        # Requests go through the shared keep-alive HTTP client, the timeout applies while waiting for each token
+        self.timeout = completion_timeout(float(os.getenv('OLLAMA_REQUEST_TIMEOUT', '300')),
+                                          float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '10')))
         debug_print(f"OllamaBot initialized with base URL: {self.base_url}")
 
     @property
@@ -18,34 +25,38 @@ class OllamaBot(SimpleBotInterface):
     def description(self) -> str:
         return "Ollama Bot - Direct interaction with Ollama models"
 
-    async def simple_process_request(self, user_input: str, context: str, **kwargs) -> str:
+    def prepare_request(self, user_input: str, context: str, **kwargs) -> Tuple[str, List[Dict[str, str]]]:
         debug_print(f"OllamaBot processing request. User input: {user_input}")
         debug_print(f"Context: {context}")
         debug_print(f"Additional kwargs: {kwargs}")
 
         model = kwargs.get('llm_model', 'llama2')  # Default to llama2 if no model specified
 
-        prompt = f"Context: {context}\n\nHuman: {user_input}\n\nAssistant:"
+        messages = [{"role": "user", "content": user_input}]
+        if context:
+            messages.insert(0, {"role": "system", "content": f"Context: {context}"})
+        return model, messages
 
+    async def simple_process_request(self, user_input: str, context: str, **kwargs) -> str:
+        model, messages = self.prepare_request(user_input, context, **kwargs)
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            answer = result.get('response', '').strip()
-
+            answer = (await chat_completion(self.base_url, model, messages, self.timeout)).strip()
             debug_print(f"OllamaBot response: {answer}")
             return answer
-        except requests.RequestException as e:
-            error_message = f"Error communicating with Ollama: {str(e)}"
-            debug_print(error_message)
-            return error_message
+        except httpx.HTTPError as e:
+            message = error_message("Ollama", e)
+            debug_print(message)
+            return message
+
+    async def simple_stream_request(self, user_input: str, context: str, **kwargs) -> AsyncGenerator[str, None]:
+        model, messages = self.prepare_request(user_input, context, **kwargs)
+        try:
+            async for delta in stream_chat_completion(self.base_url, model, messages, self.timeout):
+                yield delta
+        except httpx.HTTPError as e:
+            message = error_message("Ollama", e)
+            debug_print(message)
+            yield message
 
     def get_config_options(self) -> Dict[str, Any]:
         return {
@@ -57,5 +68,10 @@ class OllamaBot(SimpleBotInterface):
             "llm_model": {
                 "type": "string",
                 "description": "The Ollama model to use",
+            },
+            "stream_tokens": {
+                "type": "boolean",
+                "description": "Stream the response as 'delta' responses while it is generated",
+                "default": self.stream_tokens
             }
         }
\ No newline at end of file
@@ -2,13 +2,15 @@ from typing import List, TypedDict, Annotated, Optional
 from mylangchain.async_langchain_bot_interface import AsyncLangchainBotInterface
 from utils.debug_utils import debug_print
 from langgraph.graph import StateGraph
-from langgraph.graph.message import add_messages
+from mylangchain.message_reducers import message_window
 from langchain_core.messages import SystemMessage, HumanMessage
 
 class State(TypedDict):
-    messages: Annotated[List, add_messages]
+    messages: Annotated[List, message_window()]
 
 class SimpleBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+
     def __init__(self, retriever_name: Optional[str] = None):
         super().__init__(retriever_name)
         self.tools = []  # SimpleBot doesn't use any tools
@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, AsyncGenerator
 from bots.base_interface import BaseInterface
 
 class SimpleBotInterface(BaseInterface):
+    # Default for the "stream_tokens" config option, can be overridden per request
+    stream_tokens: bool = False
+
     @abstractmethod
     async def simple_process_request(self, user_input: str, context: str, **kwargs) -> str:
         """
@@ -13,4 +16,16 @@ class SimpleBotInterface(BaseInterface):
         :param kwargs: Additional keyword arguments that might be needed for specific bot implementations
         :return: The bot's response
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def simple_stream_request(self, user_input: str, context: str, **kwargs) -> AsyncGenerator[str, None]:
+        """
+        Process a user request asynchronously, yielding the response in pieces as it is generated.
+        Bots which can't stream yield the whole response from simple_process_request.
+
+        :param user_input: The user's input message
+        :param context: Additional context for the conversation
+        :param kwargs: Additional keyword arguments that might be needed for specific bot implementations
+        :return: An async generator of response deltas
+        """
+        yield await self.simple_process_request(user_input, context, **kwargs)
@@ -6,7 +6,7 @@ from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_community.agent_toolkits import create_sql_agent
-from langchain_community.utilities import SQLDatabase
+from mylangchain.sql_database_registry import get_sql_database
 
 class State(TypedDict):
     messages: Annotated[List, add_messages]
@@ -26,9 +26,17 @@ If the question does not seem related to the database, just return "I don't know
 """
 
 class SimpleDBBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+    llm_cache = False
+
     def __init__(self, retriever_name: Optional[str] = None, db_url: str = os.environ.get("DB_READER_DB_URI")):
         super().__init__(retriever_name,default_llm_provider="openai", default_llm_model="gpt-4o")
         self.db_url = db_url
+        # The SQL agent is rebuilt only when the LLM changes (e.g. a different provider is selected) or the
+        # shared database is replaced after a schema change
+        self.agent_llm = None
+        self.agent_db = None
+        self.agent_executor = None
         self.initialize()
 
     @property
@@ -42,6 +50,16 @@ class SimpleDBBot(AsyncLangchainBotInterface):
     def get_tools(self) -> List:
         return []  # Tools are handled by the SQL agent
 
+    def get_agent_executor(self):
+        llm = self.llm_wrapper.llm
+        # Shared engine and cached schema, rather than connecting and reflecting every table per message
+        db = get_sql_database(self.db_url)
+        if self.agent_executor is None or self.agent_llm is not llm or self.agent_db is not db:
+            self.agent_executor = create_sql_agent(llm, db=db, agent_type="tool-calling", verbose=True, prefix=SQL_PREFIX)
+            self.agent_llm = llm
+            self.agent_db = db
+        return self.agent_executor
+
     def create_chatbot(self):
         def chatbot(state: State):
             debug_print(f"Chatbot input state: {state}")
@@ -62,9 +80,7 @@ class SimpleDBBot(AsyncLangchainBotInterface):
             prompt_message = HumanMessage(content=prompt)
             messages = [system_message, prompt_message] + messages
 
-            llm = self.llm_wrapper.llm
-            db = SQLDatabase.from_uri(self.db_url)
-            agent_executor = create_sql_agent(llm, db=db, agent_type="tool-calling", verbose=True, prefix=SQL_PREFIX)
+            agent_executor = self.get_agent_executor()
 
             # Use the SQL agent to process the user's query
             result = agent_executor.invoke({"input": messages[-1].content})
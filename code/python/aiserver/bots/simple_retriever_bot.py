@@ -3,14 +3,26 @@ from mylangchain.async_langchain_bot_interface import AsyncLangchainBotInterface
 from utils.debug_utils import debug_print
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain.schema import Document
-from langchain.chains import ConversationalRetrievalChain
+from langchain_core.messages import AIMessage
+from langchain_core.runnables.config import RunnableConfig
+from mylangchain.rag_pipeline import RAGPipeline
+
+SYSTEM_PROMPT = """You are an AI assistant that answers questions based on the provided information.
+
+As an AI assistant, please provide informative responses based on the retrieved information.
+Follow these guidelines:
+1. Use the provided information to answer questions accurately
+2. If you're unsure about something or it's not in the retrieved information, it's okay to admit it
+3. Provide specific details when relevant
+4. Be professional and respectful in your responses
+5. If asked about topics not covered in the retrieved information, politely state that you don't have that information"""
 
 class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class SimpleRetrieverBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+
     def __init__(self):
         super().__init__(retriever_name="uktax")
         self.tools = []  # SimpleRetrieverBot doesn't use any tools
@@ -28,35 +40,19 @@ class SimpleRetrieverBot(AsyncLangchainBotInterface):
         return self.tools
 
     def create_chatbot(self):
-        qa_chain = ConversationalRetrievalChain.from_llm(
+        rag_pipeline = RAGPipeline(
             llm=self.llm_wrapper.llm,
             retriever=self.retriever,
-            return_source_documents=True
+            system_prompt=SYSTEM_PROMPT,
+            response_cache=self.get_response_cache(),
         )
 
-        def chatbot(state: State):
+        async def chatbot(state: State, config: RunnableConfig):
             debug_print(f"Chatbot input state: {state}")
             messages = state["messages"]
-            system_message = SystemMessage(content="You are an AI assistant that answers questions based on the provided information.")
-
-            prompt = """
-            As an AI assistant, please provide informative responses based on the retrieved information.
-            Follow these guidelines:
-            1. Use the provided information to answer questions accurately
-            2. If you're unsure about something or it's not in the retrieved information, it's okay to admit it
-            3. Provide specific details when relevant
-            4. Be professional and respectful in your responses
-            5. If asked about topics not covered in the retrieved information, politely state that you don't have that information
-            """
-
-            prompt_message = HumanMessage(content=prompt)
-            messages = [system_message, prompt_message] + messages
-
-            # Debug print: Show the question being asked to the retriever
-            debug_print(f"Question being asked to the retriever: {messages[-1].content}")
-
-            # Use the invoke method instead of __call__
-            result = qa_chain.invoke({"question": messages[-1].content, "chat_history": messages[:-1]})
+            thread_id = config.get("configurable", {}).get("thread_id")
+
+            result = await rag_pipeline.ainvoke(messages[-1].content, messages[:-1], thread_id)
             answer = result['answer']
             source_docs = result['source_documents']
 
@@ -68,15 +64,12 @@ class SimpleRetrieverBot(AsyncLangchainBotInterface):
                 debug_print(f"  Metadata: {doc.metadata}")
 
             # Append source information to the answer
-            if source_docs:
-                answer += "\n\nSources:"
-                for i, doc in enumerate(source_docs, 1):
-                    answer += f"\n{i}. {doc.metadata.get('source', 'Unknown source')}"
+            answer += RAGPipeline.format_sources(source_docs)
 
             # Debug print: Show the final answer
             debug_print(f"Final answer: {answer}")
 
-            result = {"messages": [HumanMessage(content=answer)]}
+            result = {"messages": [AIMessage(content=answer)]}
             debug_print(f"Chatbot output: {result}")
             return result
         return chatbot
@@ -21,6 +21,11 @@ class AgentState(TypedDict):
 
 
 class SupervisorAgentBot(AsyncLangchainBotInterface):
+    # The Python REPL tool keeps its globals per instance, so each thread needs its own bot
+    shared_across_threads = False
+    thread_id_in_prompt = True
+    llm_cache = False
+
     def __init__(self, retriever_name: Optional[str] = None):
         super().__init__(retriever_name, default_llm_provider="openai", default_llm_model="gpt-4-turbo")
         self.initialize()
@@ -13,6 +13,9 @@ class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class WebAppBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+    llm_cache = False
+
     def __init__(self):
         super().__init__()
         self.tools = [TavilySearchResults(max_results=3)]
@@ -3,16 +3,19 @@ from mylangchain.async_langchain_bot_interface import AsyncLangchainBotInterface
 from llms.llm_manager import LLMManager
 from utils.debug_utils import debug_print
 from langgraph.graph import StateGraph
-from langgraph.graph.message import add_messages
+from mylangchain.message_reducers import message_window
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
 from prompts.system_prompts import file_saving_prompt
 
 class State(TypedDict):
-    messages: Annotated[List, add_messages]
+    messages: Annotated[List, message_window()]
 
 class WebSearchBot(AsyncLangchainBotInterface):
+    shared_across_threads = True
+    llm_cache = False
+
     def __init__(self):
         super().__init__()
         self.tools = [TavilySearchResults(max_results=3)]
@@ -6,18 +6,21 @@ from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage
 from toolkits.playwright_toolkit import PlaywrightBrowserToolkit
-from playwright.async_api import async_playwright
-from playwright.sync_api import sync_playwright
+from toolkits.browser_pool import PooledBrowser
 from langchain_core.messages import AIMessage
 
 class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class WebScrapingBot(AsyncLangchainBotInterface):
+    # The browser context (and its current page) is kept per instance so each thread needs its own bot
+    shared_across_threads = False
+    llm_cache = False
+
     def __init__(self):
         super().__init__()
         self.tools = None
-        self.async_browser = True
+        self.browser = None
         self.initialize()
 
     @property
@@ -33,22 +36,28 @@ class WebScrapingBot(AsyncLangchainBotInterface):
             await self.initialize_tools()
 
     async def initialize_tools(self):
-        if self.async_browser:
-            debug_print("*** Creating asynchronous browser")
-            browser = await async_playwright().start()
-            async_browser = await browser.chromium.launch()
-            self.tools = PlaywrightBrowserToolkit.from_browser(async_browser=async_browser).get_tools()
-        else:
-            debug_print("*** Creating synchronous browser")
-            browser = sync_playwright().start()
-            sync_browser = browser.chromium.launch()
-            self.tools = PlaywrightBrowserToolkit.from_browser(sync_browser=sync_browser).get_tools()
+        # Takes a context from the shared browser pool on the first navigation
+        debug_print("*** Using pooled browser")
+        self.browser = PooledBrowser()
+        self.tools = PlaywrightBrowserToolkit.from_browser(async_browser=self.browser).get_tools()
 
         # Need to bind the tools to the LLM as we missed the prior opportunity
         self.llm = self.llm.bind_tools(self.tools)
 
         debug_print(f"Bound Tools: {self.tools}")
 
+    async def _async_request_done(self):
+        # Park the browser context between requests so it doesn't hold a pool slot while the thread is idle
+        if self.browser is not None:
+            await self.browser.park()
+
+    async def aclose(self):
+        if self.browser is not None:
+            debug_print(f"*** Releasing browser context for {self.bot_type}")
+            await self.browser.close()
+            self.browser = None
+        await super().aclose()
+
     def get_tools(self) -> List:
         return self.tools
 
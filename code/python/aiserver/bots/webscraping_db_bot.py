@@ -1,14 +1,15 @@
+import asyncio
 import os
 from typing import List, TypedDict, Annotated, Optional
 
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_community.utilities import SQLDatabase
 from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from mylangchain.async_langchain_bot_interface import AsyncLangchainBotInterface
-from playwright.async_api import async_playwright
+from mylangchain.sql_database_registry import get_sql_database
+from toolkits.browser_pool import PooledBrowser
 from toolkits.playwright_toolkit import PlaywrightBrowserToolkit
 from utils.debug_utils import debug_print
 
@@ -17,10 +18,17 @@ class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 class WebScrapingDBBot(AsyncLangchainBotInterface):
+    # The browser context (and its current page) is kept per instance so each thread needs its own bot
+    shared_across_threads = False
+    llm_cache = False
+
     def __init__(self, retriever_name: Optional[str] = None, db_url: str = os.environ.get("DB_READER_DB_URI")):
         super().__init__(retriever_name)
         self.db_url = db_url
         self.tools = None
+        self.browser_tools = None
+        self.db = None
+        self.browser = None
         self.initialize()
 
     @property
@@ -35,26 +43,45 @@ class WebScrapingDBBot(AsyncLangchainBotInterface):
         return self.tools
 
     async def _async_lazy_init(self):
-        if self.tools is None:
+        if self.browser_tools is None:
             await self.initialize_tools()
+        # The shared database is replaced after a schema change, the SQL tools then need rebuilding on it
+        db = await asyncio.to_thread(get_sql_database, self.db_url)
+        if db is not self.db:
+            self.use_sql_database(db)
 
     async def initialize_tools(self):
-        debug_print("*** Creating asynchronous browser")
-        browser = await async_playwright().start()
-        async_browser = await browser.chromium.launch()
-        self.tools = PlaywrightBrowserToolkit.from_browser(async_browser=async_browser).get_tools()
+        # Takes a context from the shared browser pool on the first navigation
+        debug_print("*** Using pooled browser")
+        self.browser = PooledBrowser()
+        self.browser_tools = PlaywrightBrowserToolkit.from_browser(async_browser=self.browser).get_tools()
 
-        # Add SQL database tools also
-        db = SQLDatabase.from_uri(self.db_url)
-        sql_toolkit = SQLDatabaseToolkit(db=db,llm=self.llm)
-        self.tools.extend(sql_toolkit.get_tools())
+    def use_sql_database(self, db):
+        # Add SQL database tools also, on the engine and schema cache shared with the other DB bots
+        self.db = db
+        sql_toolkit = SQLDatabaseToolkit(db=db, llm=self.llm_wrapper.llm)
+        self.tools = self.browser_tools + sql_toolkit.get_tools()
 
         # Need to bind the tools to the LLM as we missed the prior opportunity
-        self.llm = self.llm.bind_tools(self.tools)
+        self.llm = self.llm_wrapper.llm.bind_tools(self.tools)
 
+        # The graph's tool node holds the tools, so the graph is rebuilt too
+        self.is_initialized = False
         debug_print(f"Bound Tools: {self.tools}")
 
 
+    async def _async_request_done(self):
+        # Park the browser context between requests so it doesn't hold a pool slot while the thread is idle
+        if self.browser is not None:
+            await self.browser.park()
+
+    async def aclose(self):
+        if self.browser is not None:
+            debug_print(f"*** Releasing browser context for {self.bot_type}")
+            await self.browser.close()
+            self.browser = None
+        await super().aclose()
+
     def create_chatbot(self):
         async def chatbot(state: State):
             debug_print(f"Chatbot input state: {state}")
@@ -79,7 +106,7 @@ class WebScrapingDBBot(AsyncLangchainBotInterface):
             """
 
             prompt_message = HumanMessage(content=prompt)
-            messages = [system_message, prompt_message] + messages
+            messages = self.with_static_prefix(messages, [system_message, prompt_message])
             ai_message = await self.llm.ainvoke(messages)
             debug_print(f"Chatbot output ai_message: {ai_message}")
             result = {"messages": [ai_message]}
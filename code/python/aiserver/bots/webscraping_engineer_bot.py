@@ -6,8 +6,7 @@ from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from toolkits.playwright_toolkit import PlaywrightBrowserToolkit
-from playwright.async_api import async_playwright
-from playwright.sync_api import sync_playwright
+from toolkits.browser_pool import PooledBrowser
 from .base_system_improver_bot import BaseSystemImproverBot
 from tools.file_content_tool import file_content
 from tools.file_tree_tool import file_tree_tool
@@ -17,10 +16,14 @@ class State(TypedDict):
     improve_system: bool
 
 class WebScrapingEngineerBot(BaseSystemImproverBot):
+    # The browser context (and its current page) is kept per instance so each thread needs its own bot
+    shared_across_threads = False
+    llm_cache = False
+
     def __init__(self):
         super().__init__(system_src='/system_src')
         self.tools = None
-        self.async_browser = True
+        self.browser = None
         self.initialize()
 
     @property
@@ -36,16 +39,10 @@ class WebScrapingEngineerBot(BaseSystemImproverBot):
             await self.initialize_tools()
 
     async def initialize_tools(self):
-        if self.async_browser:
-            debug_print("*** Creating asynchronous browser")
-            browser = await async_playwright().start()
-            async_browser = await browser.chromium.launch()
-            self.tools = PlaywrightBrowserToolkit.from_browser(async_browser=async_browser).get_tools()
-        else:
-            debug_print("*** Creating synchronous browser")
-            browser = sync_playwright().start()
-            sync_browser = browser.chromium.launch()
-            self.tools = PlaywrightBrowserToolkit.from_browser(sync_browser=sync_browser).get_tools()
+        # Takes a context from the shared browser pool on the first navigation
+        debug_print("*** Using pooled browser")
+        self.browser = PooledBrowser()
+        self.tools = PlaywrightBrowserToolkit.from_browser(async_browser=self.browser).get_tools()
 
         # Add file_content_tool and file_tree_tool
         self.tools.extend([file_content, file_tree_tool])
@@ -55,6 +52,18 @@ class WebScrapingEngineerBot(BaseSystemImproverBot):
 
         debug_print(f"Bound Tools: {self.tools}")
 
+    async def _async_request_done(self):
+        # Park the browser context between requests so it doesn't hold a pool slot while the thread is idle
+        if self.browser is not None:
+            await self.browser.park()
+
+    async def aclose(self):
+        if self.browser is not None:
+            debug_print(f"*** Releasing browser context for {self.bot_type}")
+            await self.browser.close()
+            self.browser = None
+        await super().aclose()
+
     def get_tools(self) -> List:
         return self.tools
 
@@ -96,7 +105,7 @@ class WebScrapingEngineerBot(BaseSystemImproverBot):
             """
 
             prompt_message = HumanMessage(content=prompt)
-            messages = [system_message, prompt_message] + messages
+            messages = self.with_static_prefix(messages, [system_message, prompt_message])
             ai_message = await self.llm.ainvoke(messages)
             debug_print(f"Chatbot output ai_message: {ai_message}")
 
@@ -1,26 +1,53 @@
 import os
-from typing import List
+from typing import Any, AsyncIterator, Iterator, List, Optional
 from langchain_anthropic import ChatAnthropic
-from langchain.tools import BaseTool
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from llms.base_llm_provider import BaseLLMProvider
-from llms.llm_wrapper import LLMWrapper
+from llms.prompt_caching import apply_cache_control
 from utils.debug_utils import debug_print
 
+ANTHROPIC_PROMPT_CACHING = os.getenv("ANTHROPIC_PROMPT_CACHING", "true").lower() == "true"
+
+
+class PromptCachingChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic which adds cache_control breakpoints after the prompt prefixes bots have marked as
+    static (see LangchainBotInterface.with_static_prefix), so Anthropic caches them between turns.
+    """
+
+    def _generate(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        return super()._generate(apply_cache_control(messages), *args, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        return await super()._agenerate(apply_cache_control(messages), *args, **kwargs)
+
+    def _stream(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        return super()._stream(apply_cache_control(messages), *args, **kwargs)
+
+    def _astream(self, messages: List[BaseMessage], *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        return super()._astream(apply_cache_control(messages), *args, **kwargs)
+
 
 class AnthropicProvider(BaseLLMProvider):
-    def get_llm(self, tools: List[BaseTool] = None, model: str = None) -> LLMWrapper:
+    @property
+    def provider_name(self) -> str:
+        return "anthropic"
+
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        return model or os.environ.get("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
+
+    def create_chat_model(self, model: str, **params) -> ChatAnthropic:
         api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
 
-        model = model or os.environ.get("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
-        llm = ChatAnthropic(model=model,max_tokens=4096)
-
-        if tools:
-            llm = llm.bind_tools(tools)
-
-        debug_print(f"Initialized Anthropic LLM with model: {model}")
-        return LLMWrapper(llm, "anthropic")
+        # The Anthropic SDK client (and its connection pool) lives on the model, which LLMManager reuses
+        params.setdefault("max_tokens", 4096)
+        debug_print(f"Creating Anthropic chat model: {model} (prompt caching: {ANTHROPIC_PROMPT_CACHING})")
+        if ANTHROPIC_PROMPT_CACHING:
+            return PromptCachingChatAnthropic(model=model, **params)
+        return ChatAnthropic(model=model, **params)
 
     def fetch_models(self) -> List[str]:
         # Replace with actual API call when available
@@ -31,4 +58,4 @@ class AnthropicProvider(BaseLLMProvider):
         return models
 
     def get_default_model(self) -> str:
-        return os.environ.get("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
\ No newline at end of file
+        return os.environ.get("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
@@ -1,17 +1,55 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 from langchain.tools import BaseTool
-from llms.llm_wrapper import LLMWrapper
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
 
 class BaseLLMProvider(ABC):
+    """
+    Creates the chat models for one provider. Bots get their models from LLMManager, which pools the
+    base chat models and binds tools on top, rather than from the providers directly.
+    """
+
+    @property
+    @abstractmethod
+    def provider_name(self) -> str:
+        pass
+
     @abstractmethod
-    def get_llm(self, tools: List[BaseTool] = None, model: str = None) -> LLMWrapper:
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        """
+        Return the model to use when none is requested.
+        """
         pass
 
+    @abstractmethod
+    def create_chat_model(self, model: str, **params) -> BaseChatModel:
+        """
+        Create the base chat model, without tools. LLMManager keeps one per (provider, model, params).
+        """
+        pass
+
+    def bind_tools(self, llm: BaseChatModel, tools: List[BaseTool]) -> Runnable:
+        return llm.bind_tools(tools)
+
     @abstractmethod
     def fetch_models(self) -> List[str]:
         pass
 
     @abstractmethod
     def get_default_model(self) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    async def afetch_models(self, timeout: float) -> List[str]:
+        """
+        Fetch the available models without blocking the event loop. Unlike fetch_models, errors are raised
+        so callers can keep serving previously fetched models.
+        """
+        return await asyncio.wait_for(asyncio.to_thread(self.fetch_models), timeout)
+
+    def get_default_model_from(self, models: List[str]) -> str:
+        """
+        The default model given the fetched models, for providers whose default depends on them.
+        """
+        return self.get_default_model()
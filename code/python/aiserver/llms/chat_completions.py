@@ -0,0 +1,77 @@
+import json
+from typing import Any, AsyncGenerator, Dict, List
+import httpx
+from llms.http_clients import get_async_http_client
+from utils.debug_utils import debug_print
+
+
+def completion_timeout(timeout: float, connect_timeout: float) -> httpx.Timeout:
+    # timeout is the longest wait for the next bytes of the response, i.e. for the first token or between tokens
+    return httpx.Timeout(timeout, connect=connect_timeout)
+
+
+async def chat_completion(base_url: str, model: str, messages: List[Dict[str, str]], timeout: httpx.Timeout,
+                          **params: Any) -> str:
+    """
+    Call an OpenAI compatible /v1/chat/completions endpoint (Ollama, FastMLX etc.) on the shared HTTP client.
+
+    :param base_url: The server's base URL
+    :param model: The model name
+    :param messages: The chat messages as {"role", "content"} dicts
+    :param timeout: The request timeout
+    :param params: Any other request parameters, e.g. max_tokens
+    :return: The response content
+    """
+    response = await get_async_http_client().post(
+        f"{base_url}/v1/chat/completions",
+        json={"model": model, "messages": messages, "stream": False, **params},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    result = response.json()
+    return result['choices'][0]['message']['content'] or ""
+
+
+async def stream_chat_completion(base_url: str, model: str, messages: List[Dict[str, str]], timeout: httpx.Timeout,
+                                 **params: Any) -> AsyncGenerator[str, None]:
+    """
+    Stream an OpenAI compatible /v1/chat/completions response, yielding the content deltas as the server
+    sends them as server-sent events.
+
+    :param base_url: The server's base URL
+    :param model: The model name
+    :param messages: The chat messages as {"role", "content"} dicts
+    :param timeout: The request timeout
+    :param params: Any other request parameters, e.g. max_tokens
+    :return: An async generator of content deltas
+    """
+    async with get_async_http_client().stream(
+        "POST",
+        f"{base_url}/v1/chat/completions",
+        json={"model": model, "messages": messages, "stream": True, **params},
+        timeout=timeout,
+    ) as response:
+        if response.is_error:
+            await response.aread()
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                debug_print(f"Skipping malformed completion chunk: {data}")
+                continue
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+def error_message(service: str, error: httpx.HTTPError) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        debug_print(f"Response content: {error.response.text}")
+    return f"Error communicating with {service}: {str(error) or error.__class__.__name__}"
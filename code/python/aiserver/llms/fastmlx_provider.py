@@ -1,5 +1,8 @@
 import os
 from typing import List, Optional
+from langchain_openai import ChatOpenAI
+from llms.http_clients import get_http_client, get_async_http_client
+from utils.debug_utils import debug_print
 from .base_llm_provider import BaseLLMProvider
 
 
@@ -19,14 +22,19 @@ class FastMLXProvider(BaseLLMProvider):
             models = ["mlx-community/gemma-2-9b-it-4bit"]
         return models
 
-    def get_llm(self, model_name: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None):
-        raise NotImplementedError("FastMLX provider does not support getLlm method")
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        return model or self.get_default_model()
 
-    def get_chat_llm(self, model_name: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None):
-        raise NotImplementedError("FastMLX provider does not support getChatLlm method")
+    def create_chat_model(self, model: str, **params) -> ChatOpenAI:
+        # FastMLX serves an OpenAI compatible API, which needs no API key
+        debug_print(f"Creating FastMLX chat model: {model}")
+        return ChatOpenAI(model=model, base_url=f"{self.base_url}/v1", api_key="fastmlx",
+                          http_client=get_http_client(), http_async_client=get_async_http_client(), **params)
 
     def get_default_model(self) -> str:
-        available_models = self.fetch_models()
-        if available_models:
-            return available_models[0]
+        return self.get_default_model_from(self.fetch_models())
+
+    def get_default_model_from(self, models: List[str]) -> str:
+        if models:
+            return models[0]
         return "No models available"
\ No newline at end of file
@@ -1,32 +1,35 @@
 import os
 import requests
-from typing import List
+from typing import List, Optional
 from langchain_groq import ChatGroq
-from langchain.tools import BaseTool
-from llms.llm_wrapper import LLMWrapper
+from llms.base_llm_provider import BaseLLMProvider
+from llms.http_clients import get_http_client, get_async_http_client
 from utils.debug_utils import debug_print
 
 
-class GroqProvider:
-    def get_llm(self, tools: List[BaseTool] = None, model: str = None) -> LLMWrapper:
+class GroqProvider(BaseLLMProvider):
+    @property
+    def provider_name(self) -> str:
+        return "groq"
+
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        return model or os.environ.get("GROQ_MODEL", "llama3-groq-70b-8192-tool-use-preview")
+
+    def create_chat_model(self, model: str, **params) -> ChatGroq:
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
 
-        model = model or os.environ.get("GROQ_MODEL", "llama3-groq-70b-8192-tool-use-preview")
-
-        llm = ChatGroq(
-            temperature=0,
+        params.setdefault("temperature", 0)
+        debug_print(f"Creating Groq chat model: {model}")
+        return ChatGroq(
             model=model,
-            api_key=api_key
+            api_key=api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **params
         )
 
-        if tools:
-            llm = llm.bind_tools(tools)
-
-        debug_print(f"Initialized Groq LLM with model: {model}")
-        return LLMWrapper(llm, "groq")
-
     def fetch_models(self) -> List[str]:
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
@@ -48,5 +51,18 @@ class GroqProvider:
             debug_print(f"Error fetching Groq models: {str(e)}")
             return []
 
+    async def afetch_models(self, timeout: float) -> List[str]:
+        api_key = os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            debug_print("Groq API key not found")
+            return []
+
+        headers = {
+            "Authorization": f"Bearer {api_key}"
+        }
+        response = await get_async_http_client().get("https://api.groq.com/openai/v1/models", headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return [model['id'] for model in response.json().get('data', [])]
+
     def get_default_model(self) -> str:
         return os.environ.get("GROQ_MODEL", "llama3-groq-70b-8192-tool-use-preview")
\ No newline at end of file
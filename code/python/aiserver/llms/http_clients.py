@@ -0,0 +1,69 @@
+import os
+import threading
+import httpx
+from utils.debug_utils import debug_print
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+
+
+def http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _client_options() -> dict:
+    return {
+        "http2": http2_available(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        # LLM responses can take minutes, the SDKs set their own per-request timeouts
+        "timeout": httpx.Timeout(600, connect=10),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide httpx client, so all models and tools share one keep-alive connection pool.
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            debug_print("Creating shared HTTP client")
+            _http_client = httpx.Client(**_client_options())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide httpx async client, so all models and tools share one keep-alive connection pool.
+    """
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            debug_print("Creating shared async HTTP client")
+            _async_http_client = httpx.AsyncClient(**_client_options())
+        return _async_http_client
+
+
+async def aclose_http_clients():
+    global _http_client, _async_http_client
+    with _lock:
+        http_client, async_http_client = _http_client, _async_http_client
+        _http_client = _async_http_client = None
+    if http_client is not None:
+        http_client.close()
+    if async_http_client is not None:
+        await async_http_client.aclose()
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from langchain_core.runnables import Runnable, RunnableBinding
+from utils.debug_utils import debug_print
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/data/llm_cache/llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# Switched per request (e.g. from a bot's "llm_cache" config option), contextvars follow the request into
+# the tasks and threads the LLM calls run in
+llm_cache_enabled: ContextVar[bool] = ContextVar("llm_cache_enabled", default=True)
+
+
+class LLMCacheStore:
+    """
+    Persistent exact-match store of LLM responses in SQLite.
+
+    Entries expire after ttl seconds, and once the stored responses grow beyond max_bytes the least
+    recently used entries are evicted.
+    """
+
+    # How many writes between checks of the cache size
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = None
+        self.writes_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self.conn is None:
+            debug_print(f"Opening LLM response cache: {self.path}")
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self.conn.commit()
+        return self.conn
+
+    @staticmethod
+    def make_key(provider: str, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256("\0".join((provider, llm_string, prompt)).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            conn = self.get_connection()
+            row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, provider: str, response: str):
+        now = time.time()
+        with self.lock:
+            conn = self.get_connection()
+            conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)", (key, provider, response, now, now))
+            conn.commit()
+            self.writes += 1
+            self.writes_since_check += 1
+            if self.writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+                self.writes_since_check = 0
+                self._evict(now)
+
+    def clear(self, provider: Optional[str] = None):
+        with self.lock:
+            conn = self.get_connection()
+            if provider:
+                conn.execute("DELETE FROM llm_cache WHERE provider = ?", (provider,))
+            else:
+                conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def _evict(self, now: float):
+        conn = self.conn
+        self.expired += conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        total_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0) FROM llm_cache").fetchone()[0]
+        if total_bytes > self.max_bytes:
+            # Evict down to 90% of the limit so we don't evict again on the next write
+            target = int(self.max_bytes * 0.9)
+            keys = []
+            for key, size in conn.execute("SELECT key, LENGTH(response) FROM llm_cache ORDER BY last_used"):
+                if total_bytes <= target:
+                    break
+                keys.append((key,))
+                total_bytes -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", keys)
+            self.evicted += len(keys)
+            debug_print(f"Evicted {len(keys)} entries from the LLM response cache")
+        conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+        }
+
+
+llm_cache_store = LLMCacheStore()
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache for the chat models of one provider, backed by the shared LLMCacheStore.
+
+    LangChain looks responses up by the serialized messages (prompt) and llm_string, which holds the model
+    name, parameters such as temperature and any bound tool schemas, so the cache key covers all of them.
+    """
+
+    def __init__(self, provider: str, store: LLMCacheStore = llm_cache_store):
+        self.provider = provider
+        self.store = store
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """
+        Drop the message ids from the serialized prompt. LangGraph gives every message a random id, so
+        otherwise the same conversation never makes the same key.
+        """
+        try:
+            messages = json.loads(prompt)
+        except ValueError:
+            return prompt
+        if not isinstance(messages, list):
+            return prompt
+        for message in messages:
+            if isinstance(message, dict) and message.get("type") == "constructor" and isinstance(message.get("kwargs"), dict):
+                message["kwargs"].pop("id", None)
+        return json.dumps(messages, sort_keys=True)
+
+    def make_key(self, prompt: str, llm_string: str) -> str:
+        return self.store.make_key(self.provider, self.normalize_prompt(prompt), llm_string)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if not llm_cache_enabled.get():
+            return None
+        response = self.store.get(self.make_key(prompt, llm_string))
+        if response is None:
+            return None
+        debug_print(f"LLM response cache hit ({self.provider})")
+        return [loads(generation) for generation in json.loads(response)]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not llm_cache_enabled.get():
+            return
+        response = json.dumps([dumps(generation) for generation in return_val])
+        self.store.put(self.make_key(prompt, llm_string), self.provider, response)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear(self.provider)
+
+
+def attach_llm_cache(llm: Runnable, provider: str) -> Runnable:
+    """
+    Enable the response cache on a provider's chat model, including one wrapped by bind_tools.
+
+    :param llm: The chat model, or a RunnableBinding around it
+    :param provider: The provider name, part of the cache key
+    :return: The same llm
+    """
+    if not LLM_CACHE_ENABLED:
+        return llm
+    model = llm.bound if isinstance(llm, RunnableBinding) else llm
+    if hasattr(model, "cache"):
+        model.cache = LLMResponseCache(provider)
+    return llm
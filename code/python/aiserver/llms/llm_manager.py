@@ -1,12 +1,17 @@
 import os
-from typing import List, Dict
+import threading
+from typing import Any, List, Dict, Optional, Tuple
 from langchain.tools import BaseTool
+from langchain_core.language_models import BaseChatModel
 from llms.llm_wrapper import LLMWrapper
 from llms.anthropic_provider import AnthropicProvider
 from llms.ollama_provider import OllamaProvider
 from llms.openai_provider import OpenAIProvider
 from llms.groq_provider import GroqProvider
 from llms.fastmlx_provider import FastMLXProvider
+from llms.llm_cache import attach_llm_cache
+from llms.llm_router import RoutedChatModel, RouteTarget
+from llms.rate_limiter import RateLimitedChatModel, get_rate_limiter
 from utils.debug_utils import debug_print
 
 class LLMManager:
@@ -18,8 +23,13 @@ class LLMManager:
         "fastmlx": FastMLXProvider()
     }
 
+    # Base chat models (without tools) keyed by (provider, model, params), so their API clients and
+    # keep-alive connections are reused by every bot and conversation
+    chat_models: Dict[Tuple, BaseChatModel] = {}
+    chat_models_lock = threading.Lock()
+
     @classmethod
-    def get_llm(cls, tools: List[BaseTool] = None, llm_provider: str = None, model: str = None) -> LLMWrapper:
+    def get_llm(cls, tools: List[BaseTool] = None, llm_provider: str = None, model: str = None, **params) -> LLMWrapper:
         if llm_provider is None:
             llm_provider = os.environ.get("LLM_PROVIDER", "anthropic").lower()
 
@@ -28,16 +38,75 @@ class LLMManager:
 
         provider = cls.providers[llm_provider]
         debug_print(f"Using LLM provider: {llm_provider}")
-        result = provider.get_llm(tools, model)
-        debug_print(f"LLM provider: {result.provider}, model: {model}")
-        return result
+        model = provider.resolve_model(model)
+        llm = cls.get_chat_model(llm_provider, model, **params)
+
+        # Binding only wraps the shared model with the tool schemas
+        if tools:
+            llm = provider.bind_tools(llm, tools)
+
+        debug_print(f"LLM provider: {llm_provider}, model: {model}")
+        return LLMWrapper(llm, llm_provider)
+
+    @classmethod
+    def get_routed_llm(cls, tools: List[BaseTool] = None, targets: List[Tuple[str, Optional[str]]] = None,
+                       hedge: bool = False) -> LLMWrapper:
+        """
+        Get an LLM which fails over (and optionally hedges) across a ranked list of targets.
+
+        :param tools: The tools to bind to every target
+        :param targets: Ranked (provider, model) pairs, a model of None means the provider's default
+        :param hedge: Whether to also send slow requests to the next target
+        :return: The LLMWrapper for the routed model, with the first target's provider
+        """
+        route_targets = []
+        for llm_provider, model in targets:
+            provider = cls.providers.get(llm_provider)
+            if provider is None:
+                raise ValueError(f"Unsupported LLM provider: {llm_provider}")
+            try:
+                model = provider.resolve_model(model)
+                llm = cls.get_chat_model(llm_provider, model)
+            except ValueError as e:
+                # e.g. no API key configured for a fallback provider
+                debug_print(f"Skipping LLM target {llm_provider}:{model}: {str(e)}")
+                continue
+            route_targets.append(RouteTarget(llm_provider, model, llm,
+                                             lambda tools, provider=provider, llm=llm: provider.bind_tools(llm, tools)))
+
+        if not route_targets:
+            raise ValueError(f"None of the LLM targets are available: {targets}")
+
+        llm = RoutedChatModel(targets=route_targets, hedge=hedge)
+        if tools:
+            llm = llm.bind_tools(tools)
+
+        debug_print(f"Routing LLM requests to: {route_targets} (hedge: {hedge})")
+        return LLMWrapper(llm, route_targets[0].provider)
+
+    @classmethod
+    def get_chat_model(cls, llm_provider: str, model: str, **params: Any) -> BaseChatModel:
+        key = (llm_provider, model, tuple(sorted(params.items())))
+        with cls.chat_models_lock:
+            llm = cls.chat_models.get(key)
+            if llm is None:
+                llm = cls.providers[llm_provider].create_chat_model(model, **params)
+                # Cache hits are answered before the rate limiter is reached
+                llm = RateLimitedChatModel(llm=llm, limiter=get_rate_limiter(llm_provider, model))
+                attach_llm_cache(llm, llm_provider)
+                cls.chat_models[key] = llm
+            return llm
 
     @classmethod
     def get_default_llm(cls, tools: List[BaseTool] = None) -> LLMWrapper:
-        llm_provider = os.environ.get("LLM_PROVIDER", "anthropic").lower()
-        model = os.environ.get(f"{llm_provider.upper()}_MODEL")
+        llm_provider, model = cls.get_default_target()
         return cls.get_llm(tools, llm_provider, model)
 
+    @classmethod
+    def get_default_target(cls) -> Tuple[str, Optional[str]]:
+        llm_provider = os.environ.get("LLM_PROVIDER", "anthropic").lower()
+        return llm_provider, os.environ.get(f"{llm_provider.upper()}_MODEL")
+
     @classmethod
     def fetch_models(cls, llm_provider: str) -> List[str]:
         if llm_provider not in cls.providers:
@@ -0,0 +1,320 @@
+import asyncio
+import os
+import time
+from collections import deque
+from itertools import groupby
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from utils.debug_utils import debug_print
+
+LLM_ROUTER_COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", "30"))
+LLM_ROUTER_LATENCY_WINDOW = int(os.getenv("LLM_ROUTER_LATENCY_WINDOW", "100"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+
+# Default ranked fallback targets for all bots, e.g. "openai:gpt-4o,groq" (no model means the provider's default)
+LLM_FALLBACKS = os.getenv("LLM_FALLBACKS", "")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+
+# Minimum number of latency samples before the p95 is used for the hedge delay, and the p50 for ranking
+MIN_LATENCY_SAMPLES = 10
+
+
+class TargetStats:
+    """
+    Rolling latency and error statistics for one (provider, model) target. Latency is the time to the
+    response, or to the first chunk when streaming.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LLM_ROUTER_LATENCY_WINDOW)
+        self.recent_errors = deque(maxlen=20)
+        self.cooldown_until = 0.0
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.recent_errors.append(False)
+
+    def record_error(self, cooldown: float = 0.0):
+        self.requests += 1
+        self.errors += 1
+        self.recent_errors.append(True)
+        if cooldown:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + cooldown)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def error_rate(self) -> float:
+        return sum(self.recent_errors) / len(self.recent_errors) if self.recent_errors else 0.0
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": self.error_rate(),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "cooling_down": self.cooling_down(),
+        }
+
+
+def parse_targets(targets: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Parse "provider:model,provider" into [(provider, model), (provider, None)].
+    """
+    parsed = []
+    for target in targets.split(","):
+        target = target.strip()
+        if target:
+            provider, _, model = target.partition(":")
+            parsed.append((provider.strip().lower(), model.strip() or None))
+    return parsed
+
+
+target_stats: Dict[Tuple[str, str], TargetStats] = {}
+
+
+def get_target_stats(provider: str, model: str) -> TargetStats:
+    return target_stats.setdefault((provider, model), TargetStats())
+
+
+def router_stats() -> Dict[str, Dict[str, Any]]:
+    return {f"{provider}:{model}": stats.to_dict() for (provider, model), stats in target_stats.items()}
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and getattr(error, "response", None) is not None:
+        status_code = getattr(error.response, "status_code", None)
+    return status_code
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Rate limits, server errors, timeouts and connection failures are worth trying on another target.
+    """
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    name = error.__class__.__name__
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+def get_cooldown(error: BaseException) -> float:
+    # Rate limited targets are skipped until Retry-After (or LLM_ROUTER_COOLDOWN) has passed
+    if get_status_code(error) != 429:
+        return 0.0
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None and hasattr(response, "headers") else None
+    try:
+        return float(retry_after) if retry_after else LLM_ROUTER_COOLDOWN
+    except ValueError:
+        return LLM_ROUTER_COOLDOWN
+
+
+class RouteTarget:
+    def __init__(self, provider: str, model: str, llm: Runnable,
+                 bind_tools: Optional[Callable[[List[Any]], Runnable]] = None):
+        """
+        :param provider: The provider name
+        :param model: The model name
+        :param llm: The chat model, or a binding of it with tools
+        :param bind_tools: Binds tools to the chat model in the provider's format, None once tools are bound
+        """
+        self.provider = provider
+        self.model = model
+        self.llm = llm
+        self.bind_tools = bind_tools
+
+    def with_tools(self, tools: List[Any]) -> "RouteTarget":
+        if self.bind_tools is None:
+            raise ValueError(f"Tools are already bound to {self}")
+        return RouteTarget(self.provider, self.model, self.bind_tools(tools))
+
+    @property
+    def stats(self) -> TargetStats:
+        return get_target_stats(self.provider, self.model)
+
+    def __repr__(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model which sends each request to a ranked list of (provider, model) targets.
+
+    Requests go to the best ranked target and fail over to the next one on rate limits, 5xx errors,
+    timeouts and connection errors. Targets which are cooling down after a 429 or have mostly failed
+    recently are tried last. Otherwise the target with the lowest median latency goes first, once every
+    target it is compared with has MIN_LATENCY_SAMPLES samples; until then the configured order is kept. With hedge set, if the target hasn't answered (or, when streaming, produced
+    its first chunk) within its p95 latency, the request is also sent to the next target and the first
+    response wins. Hedging only applies to async calls.
+    """
+
+    targets: List[Any]
+    hedge: bool = False
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"targets": [repr(target) for target in self.targets], "hedge": self.hedge}
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any) -> "RoutedChatModel":
+        # Each target binds the tools in its own provider's format
+        return RoutedChatModel(targets=[target.with_tools(tools) for target in self.targets], hedge=self.hedge)
+
+    def rank_targets(self) -> List[RouteTarget]:
+        def health(target: RouteTarget) -> Tuple[bool, bool]:
+            return target.stats.cooling_down(), target.stats.error_rate() > 0.5
+
+        ranked = []
+        for _, group in groupby(sorted(self.targets, key=health), key=health):
+            group = list(group)
+            if all(len(target.stats.latencies) >= MIN_LATENCY_SAMPLES for target in group):
+                # Stable, so targets with the same latency keep the configured order
+                group.sort(key=lambda target: target.stats.percentile(0.5))
+            ranked.extend(group)
+        return ranked
+
+    @staticmethod
+    def hedge_delay(target: RouteTarget) -> float:
+        if len(target.stats.latencies) < MIN_LATENCY_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, target.stats.percentile(0.95))
+
+    @staticmethod
+    def target_config(run_manager) -> Dict[str, Any]:
+        # The routed model reports the tokens, so the target's own run is kept out of token streaming
+        return {"callbacks": run_manager.get_child() if run_manager else None, "tags": ["nostream"]}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        last_error = None
+        for target in self.rank_targets():
+            start_time = time.monotonic()
+            try:
+                message = target.llm.invoke(messages, config=self.target_config(run_manager), stop=stop, **kwargs)
+            except Exception as e:
+                target.stats.record_error(get_cooldown(e))
+                if not is_retryable_error(e):
+                    raise
+                debug_print(f"LLM target {target} failed ({str(e)}), failing over")
+                last_error = e
+                continue
+            target.stats.record_success(time.monotonic() - start_time)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise last_error
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        async def invoke(target: RouteTarget):
+            return await target.llm.ainvoke(messages, config=self.target_config(run_manager), stop=stop, **kwargs)
+
+        message = await self.route(invoke)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def first_chunk(target: RouteTarget):
+            stream = target.llm.astream(messages, config=self.target_config(run_manager), stop=stop, **kwargs)
+            try:
+                return await stream.__anext__(), stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        chunk, stream = await self.route(first_chunk, discard=lambda result: result[1].aclose())
+        try:
+            while True:
+                generation_chunk = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(generation_chunk.text, chunk=generation_chunk)
+                yield generation_chunk
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+        finally:
+            await stream.aclose()
+
+    async def route(self, start: Callable[[RouteTarget], Awaitable[Any]],
+                    discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Any:
+        """
+        Run start(target) against the ranked targets with failover and optional hedging.
+
+        :param start: Sends the request to a target and returns its result
+        :param discard: Cleans up the result of a hedged request which finished after the winner
+        :return: The first successful result
+        """
+        targets = self.rank_targets()
+        pending: Dict[asyncio.Task, RouteTarget] = {}
+        next_index = 0
+        last_error = None
+
+        async def run(target: RouteTarget):
+            start_time = time.monotonic()
+            try:
+                result = await start(target)
+            except Exception as e:
+                target.stats.record_error(get_cooldown(e))
+                raise
+            target.stats.record_success(time.monotonic() - start_time)
+            return result
+
+        def launch():
+            nonlocal next_index
+            target = targets[next_index]
+            next_index += 1
+            pending[asyncio.create_task(run(target))] = target
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_index < len(targets):
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    debug_print(f"LLM target {next(iter(pending.values()))} slower than {timeout:.1f}s, hedging with {targets[next_index]}")
+                    launch()
+                    continue
+
+                # Prefer a success if several finished at once
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    target = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    if not is_retryable_error(error):
+                        raise error
+                    debug_print(f"LLM target {target} failed ({str(error)}), failing over")
+                    last_error = error
+
+                if not pending and next_index < len(targets):
+                    launch()
+            raise last_error
+        finally:
+            for task, target in pending.items():
+                task.cancel()
+                if discard is not None:
+                    task.add_done_callback(lambda t: None if t.cancelled() or t.exception() else asyncio.ensure_future(discard(t.result())))
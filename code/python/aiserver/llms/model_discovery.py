@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+from llms.llm_manager import LLMManager
+from utils.debug_utils import debug_print
+
+MODEL_DISCOVERY_TTL = float(os.getenv("MODEL_DISCOVERY_TTL", "300"))
+MODEL_DISCOVERY_ERROR_TTL = float(os.getenv("MODEL_DISCOVERY_ERROR_TTL", "30"))
+MODEL_DISCOVERY_TIMEOUT = float(os.getenv("MODEL_DISCOVERY_TIMEOUT", "5"))
+
+
+class ModelDiscovery:
+    """
+    Cached, concurrent discovery of the models offered by each LLM provider.
+
+    Providers are queried concurrently, each with its own timeout, so a slow or unreachable provider
+    (e.g. Ollama not running) only loses its own models. Results are served from the cache; once they are
+    older than ttl the stale models are returned straight away while they are refreshed in the background.
+    Failed fetches keep the previous models and are retried after error_ttl.
+    """
+
+    def __init__(self, ttl: float = MODEL_DISCOVERY_TTL, error_ttl: float = MODEL_DISCOVERY_ERROR_TTL,
+                 timeout: float = MODEL_DISCOVERY_TIMEOUT):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        # provider -> {"models", "default_model", "expires_at", "error"}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.refresh_tasks: Dict[str, asyncio.Task] = {}
+
+    async def get_providers(self) -> List[Dict[str, Any]]:
+        """
+        :return: A list of {"provider", "models"} dicts with each provider's default model first
+        """
+        names = list(LLMManager.providers.keys())
+        entries = await asyncio.gather(*(self.get_entry(name) for name in names))
+        return [{"provider": name, "models": self.ordered_models(entry)} for name, entry in zip(names, entries)]
+
+    async def get_models(self, provider_name: str) -> List[str]:
+        if provider_name not in LLMManager.providers:
+            raise ValueError(f"Unsupported LLM provider: {provider_name}")
+        entry = await self.get_entry(provider_name)
+        return list(entry["models"])
+
+    async def refresh(self, provider_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch the models now, ignoring the cache.
+        """
+        names = [provider_name] if provider_name else list(LLMManager.providers.keys())
+        for name in names:
+            if name not in LLMManager.providers:
+                raise ValueError(f"Unsupported LLM provider: {name}")
+        entries = await asyncio.gather(*(self.fetch(name) for name in names))
+        return [{"provider": name, "models": self.ordered_models(entry)} for name, entry in zip(names, entries)]
+
+    async def get_entry(self, provider_name: str) -> Dict[str, Any]:
+        entry = self.entries.get(provider_name)
+        if entry is None:
+            # Concurrent first requests share the same fetch
+            return await asyncio.shield(self.start_fetch(provider_name))
+
+        if time.monotonic() >= entry["expires_at"] and provider_name not in self.refresh_tasks:
+            debug_print(f"Models for {provider_name} are stale, refreshing in the background")
+            self.start_fetch(provider_name)
+        return entry
+
+    def start_fetch(self, provider_name: str) -> asyncio.Task:
+        task = self.refresh_tasks.get(provider_name)
+        if task is None:
+            task = asyncio.create_task(self.fetch(provider_name))
+            self.refresh_tasks[provider_name] = task
+            task.add_done_callback(lambda _: self.refresh_tasks.pop(provider_name, None))
+        return task
+
+    async def fetch(self, provider_name: str) -> Dict[str, Any]:
+        provider = LLMManager.providers[provider_name]
+        previous = self.entries.get(provider_name)
+        start_time = time.monotonic()
+        try:
+            models = await asyncio.wait_for(provider.afetch_models(self.timeout), self.timeout)
+            entry = {
+                "models": models,
+                "default_model": provider.get_default_model_from(models),
+                "expires_at": time.monotonic() + self.ttl,
+                "error": None,
+            }
+            debug_print(f"Fetched {len(models)} models for {provider_name} in {time.monotonic() - start_time:.2f}s")
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            debug_print(f"Error fetching models for {provider_name}: {error}")
+            entry = {
+                "models": previous["models"] if previous else [],
+                "default_model": previous["default_model"] if previous else provider.get_default_model_from([]),
+                "expires_at": time.monotonic() + self.error_ttl,
+                "error": error,
+            }
+        self.entries[provider_name] = entry
+        return entry
+
+    @staticmethod
+    def ordered_models(entry: Dict[str, Any]) -> List[str]:
+        # Ensure the default model is the first in the list
+        models = [model for model in entry["models"] if model != entry["default_model"]]
+        return [entry["default_model"]] + models
+
+
+model_discovery = ModelDiscovery()
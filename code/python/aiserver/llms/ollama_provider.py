@@ -1,25 +1,30 @@
 import os
 import requests
-from typing import List
+from typing import List, Optional
 from langchain_experimental.llms.ollama_functions import OllamaFunctions, convert_to_ollama_tool
 from langchain.tools import BaseTool
+from langchain_core.runnables import Runnable
 from llms.base_llm_provider import BaseLLMProvider
-from llms.llm_wrapper import LLMWrapper
+from llms.http_clients import get_async_http_client
 from utils.debug_utils import debug_print
 
 
 class OllamaProvider(BaseLLMProvider):
-    def get_llm(self, tools: List[BaseTool] = None, model: str = None) -> LLMWrapper:
-        base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
-        model = model or os.environ.get("OLLAMA_MODEL", "llama2")
-        llm = OllamaFunctions(base_url=base_url, model=model, format="json")
+    @property
+    def provider_name(self) -> str:
+        return "ollama"
+
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        return model or os.environ.get("OLLAMA_MODEL", "llama2")
 
-        if tools:
-            converted_tools = [convert_to_ollama_tool(tool) for tool in tools]
-            llm = llm.bind_tools(converted_tools)
+    def create_chat_model(self, model: str, **params) -> OllamaFunctions:
+        base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
+        debug_print(f"Creating Ollama chat model: {model}")
+        return OllamaFunctions(base_url=base_url, model=model, format="json", **params)
 
-        debug_print(f"Initialized Ollama LLM with model: {model}")
-        return LLMWrapper(llm, "ollama")
+    def bind_tools(self, llm: OllamaFunctions, tools: List[BaseTool]) -> Runnable:
+        converted_tools = [convert_to_ollama_tool(tool) for tool in tools]
+        return llm.bind_tools(converted_tools)
 
     def fetch_models(self) -> List[str]:
         ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
@@ -35,8 +40,16 @@ class OllamaProvider(BaseLLMProvider):
             debug_print(f"Error fetching Ollama models: {str(e)}")
             return []
 
+    async def afetch_models(self, timeout: float) -> List[str]:
+        ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
+        response = await get_async_http_client().get(f"{ollama_base_url}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return [model['name'] for model in response.json().get('models', [])]
+
     def get_default_model(self) -> str:
-        available_models = self.fetch_models()
-        if available_models:
-            return available_models[0]
+        return self.get_default_model_from(self.fetch_models())
+
+    def get_default_model_from(self, models: List[str]) -> str:
+        if models:
+            return models[0]
         return "No models available"
\ No newline at end of file
@@ -1,27 +1,27 @@
 import os
 import requests
-from typing import List
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
-from langchain.tools import BaseTool
 from llms.base_llm_provider import BaseLLMProvider
-from llms.llm_wrapper import LLMWrapper
+from llms.http_clients import get_http_client, get_async_http_client
 from utils.debug_utils import debug_print
 
 
 class OpenAIProvider(BaseLLMProvider):
-    def get_llm(self, tools: List[BaseTool] = None, model: str = None) -> LLMWrapper:
+    @property
+    def provider_name(self) -> str:
+        return "openai"
+
+    def resolve_model(self, model: Optional[str] = None) -> str:
+        return model or os.environ.get("OPENAI_MODEL", "gpt-4-turbo")
+
+    def create_chat_model(self, model: str, **params) -> ChatOpenAI:
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-        model = model or os.environ.get("OPENAI_MODEL", "gpt-4-turbo")
-        llm = ChatOpenAI(model=model)
-
-        if tools:
-            llm = llm.bind_tools(tools)
-
-        debug_print(f"Initialized OpenAI LLM with model: {model}")
-        return LLMWrapper(llm, "openai")
+        debug_print(f"Creating OpenAI chat model: {model}")
+        return ChatOpenAI(model=model, http_client=get_http_client(), http_async_client=get_async_http_client(), **params)
 
     def fetch_models(self) -> List[str]:
         openai_api_key = os.environ.get("OPENAI_API_KEY")
@@ -44,5 +44,18 @@ class OpenAIProvider(BaseLLMProvider):
             debug_print(f"Error fetching OpenAI models: {str(e)}")
             return []
 
+    async def afetch_models(self, timeout: float) -> List[str]:
+        openai_api_key = os.environ.get("OPENAI_API_KEY")
+        if not openai_api_key:
+            debug_print("OpenAI API key not found")
+            return []
+
+        headers = {
+            "Authorization": f"Bearer {openai_api_key}"
+        }
+        response = await get_async_http_client().get("https://api.openai.com/v1/models", headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return [model['id'] for model in response.json().get('data', [])]
+
     def get_default_model(self) -> str:
         return os.environ.get("OPENAI_MODEL", "gpt-4-turbo")
\ No newline at end of file
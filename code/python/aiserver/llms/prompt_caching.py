@@ -0,0 +1,43 @@
+from typing import List
+from langchain_core.messages import BaseMessage
+
+# additional_kwargs flag for a message which ends a prefix of the prompt that stays the same between requests
+CACHE_BREAKPOINT = "cache_breakpoint"
+
+# Anthropic allows up to 4 cache_control breakpoints per request
+MAX_CACHE_BREAKPOINTS = 4
+
+
+def mark_cache_breakpoint(message: BaseMessage) -> BaseMessage:
+    """
+    Mark the message as the end of a cacheable prompt prefix. Providers without prompt caching ignore it.
+    """
+    return message.copy(update={"additional_kwargs": {**message.additional_kwargs, CACHE_BREAKPOINT: True}})
+
+
+def apply_cache_control(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Turn the cache breakpoint marks into Anthropic cache_control content blocks, keeping the last
+    MAX_CACHE_BREAKPOINTS of them.
+    """
+    marked = [i for i, message in enumerate(messages) if message.additional_kwargs.get(CACHE_BREAKPOINT)]
+    if not marked:
+        return messages
+
+    breakpoints = set(marked[-MAX_CACHE_BREAKPOINTS:])
+    marked = set(marked)
+    result = []
+    for i, message in enumerate(messages):
+        if i not in marked:
+            result.append(message)
+            continue
+        additional_kwargs = {key: value for key, value in message.additional_kwargs.items() if key != CACHE_BREAKPOINT}
+        content = message.content
+        if i in breakpoints:
+            blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [
+                block if isinstance(block, dict) else {"type": "text", "text": block} for block in content]
+            if blocks:
+                blocks[-1] = {**blocks[-1], "cache_control": {"type": "ephemeral"}}
+            content = blocks
+        result.append(message.copy(update={"content": content, "additional_kwargs": additional_kwargs}))
+    return result
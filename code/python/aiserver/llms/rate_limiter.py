@@ -0,0 +1,406 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from utils.debug_utils import debug_print
+
+# Defaults for every provider, overridden by {PROVIDER}_RPM etc. or {PROVIDER}_{MODEL}_RPM. 0 means unlimited.
+LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+# Tokens reserved for the response until the actual usage is known
+LLM_RATE_LIMIT_OUTPUT_TOKENS = int(os.getenv("LLM_RATE_LIMIT_OUTPUT_TOKENS", "1024"))
+
+# The queue requests wait in, one per conversation thread, so one busy conversation (or the background
+# importer) can't starve the others
+rate_limit_queue: ContextVar[str] = ContextVar("rate_limit_queue", default="background")
+
+# How many wait times are kept for the percentiles
+WAIT_TIMES_WINDOW = 500
+
+
+class _Waiter:
+    def __init__(self, queue: str, tokens: int):
+        self.queue = queue
+        self.tokens = tokens
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.event = threading.Event()
+        self.async_event: Optional[asyncio.Event] = None
+
+    def clear(self):
+        if self.async_event is not None:
+            self.async_event.clear()
+        else:
+            self.event.clear()
+
+    def wake(self):
+        if self.async_event is not None:
+            self.loop.call_soon_threadsafe(self.async_event.set)
+        else:
+            self.event.set()
+
+
+class RateLimiter:
+    """
+    Client-side limits for one provider (or model): token buckets for requests per minute and tokens
+    per minute, plus a maximum number of requests in flight.
+
+    Requests are granted one at a time, round-robin across the queues they were made from (one per
+    conversation thread) and in order within a queue. Token counts are estimated before the request and
+    corrected from the reported usage once it completes. Works from threads and from asyncio.
+    """
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0):
+        """
+        :param name: Name of the limited provider or model, for the stats
+        :param rpm: Requests per minute, 0 for unlimited
+        :param tpm: Tokens per minute, 0 for unlimited
+        :param max_in_flight: Maximum concurrent requests, 0 for unlimited
+        """
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self.lock = threading.Lock()
+        self.request_bucket = float(rpm)
+        self.token_bucket = float(tpm)
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.requests = 0
+        self.tokens = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.wait_times: Deque[float] = deque(maxlen=WAIT_TIMES_WINDOW)
+
+    @property
+    def unlimited(self) -> bool:
+        return not (self.rpm or self.tpm or self.max_in_flight)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        if self.rpm:
+            self.request_bucket = min(self.rpm, self.request_bucket + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_bucket = min(self.tpm, self.token_bucket + elapsed * self.tpm / 60)
+
+    def _head(self) -> Optional[_Waiter]:
+        return next(iter(self.queues.values()))[0] if self.queues else None
+
+    def _enqueue(self, waiter: _Waiter):
+        with self.lock:
+            self.queues.setdefault(waiter.queue, deque()).append(waiter)
+
+    def _remove(self, waiter: _Waiter):
+        with self.lock:
+            was_head = self._head() is waiter
+            queue = self.queues.get(waiter.queue)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self.queues[waiter.queue]
+            if was_head:
+                self._wake_head()
+
+    def _wake_head(self):
+        head = self._head()
+        if head is not None:
+            head.wake()
+
+    def _try_grant(self, waiter: _Waiter) -> Optional[float]:
+        """
+        Grant the request if it is next in line and within the limits, must hold the lock.
+
+        :return: None once granted, otherwise how long to wait before checking again (inf to wait until
+                 another request finishes or is granted)
+        """
+        if self._head() is not waiter:
+            return float("inf")
+        self._refill()
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return float("inf")
+        if self.rpm and self.request_bucket < 1:
+            return (1 - self.request_bucket) * 60 / self.rpm
+        # A request larger than the whole budget waits for a full bucket rather than forever
+        tokens = min(waiter.tokens, self.tpm)
+        if self.tpm and self.token_bucket < tokens:
+            return (tokens - self.token_bucket) * 60 / self.tpm
+
+        if self.rpm:
+            self.request_bucket -= 1
+        if self.tpm:
+            self.token_bucket -= waiter.tokens
+        self.in_flight += 1
+
+        # Round-robin: the queue goes to the back once it has had its turn
+        queue = self.queues.pop(waiter.queue)
+        queue.popleft()
+        if queue:
+            self.queues[waiter.queue] = queue
+        self._wake_head()
+        return None
+
+    def _granted(self, waiter: _Waiter, started_at: float):
+        wait_time = time.monotonic() - started_at
+        with self.lock:
+            self.requests += 1
+            self.wait_times.append(wait_time)
+            self.total_wait += wait_time
+            if wait_time > 0.01:
+                self.waited += 1
+        if wait_time > 1:
+            debug_print(f"Rate limiter {self.name}: request from {waiter.queue} waited {wait_time:.1f}s")
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None):
+        """
+        Finish a granted request, correcting the token budget with the actual usage when known.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            tokens = estimated_tokens if actual_tokens is None else actual_tokens
+            self.tokens += tokens
+            if self.tpm:
+                # Can go negative when the estimate was too low, delaying the next requests
+                self.token_bucket = min(self.tpm, self.token_bucket + estimated_tokens - tokens)
+            self._wake_head()
+
+    def acquire(self, tokens: int = 1, queue: Optional[str] = None):
+        if self.unlimited:
+            return
+        waiter = _Waiter(queue or rate_limit_queue.get(), tokens)
+        started_at = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self.lock:
+                    waiter.clear()
+                    delay = self._try_grant(waiter)
+                if delay is None:
+                    break
+                waiter.event.wait(None if delay == float("inf") else delay)
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._granted(waiter, started_at)
+
+    async def aacquire(self, tokens: int = 1, queue: Optional[str] = None):
+        if self.unlimited:
+            return
+        waiter = _Waiter(queue or rate_limit_queue.get(), tokens)
+        waiter.loop = asyncio.get_running_loop()
+        waiter.async_event = asyncio.Event()
+        started_at = time.monotonic()
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self.lock:
+                    waiter.clear()
+                    delay = self._try_grant(waiter)
+                if delay is None:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.async_event.wait(), None if delay == float("inf") else delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._remove(waiter)
+            raise
+        self._granted(waiter, started_at)
+
+    @contextmanager
+    def limit(self, tokens: int) -> Iterator[Dict[str, Optional[int]]]:
+        """
+        Hold a request slot for the duration of the block. Set "tokens" in the yielded dict to the actual usage.
+        """
+        self.acquire(tokens)
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            if not self.unlimited:
+                self.release(tokens, usage["tokens"])
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int) -> AsyncIterator[Dict[str, Optional[int]]]:
+        await self.aacquire(tokens)
+        usage = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            if not self.unlimited:
+                self.release(tokens, usage["tokens"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            wait_times = sorted(self.wait_times)
+            queued = sum(len(queue) for queue in self.queues.values())
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "queued": queued,
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "waited": self.waited,
+                "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+                "p95_wait": wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))] if wait_times else 0.0,
+                "max_wait": wait_times[-1] if wait_times else 0.0,
+            }
+
+
+def _env_limit(setting: str, provider: str, model: Optional[str], default: int) -> Tuple[int, bool]:
+    """
+    :return: The limit and whether it was set for the model specifically
+    """
+    if model:
+        value = os.getenv(f"{provider}_{re.sub(r'[^A-Za-z0-9]+', '_', model)}_{setting}".upper())
+        if value:
+            return int(value), True
+    value = os.getenv(f"{provider}_{setting}".upper())
+    return (int(value) if value else default), False
+
+
+rate_limiters: Dict[str, RateLimiter] = {}
+rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: Optional[str] = None) -> RateLimiter:
+    """
+    The limiter for a provider's model. Models share their provider's limiter (and budget) unless limits
+    are set for the model itself, e.g. OPENAI_GPT_4O_TPM.
+    """
+    limits = {setting: _env_limit(setting, provider, model, default) for setting, default in
+              (("RPM", LLM_RATE_LIMIT_RPM), ("TPM", LLM_RATE_LIMIT_TPM), ("MAX_IN_FLIGHT", LLM_MAX_IN_FLIGHT))}
+    name = f"{provider}:{model}" if any(model_specific for _, model_specific in limits.values()) else provider
+    with rate_limiters_lock:
+        limiter = rate_limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(name, limits["RPM"][0], limits["TPM"][0], limits["MAX_IN_FLIGHT"][0])
+            debug_print(f"Rate limiter {name}: rpm={limiter.rpm}, tpm={limiter.tpm}, max_in_flight={limiter.max_in_flight}")
+            rate_limiters[name] = limiter
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in rate_limiters.items()}
+
+
+def estimate_tokens(texts: List[Any]) -> int:
+    # Roughly 4 characters per token, good enough for budgeting
+    return sum(len(text if isinstance(text, str) else str(text)) for text in texts) // 4 + 1
+
+
+def get_total_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Chat model which holds a slot from its rate limiter for each request to the wrapped model.
+
+    Responses served from the LLM response cache don't use any of the budget, as the cache is attached to
+    this model. Tools are bound in the wrapped model's format and passed through on each request.
+    """
+
+    llm: Any
+    limiter: Any
+    output_tokens: int = LLM_RATE_LIMIT_OUTPUT_TOKENS
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # Same as the wrapped model, so LLM cache keys don't change
+        return self.llm._identifying_params
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any) -> Runnable:
+        bound = self.llm.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        output_tokens = getattr(self.llm, "max_tokens", None) or self.output_tokens
+        return estimate_tokens([message.content for message in messages]) + output_tokens
+
+    @staticmethod
+    def result_chunk(result: ChatResult) -> ChatGenerationChunk:
+        # For models without streaming support, the whole response as one chunk
+        message = result.generations[0].message
+        return ChatGenerationChunk(message=AIMessageChunk(content=message.content,
+                                                          additional_kwargs=message.additional_kwargs,
+                                                          tool_calls=getattr(message, "tool_calls", [])))
+
+    def supports_streaming(self) -> bool:
+        return type(self.llm)._stream is not BaseChatModel._stream or type(self.llm)._astream is not BaseChatModel._astream
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        with self.limiter.limit(self.estimate_tokens(messages)) as usage:
+            result = self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            usage["tokens"] = get_total_tokens(result.generations[0].message) if result.generations else None
+            return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        async with self.limiter.alimit(self.estimate_tokens(messages)) as usage:
+            result = await self.llm._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            usage["tokens"] = get_total_tokens(result.generations[0].message) if result.generations else None
+            return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if type(self.llm)._stream is BaseChatModel._stream:
+            yield self.result_chunk(self._generate(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return
+        with self.limiter.limit(self.estimate_tokens(messages)) as usage:
+            for chunk in self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage["tokens"] = get_total_tokens(chunk.message) or usage["tokens"]
+                yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if not self.supports_streaming():
+            yield self.result_chunk(await self._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return
+        async with self.limiter.alimit(self.estimate_tokens(messages)) as usage:
+            async for chunk in self.llm._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage["tokens"] = get_total_tokens(chunk.message) or usage["tokens"]
+                yield chunk
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper which takes its requests from the provider's rate limiter, so indexing shares the
+    budget with the chat models.
+    """
+
+    def __init__(self, embeddings: Embeddings, limiter: RateLimiter):
+        self.embeddings = embeddings
+        self.limiter = limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.limiter.limit(estimate_tokens(texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.limiter.limit(estimate_tokens([text])):
+            return self.embeddings.embed_query(text)
@@ -1,35 +1,61 @@
 import json
 import asyncio
-from typing import List, Dict, Any, Generator, Optional, AsyncGenerator
+from typing import List, Dict, Any, Generator, Optional, AsyncGenerator, Tuple
 from bots.async_bot_interface import AsyncBotInterface
 from utils.debug_utils import debug_print
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, BaseMessage, ToolMessage
 from langchain_core.runnables.config import RunnableConfig
 from mylangchain.langchain_bot_interface import LangchainBotInterface
 from processors.persist_files_in_response import persist_files_in_response
 from langgraph.checkpoint.aiosqlite import AsyncSqliteSaver
+from mylangchain.checkpointer_service import CheckpointerService
+from llms.llm_cache import llm_cache_enabled
+from llms.rate_limiter import rate_limit_queue
+from mylangchain.retriever.retriever_builder import retriever_builder
 
 
 class AsyncLangchainBotInterface(LangchainBotInterface, AsyncBotInterface):
+    # Default for the "stream_tokens" config option, can be overridden per request
+    stream_tokens: bool = False
 
     # An opportunity to perform any asynchronous initialization
     # self.llm will already be populated with the correct LLM
     async def _async_lazy_init(self):
         pass
 
+    # An opportunity to release anything only needed while a request is running, once its graph run is over
+    async def _async_request_done(self):
+        pass
+
     async def lazy_init_langchain_async(self, llm_provider=None, llm_model=None):
         llm_changed = self._update_llm_wrapper(llm_provider, llm_model)
         await self._async_lazy_init()
-        if not self.is_initialized or llm_changed:
-            self.lazy_init_retriever()
+        retriever_changed = await self.lazy_init_retriever_async()
+        if not self.is_initialized or llm_changed or retriever_changed:
+            await self.get_checkpointer_async()
             self.graph = self.create_graph()
             self.is_initialized = True
 
-    def get_checkpointer(self, checkpointer_type: str = "sqlite", **kwargs):
+    async def lazy_init_retriever_async(self) -> bool:
+        # Cheap once cached, picks up the new retriever when the collection has been re-indexed
+        if not self.retriever_name:
+            return False
+        retriever = await retriever_builder.get_retriever_async(self.retriever_name)
+        changed = retriever is not self.retriever
+        self.retriever = retriever
+        return changed
+
+    def get_checkpointer(self, checkpointer_type: str = None, **kwargs):
+        # Normally already created by get_checkpointer_async, fall back to an in-memory checkpointer
         if self.checkpointer is None:
             self.checkpointer = AsyncSqliteSaver.from_conn_string(":memory:")
         return self.checkpointer
 
+    async def get_checkpointer_async(self, checkpointer_type: str = None, **kwargs):
+        if self.checkpointer is None:
+            self.checkpointer = await CheckpointerService.get_async_checkpointer(checkpointer_type, **kwargs)
+        return self.checkpointer
+
     async def process_request_async(self, user_input: str, context: str, **kwargs) -> AsyncGenerator[Dict[str, Any], None]:
         debug_print(f"{self.__class__.__name__} processing request asynchronously. User input: {user_input}")
         debug_print(f"Context: {context}")
@@ -38,17 +64,31 @@ class AsyncLangchainBotInterface(LangchainBotInterface, AsyncBotInterface):
         thread_id = kwargs.pop('thread_id', '1')
         llm_provider = kwargs.pop('llm_provider', None)
         llm_model = kwargs.pop('llm_model', None)
+        stream_tokens = kwargs.pop('stream_tokens', self.stream_tokens)
+        llm_cache_enabled.set(kwargs.pop('llm_cache', self.llm_cache))
+        rate_limit_queue.set(f"{self.bot_type}:{thread_id}")
 
         await self.lazy_init_langchain_async(llm_provider, llm_model)
 
-        input_message = f"Context: {context}\n\nthread_id: {thread_id}\n\nUser query: {user_input}"
+        input_message = self.format_input_message(user_input, context, thread_id)
         config = self.getGraphConfig(thread_id)
 
         last_event = None
         event_count = 0
         try:
-            debug_print("Starting graph stream")
-            async for event in self.graph.astream({"messages": [("user", input_message)]}, config):
+            debug_print(f"Starting graph stream (stream_tokens: {stream_tokens})")
+            async for stream_mode, event in self.astream_graph({"messages": [("user", input_message)]}, config, stream_tokens):
+                if stream_mode == "messages":
+                    delta = self.extract_delta_content(*event)
+                    if delta:
+                        # A new LLM turn has started so the held back event can't be the final one
+                        if last_event is not None:
+                            async for response in self.process_and_emit_content_async(last_event, "intermediate", thread_id):
+                                yield response
+                            last_event = None
+                        yield {"type": "delta", "content": delta}
+                    continue
+
                 event_count += 1
                 debug_print(f"Event {event_count}: {event}")
 
@@ -74,6 +114,55 @@ class AsyncLangchainBotInterface(LangchainBotInterface, AsyncBotInterface):
         except Exception as e:
             self.logger.error(f"Error in process_request_async: {str(e)}", exc_info=True)
             yield {"type": "error", "content": f"An error occurred: {str(e)}"}
+        finally:
+            await self._async_request_done()
+
+    async def astream_graph(self, graph_input: Dict[str, Any], config: RunnableConfig, stream_tokens: bool) -> \
+    AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Stream the graph as (stream_mode, event) tuples.
+
+        Node updates are always streamed so intermediate/final classification keeps working. When
+        stream_tokens is set, LLM message chunks are interleaved as "messages" events as they are generated.
+        The installed langgraph has no "messages" stream mode, so they are taken from the graph's
+        on_chat_model_stream events, with the graph's own updates arriving as its top-level on_chain_stream events.
+
+        :param graph_input: The input for the graph
+        :param config: The graph config for the current thread
+        :param stream_tokens: Whether to also stream LLM message chunks
+        :return: An async generator of (stream_mode, event) tuples
+        """
+        if stream_tokens:
+            async for event in self.graph.astream_events(graph_input, config, version="v2", stream_mode="updates"):
+                if event["event"] == "on_chat_model_stream":
+                    yield "messages", (event["data"]["chunk"], {**event["metadata"], "tags": event["tags"]})
+                elif event["event"] == "on_chain_stream" and not event["parent_ids"]:
+                    # Streamed chunks of nodes and subgraphs have a parent, only the graph's updates don't
+                    yield "updates", event["data"]["chunk"]
+        else:
+            async for event in self.graph.astream(graph_input, config):
+                yield "updates", event
+
+    def extract_delta_content(self, message_chunk: BaseMessage, metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Extract the text delta from a streamed message chunk. Tool call chunks, anything other than AI
+        message chunks (e.g. tool results) and models tagged "nostream" are ignored.
+
+        :param message_chunk: The message chunk from the graph's on_chat_model_stream event
+        :param metadata: The event's metadata, with its tags
+        :return: The text delta, or None if there is nothing to emit
+        """
+        if not isinstance(message_chunk, AIMessageChunk) or "nostream" in metadata.get("tags", []):
+            return None
+
+        content = message_chunk.content
+        if isinstance(content, list):
+            # Anthropic streams content blocks e.g. [{"type": "text", "text": "...", "index": 0}]
+            content = "".join(
+                block.get("text", "") for block in content
+                if isinstance(block, dict) and block.get("type") == "text"
+            )
+        return content or None
 
     async def process_request_async_final_only(self, user_input: str, context: str, **kwargs) -> str:
         debug_print(
@@ -187,3 +276,12 @@ class AsyncLangchainBotInterface(LangchainBotInterface, AsyncBotInterface):
         """
         debug_print(f"Deciding whether to emit response asynchronously (step_type: {step_type})")
         return True  # Emit all responses by default
+
+    def get_config_options(self) -> Dict[str, Any]:
+        config_options = super().get_config_options()
+        config_options["stream_tokens"] = {
+            "type": "boolean",
+            "description": "Stream LLM tokens as 'delta' responses while they are generated",
+            "default": self.stream_tokens
+        }
+        return config_options
@@ -1,12 +1,254 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Dict, Tuple
+import aiosqlite
+from psycopg2.pool import ThreadedConnectionPool
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.aiosqlite import AsyncSqliteSaver
 from langgraph.checkpoint.base import BaseCheckpointSaver
+from mylangchain.postgres_checkpointer import PostgresSaver
+from utils.debug_utils import debug_print
+
+# Checkpointer selection, e.g. CHECKPOINTER_TYPE=sqlite with CHECKPOINTER_SQLITE_PATH=/data/checkpoints/checkpoints.sqlite
+# or CHECKPOINTER_TYPE=postgres with CHECKPOINTER_POSTGRES_URI pointing at the Supabase Postgres
+CHECKPOINTER_TYPE = os.getenv("CHECKPOINTER_TYPE", "sqlite").lower()
+CHECKPOINTER_SQLITE_PATH = os.getenv("CHECKPOINTER_SQLITE_PATH", ":memory:")
+CHECKPOINTER_POSTGRES_URI = os.getenv("CHECKPOINTER_POSTGRES_URI")
+CHECKPOINTER_POOL_SIZE = int(os.getenv("CHECKPOINTER_POOL_SIZE", "10"))
+
+# Retention policy: keep the last N checkpoints per thread (0 disables pruning)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "600"))
+
+SQLITE_BUSY_TIMEOUT = 30
+
 
 class CheckpointerService:
+    """
+    Creates checkpointers for the LangGraph bots.
+
+    In-memory SQLite checkpointers are created per bot instance. File-backed SQLite and Postgres checkpointers
+    are durable and shared by every bot in the process (one WAL-mode connection per database file, one
+    connection pool per Postgres URI, used by both the sync and async bots) so conversations survive restarts
+    and can be shared between workers.
+    """
+    _checkpointers: Dict[Tuple[str, str, bool], BaseCheckpointSaver] = {}
+    # In-memory checkpointers owned by bot instances, tracked so they can be pruned too
+    _instance_checkpointers = weakref.WeakValueDictionary()
+    _lock = asyncio.Lock()
+    # Shared sync checkpointers can be requested from worker threads (e.g. the async Postgres path)
+    _shared_lock = threading.Lock()
+
     @staticmethod
-    def get_checkpointer(checkpointer_type: str = "sqlite", **kwargs) -> BaseCheckpointSaver:
+    def get_checkpointer(checkpointer_type: str = None, **kwargs) -> BaseCheckpointSaver:
+        checkpointer_type = checkpointer_type or CHECKPOINTER_TYPE
         if checkpointer_type == "sqlite":
-            conn_string = kwargs.get("conn_string", ":memory:")
-            return SqliteSaver.from_conn_string(conn_string)
+            conn_string = kwargs.get("conn_string", CHECKPOINTER_SQLITE_PATH)
+            if conn_string == ":memory:":
+                return CheckpointerService._track(SqliteSaver.from_conn_string(conn_string))
+            return CheckpointerService._get_shared(
+                ("sqlite", conn_string, False),
+                lambda: SqliteSaver(CheckpointerService._connect_sqlite(conn_string))
+            )
+        elif checkpointer_type == "postgres":
+            conn_string = kwargs.get("conn_string", CHECKPOINTER_POSTGRES_URI)
+            return CheckpointerService._get_shared(
+                ("postgres", conn_string, False),
+                lambda: CheckpointerService._create_postgres_saver(conn_string)
+            )
         # Add more checkpointer types here as needed
         else:
-            raise ValueError(f"Unsupported checkpointer type: {checkpointer_type}")
\ No newline at end of file
+            raise ValueError(f"Unsupported checkpointer type: {checkpointer_type}")
+
+    @staticmethod
+    async def get_async_checkpointer(checkpointer_type: str = None, **kwargs) -> BaseCheckpointSaver:
+        checkpointer_type = checkpointer_type or CHECKPOINTER_TYPE
+        if checkpointer_type == "sqlite":
+            conn_string = kwargs.get("conn_string", CHECKPOINTER_SQLITE_PATH)
+            if conn_string == ":memory:":
+                return CheckpointerService._track(AsyncSqliteSaver.from_conn_string(conn_string))
+            key = ("sqlite", conn_string, True)
+        elif checkpointer_type == "postgres":
+            # The Postgres saver serves async requests from worker threads, so the sync one is shared
+            conn_string = kwargs.get("conn_string", CHECKPOINTER_POSTGRES_URI)
+            return await asyncio.to_thread(CheckpointerService.get_checkpointer, "postgres", conn_string=conn_string)
+        else:
+            raise ValueError(f"Unsupported checkpointer type: {checkpointer_type}")
+
+        async with CheckpointerService._lock:
+            if key not in CheckpointerService._checkpointers:
+                CheckpointerService._prepare_sqlite_file(conn_string)
+                checkpointer = AsyncSqliteSaver(conn=aiosqlite.connect(conn_string, timeout=SQLITE_BUSY_TIMEOUT))
+                debug_print(f"Created shared {checkpointer_type} checkpointer")
+                CheckpointerService._checkpointers[key] = checkpointer
+            return CheckpointerService._checkpointers[key]
+
+    @staticmethod
+    def is_shared(checkpointer: BaseCheckpointSaver) -> bool:
+        return any(checkpointer is shared for shared in CheckpointerService._checkpointers.values())
+
+    @staticmethod
+    async def close_checkpointer(checkpointer: BaseCheckpointSaver):
+        """
+        Close a checkpointer created for a single bot instance. Shared checkpointers are left open.
+        """
+        if checkpointer is None or CheckpointerService.is_shared(checkpointer):
+            return
+        conn = getattr(checkpointer, "conn", None)
+        if conn is not None:
+            if isinstance(conn, aiosqlite.Connection):
+                if conn.is_alive():
+                    await conn.close()
+            else:
+                conn.close()
+
+    @staticmethod
+    async def close_all():
+        debug_print(f"Closing {len(CheckpointerService._checkpointers)} shared checkpointers")
+        for (checkpointer_type, _, is_async), checkpointer in CheckpointerService._checkpointers.items():
+            try:
+                if checkpointer_type == "sqlite":
+                    if is_async:
+                        if checkpointer.conn.is_alive():
+                            await checkpointer.conn.close()
+                    else:
+                        checkpointer.conn.close()
+                elif checkpointer_type == "postgres":
+                    checkpointer.close()
+            except Exception as e:
+                debug_print(f"Error closing {checkpointer_type} checkpointer: {str(e)}")
+        CheckpointerService._checkpointers.clear()
+
+    @staticmethod
+    async def prune_checkpoints(keep_last: int = CHECKPOINT_KEEP_LAST) -> int:
+        """
+        Delete all but the last keep_last checkpoints of every thread (and their pending writes)
+        from all known checkpointers.
+
+        :param keep_last: The number of checkpoints to keep per thread
+        :return: The number of checkpoints deleted
+        """
+        if keep_last <= 0:
+            return 0
+
+        deleted = 0
+        checkpointers = [(key[0], key[2], checkpointer)
+                         for key, checkpointer in CheckpointerService._checkpointers.items()]
+        checkpointers += [("sqlite", isinstance(checkpointer, AsyncSqliteSaver), checkpointer)
+                          for checkpointer in list(CheckpointerService._instance_checkpointers.values())]
+        for checkpointer_type, is_async, checkpointer in checkpointers:
+            try:
+                if checkpointer_type == "sqlite":
+                    if is_async:
+                        deleted += await CheckpointerService._prune_async_sqlite(checkpointer, keep_last)
+                    else:
+                        deleted += await asyncio.to_thread(CheckpointerService._prune_sqlite, checkpointer, keep_last)
+                elif checkpointer_type == "postgres":
+                    deleted += await asyncio.to_thread(checkpointer.prune, keep_last)
+            except Exception as e:
+                debug_print(f"Error pruning {checkpointer_type} checkpointer: {str(e)}")
+
+        if deleted:
+            debug_print(f"Pruned {deleted} checkpoints, keeping the last {keep_last} per thread")
+        return deleted
+
+    @staticmethod
+    def _sqlite_prune_statements(columns, keep_last: int):
+        # langgraph < 0.2 keys checkpoints by thread_ts, later versions by (checkpoint_ns, checkpoint_id)
+        if "thread_ts" in columns:
+            partition, id_column, writes_match = "thread_id", "thread_ts", "w.thread_ts = c.thread_ts"
+        else:
+            partition = "thread_id, checkpoint_ns"
+            id_column = "checkpoint_id"
+            writes_match = "w.checkpoint_ns = c.checkpoint_ns AND w.checkpoint_id = c.checkpoint_id"
+        delete_checkpoints = f"""
+            DELETE FROM checkpoints WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {id_column} DESC) AS rn
+                    FROM checkpoints
+                ) WHERE rn > {int(keep_last)}
+            )"""
+        delete_writes = f"""
+            DELETE FROM writes AS w WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints AS c WHERE c.thread_id = w.thread_id AND {writes_match}
+            )"""
+        return delete_checkpoints, delete_writes
+
+    @staticmethod
+    def _prune_sqlite(checkpointer: SqliteSaver, keep_last: int) -> int:
+        lock = getattr(checkpointer, "lock", None)
+        if lock is not None:
+            lock.acquire()
+        try:
+            conn = checkpointer.conn
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(checkpoints)")]
+            if not columns:
+                return 0
+            delete_checkpoints, delete_writes = CheckpointerService._sqlite_prune_statements(columns, keep_last)
+            deleted = conn.execute(delete_checkpoints).rowcount
+            conn.execute(delete_writes)
+            conn.commit()
+            return deleted
+        finally:
+            if lock is not None:
+                lock.release()
+
+    @staticmethod
+    async def _prune_async_sqlite(checkpointer: AsyncSqliteSaver, keep_last: int) -> int:
+        if not checkpointer.conn.is_alive():
+            return 0
+        async with checkpointer.lock:
+            conn = checkpointer.conn
+            async with conn.execute("PRAGMA table_info(checkpoints)") as cursor:
+                columns = [row[1] for row in await cursor.fetchall()]
+            if not columns:
+                return 0
+            delete_checkpoints, delete_writes = CheckpointerService._sqlite_prune_statements(columns, keep_last)
+            async with conn.execute(delete_checkpoints) as cursor:
+                deleted = cursor.rowcount
+            await conn.execute(delete_writes)
+            await conn.commit()
+            return deleted
+
+    @staticmethod
+    def _track(checkpointer: BaseCheckpointSaver) -> BaseCheckpointSaver:
+        CheckpointerService._instance_checkpointers[id(checkpointer)] = checkpointer
+        return checkpointer
+
+    @staticmethod
+    def _get_shared(key: Tuple[str, str, bool], factory) -> BaseCheckpointSaver:
+        with CheckpointerService._shared_lock:
+            if key not in CheckpointerService._checkpointers:
+                debug_print(f"Created shared {key[0]} checkpointer")
+                CheckpointerService._checkpointers[key] = factory()
+            return CheckpointerService._checkpointers[key]
+
+    @staticmethod
+    def _prepare_sqlite_file(path: str):
+        # WAL mode is persistent so setting it once lets readers in other workers run alongside the writer
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    @staticmethod
+    def _connect_sqlite(path: str) -> sqlite3.Connection:
+        CheckpointerService._prepare_sqlite_file(path)
+        conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _require_postgres_uri(conn_string: str):
+        if not conn_string:
+            raise ValueError("CHECKPOINTER_POSTGRES_URI must be set to use the postgres checkpointer")
+
+    @staticmethod
+    def _create_postgres_saver(conn_string: str) -> PostgresSaver:
+        CheckpointerService._require_postgres_uri(conn_string)
+        pool = ThreadedConnectionPool(1, CHECKPOINTER_POOL_SIZE, dsn=conn_string)
+        checkpointer = PostgresSaver(pool, CHECKPOINTER_POOL_SIZE)
+        checkpointer.setup()
+        return checkpointer
@@ -1,9 +1,13 @@
 import json
 from abc import abstractmethod
-from typing import List, Dict, Any, Generator, Optional
+from typing import List, Dict, Any, Generator, Optional, Tuple
 from bots.sync_bot_interface import SyncBotInterface
 from langgraph.graph import StateGraph
 from llms.llm_manager import LLMManager
+from llms.llm_cache import llm_cache_enabled
+from llms.rate_limiter import rate_limit_queue
+from llms.llm_router import LLM_FALLBACKS, LLM_HEDGE_ENABLED, parse_targets
+from llms.prompt_caching import mark_cache_breakpoint
 from utils.debug_utils import debug_print
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables.config import RunnableConfig
@@ -11,10 +15,23 @@ from mylangchain.checkpointer_service import CheckpointerService
 from processors.persist_files_in_response import persist_files_in_response
 from mylangchain.retriever_manager import RetrieverManager
 from mylangchain.retriever.retriever_builder import retriever_builder
+from mylangchain.retriever.semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticResponseCache, get_semantic_cache
 import logging
 
 
 class LangchainBotInterface(SyncBotInterface):
+    # Default for the "llm_cache" config option, set to False for bots which should never reuse LLM responses
+    llm_cache: bool = True
+
+    # Whether the thread_id is included in the user message, for bots whose prompts build paths from it. Left
+    # out otherwise, so identical requests in different threads make identical (cacheable) prompts
+    thread_id_in_prompt: bool = False
+
+    # Ranked (provider, model) targets to fail over to when the selected LLM is rate limited or failing,
+    # and whether slow requests are hedged to the next target
+    llm_fallbacks: List[Tuple[str, Optional[str]]] = parse_targets(LLM_FALLBACKS)
+    llm_hedge: bool = LLM_HEDGE_ENABLED
+
     def __init__(self, retriever_name: Optional[str] = None, default_llm_provider: Optional[str] = None, default_llm_model: Optional[str] = None):
         self.checkpointer = None
         self.graph = None
@@ -37,31 +54,77 @@ class LangchainBotInterface(SyncBotInterface):
     def get_tools(self) -> List:
         pass
 
+    @staticmethod
+    def with_static_prefix(messages: List[BaseMessage], *prefixes: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Put the prompt messages which stay the same between turns ahead of the conversation, marking the end
+        of each prefix as a cache breakpoint so providers with prompt caching (Anthropic) can reuse them.
+
+        :param messages: The conversation messages
+        :param prefixes: Groups of prompt messages, ordered from the most to the least stable
+        :return: The prefixes followed by the conversation
+        """
+        prefix_messages = []
+        for prefix in prefixes:
+            if prefix:
+                prefix_messages.extend(prefix[:-1])
+                prefix_messages.append(mark_cache_breakpoint(prefix[-1]))
+        return prefix_messages + list(messages)
+
+    def format_input_message(self, user_input: str, context: str, thread_id: str) -> str:
+        if self.thread_id_in_prompt:
+            return f"Context: {context}\n\nthread_id: {thread_id}\n\nUser query: {user_input}"
+        return f"Context: {context}\n\nUser query: {user_input}"
+
     def getGraphConfig(self, thread_id: str) -> RunnableConfig:
-        return RunnableConfig(recursion_limit=50, configurable={"thread_id": thread_id})
+        # Checkpointers can be shared between bots so keep each bot's state for a thread separate
+        return RunnableConfig(recursion_limit=50, configurable={"thread_id": f"{self.bot_type}:{thread_id}"})
 
-    def get_checkpointer(self, checkpointer_type: str = "sqlite", **kwargs):
+    def get_checkpointer(self, checkpointer_type: str = None, **kwargs):
         if self.checkpointer is None:
             self.checkpointer = CheckpointerService.get_checkpointer(checkpointer_type, **kwargs)
         return self.checkpointer
 
+    async def aclose(self):
+        # Close the checkpointer connection (unless shared) so its pending writes are flushed and the memory is released
+        await CheckpointerService.close_checkpointer(self.checkpointer)
+        self.checkpointer = None
+        self.graph = None
+        self.is_initialized = False
+
     def get_retriever(self, name: str):
         return self.retriever_manager.get_retriever(name)
 
+    async def get_retriever_async(self, name: str):
+        return await self.retriever_manager.get_retriever_async(name)
+
+    def get_response_cache(self) -> Optional[SemanticResponseCache]:
+        """
+        The semantic response cache for this bot's retriever, or None unless SEMANTIC_CACHE_ENABLED is set.
+        """
+        if not SEMANTIC_CACHE_ENABLED or self.retriever is None or not hasattr(self.retriever, "vectorstore"):
+            return None
+        return get_semantic_cache(self.retriever_name, self.retriever.vectorstore.embeddings)
+
     def initialize(self, llm_provider=None, llm_model=None):
         # This method is now a no-op
         pass
 
     def lazy_init_langchain(self, llm_provider=None, llm_model=None):
         llm_changed = self._update_llm_wrapper(llm_provider, llm_model)
-        if not self.is_initialized or llm_changed:
-            self.lazy_init_retriever()
+        retriever_changed = self.lazy_init_retriever()
+        if not self.is_initialized or llm_changed or retriever_changed:
             self.graph = self.create_graph()
             self.is_initialized = True
 
-    def lazy_init_retriever(self):
-        if self.retriever_name and self.retriever is None:
-            self.retriever = retriever_builder.get_retriever(self.retriever_name)
+    def lazy_init_retriever(self) -> bool:
+        # Cheap once cached, picks up the new retriever when the collection has been re-indexed
+        if not self.retriever_name:
+            return False
+        retriever = retriever_builder.get_retriever(self.retriever_name)
+        changed = retriever is not self.retriever
+        self.retriever = retriever
+        return changed
 
     def _update_llm_wrapper(self, llm_provider, llm_model) -> bool:
         debug_print("Updating LLM wrapper")
@@ -76,7 +139,12 @@ class LangchainBotInterface(SyncBotInterface):
 
         if should_update:
             debug_print(f"Updating LLM wrapper. New provider: {llm_provider}, New model: {llm_model}")
-            if llm_provider and llm_model:
+            if self.llm_fallbacks:
+                primary = (llm_provider, llm_model) if llm_provider and llm_model else LLMManager.get_default_target()
+                targets = [primary] + [target for target in self.llm_fallbacks if target != primary]
+                self.llm_wrapper = LLMManager.get_routed_llm(self.get_tools(), targets, hedge=self.llm_hedge)
+                self.llm = self.llm_wrapper.llm
+            elif llm_provider and llm_model:
                 self.llm_wrapper = LLMManager.get_llm(self.get_tools(), llm_provider, llm_model)
                 self.llm = self.llm_wrapper.llm
             else:
@@ -121,10 +189,12 @@ class LangchainBotInterface(SyncBotInterface):
         thread_id = kwargs.pop('thread_id', '1')
         llm_provider = kwargs.pop('llm_provider', None)
         llm_model = kwargs.pop('llm_model', None)
+        llm_cache_enabled.set(kwargs.pop('llm_cache', self.llm_cache))
+        rate_limit_queue.set(f"{self.bot_type}:{thread_id}")
 
         self.lazy_init_langchain(llm_provider, llm_model)
 
-        input_message = f"Context: {context}\n\nthread_id: {thread_id}\n\nUser query: {user_input}"
+        input_message = self.format_input_message(user_input, context, thread_id)
         config = self.getGraphConfig(thread_id)
 
         last_event = None
@@ -247,5 +317,10 @@ class LangchainBotInterface(SyncBotInterface):
                 "type": "string",
                 "description": "The thread ID for conversation continuity",
                 "default": "1"
+            },
+            "llm_cache": {
+                "type": "boolean",
+                "description": "Reuse cached LLM responses for identical requests",
+                "default": self.llm_cache
             }
         }
\ No newline at end of file
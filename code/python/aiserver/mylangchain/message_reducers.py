@@ -0,0 +1,67 @@
+import os
+from typing import Callable, List
+from langchain_core.messages import AnyMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+MESSAGE_WINDOW_MAX_MESSAGES = int(os.getenv("MESSAGE_WINDOW_MAX_MESSAGES", "40"))
+
+SUMMARY_MESSAGE_ID = "message-window-summary"
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def message_window(max_messages: int = MESSAGE_WINDOW_MAX_MESSAGES, summarize: bool = True,
+                   summary_chars_per_message: int = 300, max_summary_chars: int = 4000) -> Callable:
+    """
+    Create a reducer for the "messages" state key which behaves like add_messages but only keeps the
+    last max_messages messages, so long threads don't grow the checkpoints and the prompt without bound.
+
+    The window always starts at a user message so tool calls are never separated from their results.
+    When summarize is set, the dropped messages are folded into a single summary message (the start of
+    each message, up to max_summary_chars in total) at the top of the window.
+
+    Usage:
+        class State(TypedDict):
+            messages: Annotated[List, message_window(max_messages=20)]
+
+    :param max_messages: The maximum number of messages to keep (excluding the summary message)
+    :param summarize: Whether to keep a summary of the dropped messages
+    :param summary_chars_per_message: The number of characters of each dropped message to keep in the summary
+    :param max_summary_chars: The maximum size of the summary, older parts are dropped first
+    :return: The reducer function
+    """
+
+    def reducer(left: List[AnyMessage], right: List[AnyMessage]) -> List[AnyMessage]:
+        messages = add_messages(left, right)
+
+        summary = None
+        if messages and messages[0].id == SUMMARY_MESSAGE_ID:
+            summary, messages = messages[0], messages[1:]
+
+        if len(messages) <= max_messages:
+            return ([summary] if summary else []) + messages
+
+        # Move the cut forward to the next user message so tool call/result pairs stay together
+        cut = len(messages) - max_messages
+        while cut < len(messages) and not isinstance(messages[cut], HumanMessage):
+            cut += 1
+        if cut >= len(messages):
+            return ([summary] if summary else []) + messages
+
+        dropped, kept = messages[:cut], messages[cut:]
+        if not summarize:
+            return kept
+
+        lines = summary.content[len(SUMMARY_HEADER):].strip().splitlines() if summary else []
+        for message in dropped:
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            content = " ".join(content.split())
+            if content:
+                lines.append(f"- {message.type}: {content[:summary_chars_per_message]}")
+
+        summary_text = "\n".join(lines)
+        if len(summary_text) > max_summary_chars:
+            summary_text = summary_text[-max_summary_chars:].split("\n", 1)[-1]
+
+        return [HumanMessage(id=SUMMARY_MESSAGE_ID, content=f"{SUMMARY_HEADER}\n{summary_text}")] + kept
+
+    return reducer
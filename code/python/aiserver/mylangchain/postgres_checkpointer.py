@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite import JsonPlusSerializerCompat
+from psycopg2.pool import ThreadedConnectionPool
+
+
+class PostgresSaver(BaseCheckpointSaver):
+    """
+    Checkpoint saver storing checkpoints in Postgres through a psycopg2 connection pool.
+
+    Uses the same layout as the langgraph SqliteSaver (checkpoints keyed by thread_id and thread_ts, pending
+    writes alongside) so both backends can be pruned the same way. psycopg2 has no async API, so the async
+    methods run the sync ones in a worker thread, each holding its own pooled connection.
+    """
+
+    serde = JsonPlusSerializerCompat()
+
+    def __init__(self, pool: ThreadedConnectionPool, max_connections: int):
+        """
+        :param pool: The connection pool, shared by every bot using the checkpointer
+        :param max_connections: The pool's maxconn, callers wait for a connection beyond it rather than failing
+        """
+        super().__init__()
+        self.pool = pool
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.is_setup = False
+        self.setup_lock = threading.Lock()
+
+    @contextmanager
+    def cursor(self) -> Iterator[Any]:
+        """
+        A cursor on a pooled connection, committed when the block completes and rolled back on an error.
+        """
+        self.setup()
+        with self._connection() as conn, conn, conn.cursor() as cur:
+            yield cur
+
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        with self.slots:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+            finally:
+                self.pool.putconn(conn)
+
+    def setup(self):
+        if self.is_setup:
+            return
+        with self.setup_lock:
+            if self.is_setup:
+                return
+            with self._connection() as conn, conn, conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS checkpoints (
+                        thread_id TEXT NOT NULL,
+                        thread_ts TEXT NOT NULL,
+                        parent_ts TEXT,
+                        checkpoint BYTEA,
+                        metadata BYTEA,
+                        PRIMARY KEY (thread_id, thread_ts)
+                    )""")
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                        thread_id TEXT NOT NULL,
+                        thread_ts TEXT NOT NULL,
+                        task_id TEXT NOT NULL,
+                        idx INTEGER NOT NULL,
+                        channel TEXT NOT NULL,
+                        value BYTEA,
+                        PRIMARY KEY (thread_id, thread_ts, task_id, idx)
+                    )""")
+            self.is_setup = True
+
+    @staticmethod
+    def _config(thread_id: str, thread_ts: Optional[str]) -> Optional[RunnableConfig]:
+        if not thread_ts:
+            return None
+        return {"configurable": {"thread_id": thread_id, "thread_ts": thread_ts}}
+
+    def _load_metadata(self, metadata: Optional[memoryview]) -> CheckpointMetadata:
+        return self.serde.loads(bytes(metadata)) if metadata is not None else {}
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        thread_ts = config["configurable"].get("thread_ts")
+        with self.cursor() as cur:
+            if thread_ts:
+                cur.execute("SELECT thread_ts, parent_ts, checkpoint, metadata FROM checkpoints "
+                            "WHERE thread_id = %s AND thread_ts = %s", (thread_id, str(thread_ts)))
+            else:
+                cur.execute("SELECT thread_ts, parent_ts, checkpoint, metadata FROM checkpoints "
+                            "WHERE thread_id = %s ORDER BY thread_ts DESC LIMIT 1", (thread_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            thread_ts, parent_ts, checkpoint, metadata = row
+            cur.execute("SELECT task_id, channel, value FROM checkpoint_writes "
+                        "WHERE thread_id = %s AND thread_ts = %s ORDER BY task_id, idx", (thread_id, thread_ts))
+            pending_writes = [(task_id, channel, self.serde.loads(bytes(value))) for task_id, channel, value in cur]
+        return CheckpointTuple(
+            self._config(thread_id, thread_ts),
+            self.serde.loads(bytes(checkpoint)),
+            self._load_metadata(metadata),
+            self._config(thread_id, parent_ts),
+            pending_writes,
+        )
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        wheres: List[str] = []
+        params: List[Any] = []
+        if config is not None:
+            wheres.append("thread_id = %s")
+            params.append(str(config["configurable"]["thread_id"]))
+        if filter:
+            # The metadata is stored as serialized JSON, so it can be matched as jsonb
+            wheres.append("convert_from(metadata, 'UTF8')::jsonb @> %s::jsonb")
+            params.append(json.dumps(filter))
+        if before is not None:
+            wheres.append("thread_ts < %s")
+            params.append(str(before["configurable"]["thread_ts"]))
+        query = "SELECT thread_id, thread_ts, parent_ts, checkpoint, metadata FROM checkpoints"
+        if wheres:
+            query += " WHERE " + " AND ".join(wheres)
+        query += " ORDER BY thread_ts DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        for thread_id, thread_ts, parent_ts, checkpoint, metadata in rows:
+            yield CheckpointTuple(
+                self._config(thread_id, thread_ts),
+                self.serde.loads(bytes(checkpoint)),
+                self._load_metadata(metadata),
+                self._config(thread_id, parent_ts),
+            )
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO checkpoints (thread_id, thread_ts, parent_ts, checkpoint, metadata) "
+                "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (thread_id, thread_ts) DO UPDATE "
+                "SET parent_ts = EXCLUDED.parent_ts, checkpoint = EXCLUDED.checkpoint, metadata = EXCLUDED.metadata",
+                (thread_id, checkpoint["id"], config["configurable"].get("thread_ts"),
+                 self.serde.dumps(checkpoint), self.serde.dumps(metadata)),
+            )
+        return {"configurable": {"thread_id": config["configurable"]["thread_id"], "thread_ts": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        thread_ts = str(config["configurable"]["thread_ts"])
+        with self.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO checkpoint_writes (thread_id, thread_ts, task_id, idx, channel, value) "
+                "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (thread_id, thread_ts, task_id, idx) DO UPDATE "
+                "SET channel = EXCLUDED.channel, value = EXCLUDED.value",
+                [(thread_id, thread_ts, task_id, idx, channel, self.serde.dumps(value))
+                 for idx, (channel, value) in enumerate(writes)],
+            )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id)
+
+    def prune(self, keep_last: int) -> int:
+        """
+        Delete all but the last keep_last checkpoints of every thread, and the writes of the deleted checkpoints.
+
+        :return: The number of checkpoints deleted
+        """
+        with self.cursor() as cur:
+            cur.execute("""
+                DELETE FROM checkpoints AS c USING (
+                    SELECT thread_id, thread_ts,
+                           ROW_NUMBER() OVER (PARTITION BY thread_id ORDER BY thread_ts DESC) AS rn
+                    FROM checkpoints
+                ) AS ranked
+                WHERE c.thread_id = ranked.thread_id AND c.thread_ts = ranked.thread_ts AND ranked.rn > %s""",
+                        (keep_last,))
+            deleted = cur.rowcount
+            cur.execute("""
+                DELETE FROM checkpoint_writes AS w WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints AS c WHERE c.thread_id = w.thread_id AND c.thread_ts = w.thread_ts
+                )""")
+        return deleted
+
+    def close(self):
+        self.pool.closeall()
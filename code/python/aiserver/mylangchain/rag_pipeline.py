@@ -0,0 +1,140 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.retrievers import BaseRetriever
+from utils.debug_utils import debug_print
+from mylangchain.retriever.semantic_cache import SemanticResponseCache
+
+RAG_CONDENSE_CACHE_SIZE = int(os.getenv("RAG_CONDENSE_CACHE_SIZE", "1000"))
+
+CONDENSE_PROMPT = """Given the conversation so far and a follow up question, rephrase the follow up question to be a \
+standalone question that can be understood without the conversation. Only return the standalone question."""
+
+
+class RAGPipeline:
+    """
+    Conversational retrieval-augmented generation, built once per bot (replacing ConversationalRetrievalChain).
+
+    Follow up questions are condensed into a standalone question using the recent chat history before
+    retrieval; on the first turn of a thread the question is used as is. The answer is generated from the
+    retrieved documents and the same recent history, so the prompt stays bounded however long the thread gets. Condensed questions are cached per
+    (thread, turn, question) so retries don't repeat the condense call. Retrieval and generation run async.
+
+    With a response_cache, the standalone question is looked up in the semantic cache before retrieval.
+    Only first turn answers are stored, as later answers also depend on the conversation.
+
+    Usage:
+        pipeline = RAGPipeline(llm, retriever, system_prompt="You are ...")
+        result = await pipeline.ainvoke(question, chat_history, thread_id)
+        answer, source_docs = result["answer"], result["source_documents"]
+    """
+
+    def __init__(self, llm: BaseChatModel, retriever: BaseRetriever, system_prompt: str,
+                 condense_history_messages: int = 6, condense_cache_size: int = RAG_CONDENSE_CACHE_SIZE,
+                 response_cache: Optional[SemanticResponseCache] = None):
+        """
+        :param llm: The chat model used to condense questions and generate answers
+        :param retriever: The retriever for the documents
+        :param system_prompt: Static instructions for the answer, sent once as the system message
+        :param condense_history_messages: How many of the most recent history messages are used to condense and
+                                          answer a question
+        :param condense_cache_size: The maximum number of condensed questions to keep
+        :param response_cache: Optional semantic cache of answers
+        """
+        self.retriever = retriever
+        self.response_cache = response_cache
+        self.condense_history_messages = condense_history_messages
+        self.condense_cache_size = condense_cache_size
+        self.condensed_questions: "OrderedDict[Tuple, str]" = OrderedDict()
+
+        condense_prompt = ChatPromptTemplate.from_messages([
+            ("system", CONDENSE_PROMPT),
+            MessagesPlaceholder("chat_history"),
+            ("human", "Follow up question: {question}"),
+        ])
+        # Tagged so the condensed question isn't streamed to the user as part of the answer
+        self.condense_chain = condense_prompt | llm.with_config(tags=["nostream"]) | StrOutputParser()
+
+        answer_prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt + "\n\nRetrieved information:\n{context}"),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{question}"),
+        ])
+        self.answer_chain = answer_prompt | llm | StrOutputParser()
+
+    async def ainvoke(self, question: str, chat_history: List[BaseMessage], thread_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        :param question: The user's question
+        :param chat_history: The previous messages of the conversation, without any static prompt messages
+        :param thread_id: The conversation thread, used to cache condensed questions
+        :return: A dict with the "answer", the "source_documents", the standalone "question" used for retrieval
+                 and whether the answer was "cached"
+
+        Only first turns are stored in the response cache, as later answers also depend on the conversation.
+        Follow-up turns are still looked up: the condensed standalone question no longer depends on the
+        history, so a first-turn answer to the same question (with the same context) answers it too.
+        """
+        standalone_question = await self.condense_question(question, chat_history, thread_id)
+
+        if self.response_cache is not None:
+            # The condensed question loses the user-supplied context, so it is taken from the original input
+            context_hash = self.response_cache.context_hash(question)
+            cached = await self.response_cache.lookup(standalone_question, context_hash)
+            if cached is not None:
+                return {**cached, "question": standalone_question, "cached": True}
+
+        debug_print(f"Question being asked to the retriever: {standalone_question}")
+        source_docs = await self.retriever.ainvoke(standalone_question)
+        answer = await self.answer_chain.ainvoke({
+            "context": self.format_documents(source_docs),
+            "chat_history": self.recent_history(chat_history),
+            "question": question,
+        })
+
+        if self.response_cache is not None and not chat_history:
+            await self.response_cache.store(standalone_question, context_hash, answer, source_docs)
+        return {"answer": answer, "source_documents": source_docs, "question": standalone_question, "cached": False}
+
+    async def condense_question(self, question: str, chat_history: List[BaseMessage], thread_id: Optional[str]) -> str:
+        if not chat_history:
+            return question
+
+        cache_key = (thread_id, len(chat_history), question)
+        if thread_id is not None and cache_key in self.condensed_questions:
+            self.condensed_questions.move_to_end(cache_key)
+            debug_print(f"Using cached condensed question for thread {thread_id}")
+            return self.condensed_questions[cache_key]
+
+        standalone_question = await self.condense_chain.ainvoke({
+            "chat_history": self.recent_history(chat_history),
+            "question": question,
+        })
+
+        if thread_id is not None:
+            self.condensed_questions[cache_key] = standalone_question
+            while len(self.condensed_questions) > self.condense_cache_size:
+                self.condensed_questions.popitem(last=False)
+        return standalone_question
+
+    def recent_history(self, chat_history: List[BaseMessage]) -> List[BaseMessage]:
+        if self.condense_history_messages <= 0:
+            return []
+        return chat_history[-self.condense_history_messages:]
+
+    @staticmethod
+    def format_documents(documents: List[Document]) -> str:
+        return "\n\n".join(document.page_content for document in documents)
+
+    @staticmethod
+    def format_sources(documents: List[Document]) -> str:
+        if not documents:
+            return ""
+        sources = "\n\nSources:"
+        for i, document in enumerate(documents, 1):
+            sources += f"\n{i}. {document.metadata.get('source', 'Unknown source')}"
+        return sources
@@ -0,0 +1,151 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+from utils.debug_utils import debug_print
+from .retriever_config import retriever_config
+
+# Identifiers like "pacs.008.001.08" or "ISO-20022" are kept whole as well as split into their parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._:/-][a-z0-9]+)*")
+TOKEN_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        parts = TOKEN_PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.append(token)
+        tokens.extend(part for part in parts if part not in STOP_WORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    On-disk BM25 inverted index for the chunks of a collection, stored in SQLite next to the Chroma database.
+
+    It is updated by the VectorDBLoader with the same chunk ids as the Chroma collection, so chunks can be
+    replaced and removed per source file.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                chunk_id TEXT PRIMARY KEY,
+                source TEXT,
+                length INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS docs_source ON docs (source)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_chunk_id ON postings (chunk_id)")
+        self.conn.commit()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        with self.lock:
+            self._delete_chunks(ids)
+            doc_rows = []
+            posting_rows = []
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                term_counts = Counter(tokenize(text))
+                doc_rows.append((chunk_id, metadata.get("source"), sum(term_counts.values()), text, json.dumps(metadata)))
+                posting_rows.extend((term, chunk_id, tf) for term, tf in term_counts.items())
+            self.conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?)", doc_rows)
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", posting_rows)
+            self.conn.commit()
+
+    def delete_source(self, source: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT chunk_id FROM docs WHERE source = ?)", (source,))
+            self.conn.execute("DELETE FROM docs WHERE source = ?", (source,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM docs")
+            self.conn.commit()
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float, str, Dict]]:
+        """
+        :return: Up to k (chunk_id, score, content, metadata) tuples, best match first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        placeholders = ",".join("?" * len(terms))
+        with self.lock:
+            doc_count, avg_length = self.conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not doc_count:
+                return []
+            doc_freqs = dict(self.conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms))
+            postings = self.conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p JOIN docs d ON d.chunk_id = p.chunk_id "
+                f"WHERE p.term IN ({placeholders})", terms).fetchall()
+
+        scores: Dict[str, float] = {}
+        for term, chunk_id, tf, length in postings:
+            df = doc_freqs[term]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / (avg_length or 1)))
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * norm
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        if not best:
+            return []
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT chunk_id, content, metadata FROM docs WHERE chunk_id IN ({','.join('?' * len(best))})",
+                [chunk_id for chunk_id, _ in best]).fetchall()
+        docs = {chunk_id: (content, json.loads(metadata)) for chunk_id, content, metadata in rows}
+        return [(chunk_id, score, *docs[chunk_id]) for chunk_id, score in best if chunk_id in docs]
+
+    def _delete_chunks(self, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            self.conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", chunk)
+            self.conn.execute(f"DELETE FROM docs WHERE chunk_id IN ({placeholders})", chunk)
+
+
+bm25_indexes: Dict[str, BM25Index] = {}
+
+
+def get_bm25_index(name: str) -> BM25Index:
+    index = bm25_indexes.get(name)
+    if index is None:
+        path = os.path.join(retriever_config.bm25_directory, f"{name}.sqlite")
+        debug_print(f"Opening BM25 index: {path}")
+        index = BM25Index(path)
+        bm25_indexes[name] = index
+    return index
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from utils.debug_utils import debug_print
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding vector cache keyed by (provider, model, kind, sha256(text)).
+
+    Vectors are stored as float32 blobs in SQLite. When the stored vectors grow beyond max_bytes the least
+    recently used entries are evicted.
+    """
+
+    # How many writes between checks of the cache size
+    EVICTION_CHECK_INTERVAL = 1000
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.writes_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (provider, model, kind, text_hash)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, provider: str, model: str, kind: str, texts: List[str]) -> List[Optional[List[float]]]:
+        hashes = [self.hash_text(text) for text in texts]
+        found = {}
+        with self.lock:
+            # Stay well below SQLite's limit on the number of query parameters
+            for start in range(0, len(hashes), 500):
+                chunk = list(set(hashes[start:start + 500]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE provider = ? AND model = ? AND kind = ? "
+                    f"AND text_hash IN ({placeholders})", [provider, model, kind] + chunk
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    self.conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE provider = ? AND model = ? AND kind = ? "
+                        f"AND text_hash IN ({placeholders})", [time.time(), provider, model, kind] + chunk
+                    )
+            self.conn.commit()
+
+        vectors = [self.decode(found[text_hash]) if text_hash in found else None for text_hash in hashes]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, provider: str, model: str, kind: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(provider, model, kind, self.hash_text(text), self.encode(vector), now)
+                for text, vector in zip(texts, vectors)]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+            self.writes_since_check += len(rows)
+            if self.writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+                self.writes_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        total_bytes = self.conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the limit so we don't evict again on the next write
+        target = int(self.max_bytes * 0.9)
+        deleted = 0
+        cursor = self.conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        rowids = []
+        for rowid, size in cursor:
+            if total_bytes <= target:
+                break
+            rowids.append((rowid,))
+            total_bytes -= size
+            deleted += 1
+        self.conn.executemany("DELETE FROM embeddings WHERE rowid = ?", rowids)
+        self.conn.commit()
+        debug_print(f"Evicted {deleted} entries from the embedding cache")
+
+    @staticmethod
+    def encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def decode(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper which only sends texts to the underlying model when their vectors are not
+    already in the embedding cache.
+    """
+
+    def __init__(self, embeddings: Embeddings, provider: str, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.provider = provider
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.provider, self.model, "document", texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Identical chunks (boilerplate, headers etc.) only need embedding once
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_vectors = dict(zip(missing_texts, self.embeddings.embed_documents(missing_texts)))
+            self.cache.put_many(self.provider, self.model, "document", missing_texts, list(new_vectors.values()))
+            for i in missing:
+                vectors[i] = new_vectors[texts[i]]
+        debug_print(f"Embedded {len(texts)} documents ({len(texts) - len(missing)} from cache)")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get_many(self.provider, self.model, "query", [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.provider, self.model, "query", [text], [vector])
+        return vector
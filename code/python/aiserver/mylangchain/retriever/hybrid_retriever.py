@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.debug_utils import debug_print
+
+
+class CrossEncoderReranker:
+    """
+    Reranks documents with a local sentence-transformers cross-encoder. Models are loaded once per process.
+    """
+
+    models: Dict[str, Any] = {}
+    lock = threading.Lock()
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def get_model(self):
+        with self.lock:
+            if self.model_name not in self.models:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError:
+                    raise ValueError("sentence-transformers is required for reranking, install it with: pip install sentence-transformers")
+                debug_print(f"Loading cross-encoder reranker: {self.model_name}")
+                self.models[self.model_name] = CrossEncoder(self.model_name)
+            return self.models[self.model_name]
+
+    def rerank(self, query: str, documents: List[Document], top_n: int) -> List[Document]:
+        if not documents:
+            return documents
+        scores = self.get_model().predict([(query, document.page_content) for document in documents])
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)
+        return [document for document, _ in ranked[:top_n]]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines vector similarity search with BM25 keyword search so exact terms (e.g. ISO20022 message ids like
+    pacs.008) are found even when they are not close in embedding space.
+
+    Both searches return fetch_k candidates which are merged with weighted Reciprocal Rank Fusion, then the
+    top k are returned, optionally after reranking the fused candidates with a cross-encoder.
+    """
+
+    vectorstore: Any
+    bm25_index: Any
+    k: int = 4
+    fetch_k: int = 20
+    vector_weight: float = 1.0
+    bm25_weight: float = 1.0
+    rrf_k: int = 60
+    reranker: Optional[Any] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector_results = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        bm25_results = self.bm25_index.search(query, self.fetch_k) if self.bm25_weight > 0 else []
+        documents = self.fuse(vector_results, bm25_results)
+
+        if self.reranker is not None:
+            return self.reranker.rerank(query, documents, self.k)
+        return documents[:self.k]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        # Chroma, SQLite and the cross-encoder are all blocking
+        return await asyncio.to_thread(self._get_relevant_documents, query, run_manager=run_manager.get_sync())
+
+    def fuse(self, vector_results: List[Document], bm25_results: List[Tuple[str, float, str, Dict]]) -> List[Document]:
+        scores: Dict[Tuple, float] = {}
+        documents: Dict[Tuple, Document] = {}
+
+        def add(document: Document, rank: int, weight: float):
+            key = (document.metadata.get("source"), document.page_content)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank + 1)
+
+        for rank, document in enumerate(vector_results):
+            add(document, rank, self.vector_weight)
+        for rank, (_, _, content, metadata) in enumerate(bm25_results):
+            add(Document(page_content=content, metadata=metadata), rank, self.bm25_weight)
+
+        debug_print(f"Fused {len(vector_results)} vector and {len(bm25_results)} BM25 results into {len(documents)} candidates")
+        return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
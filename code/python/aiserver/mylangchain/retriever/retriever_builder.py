@@ -1,28 +1,80 @@
 from langchain_community.vectorstores import Chroma
+from langchain_core.retrievers import BaseRetriever
 from utils.debug_utils import debug_print
 from .retriever_config import retriever_config
 from .vector_db_loader import vector_db_loader
-import json
-import os
+from .bm25_index import get_bm25_index
+from .hybrid_retriever import HybridRetriever, CrossEncoderReranker
+from typing import Dict, Optional
+import asyncio
+import threading
 
 class RetrieverBuilder:
+    """
+    Builds retrievers for imported collections and caches them per process, so bot instances share a
+    single retriever per collection. Cached retrievers are dropped when the loader re-indexes their collection.
+    """
+
+    def __init__(self):
+        self.retrievers: Dict[str, BaseRetriever] = {}
+        self.build_locks: Dict[str, asyncio.Lock] = {}
+        # The sync path runs in worker threads, each with its own event loop, so it needs thread locks
+        self.sync_build_locks: Dict[str, threading.Lock] = {}
+        self.sync_build_locks_lock = threading.Lock()
+        vector_db_loader.add_reindex_listener(self.invalidate)
+
+    def invalidate(self, name: str):
+        if self.retrievers.pop(name, None) is not None:
+            debug_print(f"Invalidated cached retriever for: {name}")
+
+    async def get_retriever_async(self, name: str) -> Optional[BaseRetriever]:
+        retriever = self.retrievers.get(name)
+        if retriever is not None:
+            return retriever
+
+        # Only one build per collection, concurrent callers wait for it and share the result
+        lock = self.build_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            retriever = self.retrievers.get(name)
+            if retriever is None:
+                retriever = await self.build_retriever(name)
+                if retriever is not None:
+                    self.retrievers[name] = retriever
+            return retriever
+
+    def get_retriever(self, name: str) -> Optional[BaseRetriever]:
+        """
+        Synchronous variant for sync bots, which run in worker threads without an event loop.
+        """
+        retriever = self.retrievers.get(name)
+        if retriever is not None:
+            return retriever
+
+        # Only one build per collection, concurrent worker threads wait for it and share the result
+        with self.sync_build_locks_lock:
+            lock = self.sync_build_locks.setdefault(name, threading.Lock())
+        with lock:
+            retriever = self.retrievers.get(name)
+            if retriever is None:
+                retriever = asyncio.run(self.build_retriever(name))
+                if retriever is not None:
+                    self.retrievers[name] = retriever
+            return retriever
+
     @staticmethod
-    def get_retriever(name: str):
-        debug_print(f"Getting retriever for: {name}")
+    async def build_retriever(name: str) -> Optional[BaseRetriever]:
+        debug_print(f"Building retriever for: {name}")
         try:
             # Ensure the collection is up-to-date
-            vector_db_loader.process_documents(name)
+            await vector_db_loader.process_documents(name)
             collection_name = f"{name}_collection"
-            
-            if not vector_db_loader.verify_collection_exists(name):
+
+            if not await vector_db_loader.verify_collection_exists(name):
                 debug_print(f"Error: Collection {collection_name} does not exist.")
                 return None
 
             # Load the retriever info to get the embedding provider and model
-            retriever_info_path = os.path.join("/data/imported", name, "retriever-info.json")
-            with open(retriever_info_path, 'r') as f:
-                retriever_info = json.load(f)
-
+            retriever_info = await vector_db_loader.load_retriever_info(name)
             embedding_provider = retriever_info.get('embedding_provider')
             embedding_model = retriever_info.get('embedding_model')
 
@@ -37,10 +89,39 @@ class RetrieverBuilder:
                 embedding_function=embedding_function,
                 collection_name=collection_name,
             )
-            debug_print(f"Retriever created for {name}")
-            return vectorstore.as_retriever()
+            return RetrieverBuilder.create_retriever(name, vectorstore, retriever_info.get('retrieval', {}))
         except Exception as e:
-            debug_print(f"Error in get_retriever: {str(e)}")
+            debug_print(f"Error in build_retriever: {str(e)}")
             return None
 
-retriever_builder = RetrieverBuilder()
\ No newline at end of file
+    @staticmethod
+    def create_retriever(name: str, vectorstore: Chroma, retrieval: Dict) -> BaseRetriever:
+        """
+        Create the retriever described by the "retrieval" section of retriever-info.json, e.g.
+            "retrieval": {"mode": "hybrid", "k": 4, "fetch_k": 20, "vector_weight": 1.0, "bm25_weight": 1.0,
+                          "rerank": true, "rerank_model": "cross-encoder/ms-marco-MiniLM-L-6-v2"}
+        Missing settings fall back to retriever_config.default_retrieval.
+        """
+        settings = {**retriever_config.default_retrieval, **retrieval}
+        debug_print(f"Retrieval settings for {name}: {settings}")
+
+        if settings["mode"] == "vector" and not settings["rerank"]:
+            debug_print(f"Vector retriever created for {name}")
+            return vectorstore.as_retriever(search_kwargs={"k": settings["k"]})
+
+        if settings["mode"] not in ("vector", "hybrid"):
+            raise ValueError(f"Unsupported retrieval mode: {settings['mode']}")
+
+        debug_print(f"{settings['mode'].capitalize()} retriever created for {name}")
+        return HybridRetriever(
+            vectorstore=vectorstore,
+            bm25_index=get_bm25_index(name),
+            k=settings["k"],
+            fetch_k=settings["fetch_k"],
+            vector_weight=settings["vector_weight"],
+            # Vector mode with reranking just reranks the vector candidates
+            bm25_weight=settings["bm25_weight"] if settings["mode"] == "hybrid" else 0.0,
+            reranker=CrossEncoderReranker(settings["rerank_model"]) if settings["rerank"] else None,
+        )
+
+retriever_builder = RetrieverBuilder()
@@ -1,15 +1,41 @@
 import os
 from langchain_openai import OpenAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from llms.rate_limiter import RateLimitedEmbeddings, get_rate_limiter
 from utils.debug_utils import debug_print
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
 
 class RetrieverConfig:
     def __init__(self):
         self.default_embedding_provider = os.getenv("DEFAULT_EMBEDDING_PROVIDER", "openai")
         self.default_embedding_model = os.getenv("DEFAULT_EMBEDDING_MODEL", "text-embedding-ada-002")
         self.persist_directory = "/data/embeddings/__chromadb"
+        self.bm25_directory = "/data/embeddings/__bm25"
         self.embeddings_cache = {}
 
+        # Document import pipeline settings
+        self.load_concurrency = int(os.getenv("IMPORT_LOAD_CONCURRENCY", "4"))
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.embedding_concurrency = int(os.getenv("EMBEDDING_CONCURRENCY", "2"))
+        self.embedding_max_retries = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+        # Persistent cache of embedding vectors shared by all collections and retrievers
+        self.embedding_cache_enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "/data/embeddings/__cache/embeddings.sqlite")
+        self.embedding_cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+        self.embedding_cache = None
+
+        # Default retrieval settings, overridden per retriever by the "retrieval" section of retriever-info.json
+        self.default_retrieval = {
+            "mode": os.getenv("DEFAULT_RETRIEVAL_MODE", "hybrid"),  # "vector" or "hybrid" (vector + BM25)
+            "k": int(os.getenv("RETRIEVAL_K", "4")),
+            "fetch_k": int(os.getenv("RETRIEVAL_FETCH_K", "20")),
+            "vector_weight": 1.0,
+            "bm25_weight": 1.0,
+            "rerank": os.getenv("RETRIEVAL_RERANK", "false").lower() == "true",
+            "rerank_model": os.getenv("RETRIEVAL_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+        }
+
         # Set TOKENIZERS_PARALLELISM environment variable
         os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -22,14 +48,24 @@ class RetrieverConfig:
         if cache_key not in self.embeddings_cache:
             debug_print(f"Initializing embeddings for provider: {provider}, model: {model}")
             if provider == "openai":
-                embeddings = OpenAIEmbeddings(model=model)
+                # Indexing shares the provider's request and token budget with the chat models
+                embeddings = RateLimitedEmbeddings(OpenAIEmbeddings(model=model), get_rate_limiter(provider, model))
             elif provider == "huggingface":
                 embeddings = HuggingFaceEmbeddings(model_name=model)
             else:
                 raise ValueError(f"Unsupported embedding provider: {provider}")
-            
+
+            if self.embedding_cache_enabled:
+                embeddings = CachedEmbeddings(embeddings, provider, model, self.get_embedding_cache())
+
             self.embeddings_cache[cache_key] = embeddings
         
         return self.embeddings_cache[cache_key]
 
+    def get_embedding_cache(self) -> EmbeddingCache:
+        if self.embedding_cache is None:
+            debug_print(f"Opening embedding cache: {self.embedding_cache_path}")
+            self.embedding_cache = EmbeddingCache(self.embedding_cache_path, self.embedding_cache_max_mb * 1024 * 1024)
+        return self.embedding_cache
+
 retriever_config = RetrieverConfig()
\ No newline at end of file
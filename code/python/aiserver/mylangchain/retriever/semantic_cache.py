@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from utils.debug_utils import debug_print
+from .vector_db_loader import vector_db_loader
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+
+class SemanticResponseCache:
+    """
+    Caches RAG answers in a small Chroma collection ("<name>_response_cache") keyed by the embedding of the
+    normalized question, so questions which are worded slightly differently can still hit.
+
+    A lookup hits when the cosine similarity with the closest cached question is at least the threshold and
+    the answer was given for the same user-supplied context. The cache is emptied whenever the source
+    collection is re-indexed.
+    """
+
+    def __init__(self, name: str, embeddings: Optional[Embeddings], threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.name = name
+        self.collection_name = f"{name}_response_cache"
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        # Bot input is "Context: ...\n\nUser query: ...", the context is matched separately by context_hash
+        if "User query:" in question:
+            question = question.rsplit("User query:", 1)[1]
+        question = " ".join(question.lower().split())
+        return re.sub(r"[\s?!.]+$", "", question)
+
+    @staticmethod
+    def context_hash(question: str) -> str:
+        """
+        Hash of the user-supplied context in the bot input, so the same question asked with different
+        context doesn't share an answer.
+        """
+        context = ""
+        if "User query:" in question:
+            context = question.rsplit("User query:", 1)[0]
+            # The thread_id doesn't change the answer
+            context = re.sub(r"\n\nthread_id: .*$", "", context.strip(), flags=re.DOTALL)
+            if context.startswith("Context:"):
+                context = context[len("Context:"):]
+        return hashlib.sha256(" ".join(context.split()).encode("utf-8")).hexdigest()
+
+    def get_collection(self):
+        return vector_db_loader.client.get_or_create_collection(self.collection_name, metadata={"hnsw:space": "cosine"})
+
+    async def lookup(self, question: str, context_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        :param question: The (standalone) question
+        :param context_hash: The context_hash of the bot input the question came from
+        :return: A dict with the cached "answer" and "source_documents", or None on a miss
+        """
+        normalized = self.normalize_question(question)
+        vector = await asyncio.to_thread(self.embeddings.embed_query, normalized)
+        result = await asyncio.to_thread(self.get_collection().query, query_embeddings=[vector], n_results=1,
+                                         where={"context_hash": context_hash}, include=["metadatas", "distances"])
+
+        if result["ids"][0]:
+            similarity = 1 - result["distances"][0][0]
+            if similarity >= self.threshold:
+                self.hits += 1
+                metadata = result["metadatas"][0][0]
+                debug_print(f"Semantic cache hit for {self.name} (similarity {similarity:.3f}): {normalized}")
+                sources = json.loads(metadata["sources"])
+                return {
+                    "answer": metadata["answer"],
+                    "source_documents": [Document(page_content=source["content"], metadata=source["metadata"]) for source in sources],
+                }
+
+        self.misses += 1
+        return None
+
+    async def store(self, question: str, context_hash: str, answer: str, source_documents: List[Document]):
+        normalized = self.normalize_question(question)
+        vector = await asyncio.to_thread(self.embeddings.embed_query, normalized)
+        sources = [{"content": document.page_content, "metadata": document.metadata} for document in source_documents]
+        metadata = {"answer": answer, "sources": json.dumps(sources), "context_hash": context_hash, "created_at": time.time()}
+        await asyncio.to_thread(self.get_collection().add, ids=[str(uuid.uuid4())], embeddings=[vector],
+                                documents=[normalized], metadatas=[metadata])
+
+    def invalidate(self):
+        try:
+            if self.collection_name in [c if isinstance(c, str) else c.name for c in vector_db_loader.client.list_collections()]:
+                vector_db_loader.client.delete_collection(self.collection_name)
+                self.invalidations += 1
+                debug_print(f"Cleared semantic response cache for {self.name}")
+        except Exception as e:
+            debug_print(f"Error clearing semantic response cache for {self.name}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+        }
+
+
+semantic_caches: Dict[str, SemanticResponseCache] = {}
+
+
+def get_semantic_cache(name: str, embeddings: Embeddings) -> SemanticResponseCache:
+    cache = semantic_caches.get(name)
+    if cache is None:
+        cache = SemanticResponseCache(name, embeddings)
+        semantic_caches[name] = cache
+    else:
+        # The embedding model may have changed with a re-index
+        cache.embeddings = embeddings
+    return cache
+
+
+def invalidate_semantic_cache(name: str):
+    # Also clears entries persisted by an earlier run when no cache has been created yet in this process
+    cache = semantic_caches.get(name) or SemanticResponseCache(name, embeddings=None)
+    cache.invalidate()
+
+
+def semantic_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in semantic_caches.items()}
+
+
+vector_db_loader.add_reindex_listener(invalidate_semantic_cache)
@@ -1,6 +1,12 @@
 import os
 import json
-from typing import List, Dict
+import hashlib
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Dict, Optional
 import aiofiles
 from langchain_community.document_loaders import PyPDFLoader, UnstructuredXMLLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -8,11 +14,20 @@ from langchain_community.vectorstores import Chroma
 import chromadb
 from utils.debug_utils import debug_print
 from .retriever_config import retriever_config
+from .bm25_index import BM25Index, get_bm25_index
 import asyncio
 
 class VectorDBLoader:
     def __init__(self):
         self.client = None
+        self.reindex_listeners: List[Callable[[str], None]] = []
+        # Per collection locks so the startup import check and retriever builds never index it at the same time.
+        # asyncio locks can't be shared between event loops, and the sync bots build retrievers from worker
+        # threads each running their own loop, so a thread lock covers those too
+        self.index_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = \
+            weakref.WeakKeyDictionary()
+        self.thread_index_locks: Dict[str, threading.Lock] = {}
+        self.index_locks_lock = threading.Lock()
 
     async def initialize_client(self):
         debug_print(f"Initializing ChromaDB client with persistence directory: {retriever_config.persist_directory}")
@@ -31,6 +46,20 @@ class VectorDBLoader:
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
 
+    def add_reindex_listener(self, listener: Callable[[str], None]):
+        """
+        Register a callback which is called with the retriever name whenever its collection is modified,
+        so anything cached for the collection can be dropped.
+        """
+        self.reindex_listeners.append(listener)
+
+    def notify_reindexed(self, name: str):
+        for listener in self.reindex_listeners:
+            try:
+                listener(name)
+            except Exception as e:
+                debug_print(f"Error in reindex listener for {name}: {str(e)}")
+
     def get_retriever_info_path(self, name: str):
         return f"/data/imported/{name}/retriever-info.json"
 
@@ -46,7 +75,7 @@ class VectorDBLoader:
                     info["files"] = []
                 return info
         debug_print(f"No existing retriever info found for {name}")
-        return {"name": name, "files": [], "embedding_provider": retriever_config.default_embedding_provider, "embedding_model": retriever_config.default_embedding_model}
+        return {"name": name, "files": [], "embedding_provider": retriever_config.default_embedding_provider, "embedding_model": retriever_config.default_embedding_model, "retrieval": dict(retriever_config.default_retrieval)}
 
     async def save_retriever_info(self, name: str, info: Dict):
         info_path = self.get_retriever_info_path(name)
@@ -55,7 +84,35 @@ class VectorDBLoader:
             await f.write(json.dumps(info, indent=2))
         debug_print(f"Saved retriever info: {info}")
 
-    async def check_for_updates(self, name: str) -> bool:
+    @staticmethod
+    def compute_file_hash(file_path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def get_chunk_id(file_path: str, content_hash: str, chunk_index: int) -> str:
+        # Stable across runs so re-indexing an unchanged file is idempotent
+        path_hash = hashlib.sha256(file_path.encode('utf-8')).hexdigest()[:16]
+        return f"{path_hash}-{content_hash[:16]}-{chunk_index}"
+
+    def list_source_files(self, directory: str) -> List[str]:
+        return sorted(
+            filename for filename in os.listdir(directory)
+            if not filename.startswith('.') and os.path.isfile(os.path.join(directory, filename))
+            and filename != "retriever-info.json"
+        )
+
+    async def check_for_updates(self, name: str) -> Dict:
+        """
+        Compare the files in /data/imported/<name> with the content hashes stored in retriever-info.json.
+
+        :param name: The retriever name
+        :return: A dict with the updated "info" to save once indexing succeeds, the "changed" (new or modified)
+                 and "removed" filenames and whether a full "rebuild" is needed
+        """
         debug_print(f"Checking for updates in retriever: {name}")
         info = await self.load_retriever_info(name)
         directory = f"/data/imported/{name}"
@@ -63,112 +120,279 @@ class VectorDBLoader:
         if not os.path.exists(directory):
             debug_print(f"Creating new directory: {directory}")
             os.makedirs(directory)
-            await self.save_retriever_info(name, info)
-            return True
 
-        has_updates = False
-        current_files = set(os.listdir(directory))
-        stored_files = {file["filename"] for file in info["files"] if isinstance(file, dict) and "filename" in file}
+        stored_hashes = {file["filename"]: file.get("content_hash") for file in info["files"]
+                         if isinstance(file, dict) and "filename" in file}
+        current_files = self.list_source_files(directory)
 
         debug_print(f"Current files: {current_files}")
-        debug_print(f"Stored files: {stored_files}")
-
-        for file in current_files:
-            file_path = os.path.join(directory, file)
-            if file.startswith('.') or not os.path.isfile(file_path) or file == "retriever-info.json":
-                continue
-            last_modified = os.path.getmtime(file_path)
-            stored_file = next(
-                (item for item in info["files"] if isinstance(item, dict) and item.get("filename") == file), None)
-            if not stored_file or last_modified != stored_file.get("last_modified"):
-                debug_print(f"Update detected for file: {file}")
-                has_updates = True
-                if stored_file:
-                    stored_file["last_modified"] = last_modified
-                else:
-                    info["files"].append({"filename": file, "last_modified": last_modified})
-
-        info["files"] = [file for file in info["files"] if
-                         isinstance(file, dict) and file.get("filename") in current_files]
+        debug_print(f"Stored files: {list(stored_hashes.keys())}")
+
+        files = []
+        changed = []
+        for filename in current_files:
+            content_hash = await asyncio.to_thread(self.compute_file_hash, os.path.join(directory, filename))
+            if stored_hashes.get(filename) != content_hash:
+                debug_print(f"Update detected for file: {filename}")
+                changed.append(filename)
+            files.append({"filename": filename, "content_hash": content_hash})
+
+        removed = [filename for filename in stored_hashes if filename not in current_files]
+        for filename in removed:
+            debug_print(f"File removed: {filename}")
+
+        # Older retriever info only stored mtimes and the chunks were not tracked per file, so rebuild once
+        rebuild = any(content_hash is None for content_hash in stored_hashes.values())
 
         if info.get("embedding_provider") != retriever_config.default_embedding_provider or info.get("embedding_model") != retriever_config.default_embedding_model:
             debug_print(f"Embedding provider or model has changed. Provider: {retriever_config.default_embedding_provider}, Model: {retriever_config.default_embedding_model}")
-            has_updates = True
-            info["embedding_provider"] = retriever_config.default_embedding_provider
-            info["embedding_model"] = retriever_config.default_embedding_model
+            rebuild = True
+
+        info["files"] = files
+        info.setdefault("retrieval", dict(retriever_config.default_retrieval))
+        info["embedding_provider"] = retriever_config.default_embedding_provider
+        info["embedding_model"] = retriever_config.default_embedding_model
+
+        updates = {"info": info, "changed": changed, "removed": removed, "rebuild": rebuild}
+        debug_print(f"Updates check complete. Changed: {changed}, Removed: {removed}, Rebuild: {rebuild}")
+        return updates
 
-        await self.save_retriever_info(name, info)
-        debug_print(f"Updates check complete. Has updates: {has_updates}")
-        return has_updates
+    @asynccontextmanager
+    async def collection_lock(self, name: str) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        with self.index_locks_lock:
+            async_lock = self.index_locks.setdefault(loop, {}).setdefault(name, asyncio.Lock())
+            thread_lock = self.thread_index_locks.setdefault(name, threading.Lock())
+        async with async_lock:
+            # Polled rather than waited for in a worker thread, so a cancelled caller can't leave it held
+            while not thread_lock.acquire(blocking=False):
+                await asyncio.sleep(0.1)
+            try:
+                yield
+            finally:
+                thread_lock.release()
 
     async def process_documents(self, name: str):
+        """
+        Bring the collection up to date with the files in /data/imported/<name>. Concurrent callers for the same
+        collection wait for the running update, and then find nothing left to do.
+        """
+        async with self.collection_lock(name):
+            await self._process_documents(name)
+
+    async def _process_documents(self, name: str):
         debug_print(f"Processing documents for retriever: {name}")
         collection_name = f"{name}_collection"
-        
-        if not await self.check_for_updates(name):
-            if await self.verify_collection_exists(name):
-                debug_print(f"Collection {collection_name} is up to date. Skipping processing.")
-                return
-        else:
-            debug_print(f"Updates detected, deleting existing collection for {name}")
-            await self.delete_collection(name)
-
         directory = f"/data/imported/{name}"
 
-        documents = []
-        for filename in os.listdir(directory):
-            if filename.startswith('.') or os.path.isdir(
-                    os.path.join(directory, filename)) or filename == "retriever-info.json":
-                continue
-            file_path = os.path.join(directory, filename)
-            try:
-                documents.extend(await self.load_document(file_path))
-            except ValueError as e:
-                debug_print(f"Skipping file {filename}: {str(e)}")
+        updates = await self.check_for_updates(name)
+        bm25_index = get_bm25_index(name)
+        if updates["rebuild"] or not await self.verify_collection_exists(name):
+            debug_print(f"Rebuilding collection {collection_name}")
+            await self.delete_collection(name)
+            files_to_index = self.list_source_files(directory)
+            files_to_delete = []
+        else:
+            files_to_index = updates["changed"]
+            files_to_delete = updates["changed"] + updates["removed"]
+            if await asyncio.to_thread(bm25_index.count) == 0:
+                # Collections imported before the BM25 index existed
+                await self.backfill_bm25_index(name, bm25_index)
 
-        if not documents:
-            debug_print(f"No valid documents found in {directory}.")
+        if not files_to_index and not files_to_delete:
+            debug_print(f"Collection {collection_name} is up to date. Skipping processing.")
             return
 
-        debug_print(f"Splitting {len(documents)} documents")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = await asyncio.to_thread(text_splitter.split_documents, documents)
-        debug_print(f"Created {len(splits)} splits")
+        vectorstore = Chroma(
+            client=self.client,
+            embedding_function=retriever_config.get_embeddings(),
+            collection_name=collection_name,
+        )
 
-        debug_print(f"Creating Chroma vectorstore for {collection_name}")
+        # Drop the chunks of modified and removed files
+        for filename in files_to_delete:
+            file_path = os.path.join(directory, filename)
+            await asyncio.to_thread(self.delete_file_chunks, vectorstore, file_path)
+            await asyncio.to_thread(bm25_index.delete_source, file_path)
+
+        content_hashes = {file["filename"]: file["content_hash"] for file in updates["info"]["files"]}
         try:
-            vectorstore = await asyncio.to_thread(
-                Chroma.from_documents,
-                documents=splits,
-                embedding=retriever_config.get_embeddings(),
-                client=self.client,
-                collection_name=collection_name,
-            )
-            debug_print(f"Processed and persisted {len(splits)} chunks for {name}")
-            
+            if files_to_index:
+                await self.index_files(vectorstore, directory, files_to_index, content_hashes, bm25_index)
+
             if await self.verify_collection_exists(name):
-                debug_print(f"Successfully created and verified collection: {collection_name}")
+                debug_print(f"Successfully updated and verified collection: {collection_name}")
             else:
                 raise Exception(f"Collection {collection_name} was not created successfully")
         except Exception as e:
-            debug_print(f"Error creating Chroma vectorstore: {str(e)}")
+            debug_print(f"Error updating Chroma vectorstore: {str(e)}")
             raise
+        finally:
+            # The collection may have been recreated or partly updated, even on failure
+            self.notify_reindexed(name)
+
+        # Only record the new hashes once the collection has been updated so failures are retried
+        await self.save_retriever_info(name, updates["info"])
+
+    async def index_files(self, vectorstore: Chroma, directory: str, filenames: List[str], content_hashes: Dict[str, str],
+                          bm25_index: Optional[BM25Index] = None) -> int:
+        """
+        Load, split, embed and upsert the given files as a streaming pipeline.
+
+        Files are loaded and split concurrently (retriever_config.load_concurrency at a time) and their chunks
+        are gathered into batches of retriever_config.embedding_batch_size. Up to
+        retriever_config.embedding_concurrency batches are embedded at once, with retries on rate limits,
+        and each batch is upserted into Chroma (and the BM25 index, if given) as soon as it is embedded.
+
+        :return: The number of chunks indexed
+        """
+        embeddings = vectorstore.embeddings
+        collection = vectorstore._collection
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        batch_size = retriever_config.embedding_batch_size
+        load_semaphore = asyncio.Semaphore(retriever_config.load_concurrency)
+        # Bounded so loading can't run too far ahead of embedding
+        batches: asyncio.Queue = asyncio.Queue(maxsize=retriever_config.embedding_concurrency * 2)
+        pending = []
+        indexed = 0
+        start_time = time.monotonic()
+
+        async def load_and_split(filename: str):
+            file_path = os.path.join(directory, filename)
+            async with load_semaphore:
+                try:
+                    documents = await self.load_document(file_path)
+                except ValueError as e:
+                    debug_print(f"Skipping file {filename}: {str(e)}")
+                    return
+                file_splits = await asyncio.to_thread(text_splitter.split_documents, documents)
+            debug_print(f"Created {len(file_splits)} splits for {filename}")
+            for index, split in enumerate(file_splits):
+                split.metadata["source"] = file_path
+                pending.append((self.get_chunk_id(file_path, content_hashes[filename], index), split))
+                if len(pending) >= batch_size:
+                    batch = pending[:batch_size]
+                    del pending[:batch_size]
+                    await batches.put(batch)
+
+        async def produce():
+            async with asyncio.TaskGroup() as loaders:
+                for filename in filenames:
+                    loaders.create_task(load_and_split(filename))
+            if pending:
+                await batches.put(list(pending))
+            for _ in range(retriever_config.embedding_concurrency):
+                await batches.put(None)
+
+        async def embed_and_upsert():
+            nonlocal indexed
+            while (batch := await batches.get()) is not None:
+                ids = [chunk_id for chunk_id, _ in batch]
+                texts = [split.page_content for _, split in batch]
+                metadatas = [self.filter_metadata(split.metadata) for _, split in batch]
+                vectors = await self.embed_with_retry(embeddings, texts)
+                await asyncio.to_thread(collection.upsert, ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+                if bm25_index is not None:
+                    await asyncio.to_thread(bm25_index.upsert, ids, texts, metadatas)
+                indexed += len(batch)
+                elapsed = time.monotonic() - start_time
+                debug_print(f"Indexed {indexed} chunks into {collection.name} ({indexed / elapsed:.1f} chunks/sec)")
+
+        async with asyncio.TaskGroup() as pipeline:
+            pipeline.create_task(produce())
+            for _ in range(retriever_config.embedding_concurrency):
+                pipeline.create_task(embed_and_upsert())
+
+        elapsed = time.monotonic() - start_time
+        debug_print(f"Indexed {indexed} chunks from {len(filenames)} files in {elapsed:.1f}s "
+                    f"({indexed / elapsed if elapsed else 0:.1f} chunks/sec)")
+        return indexed
+
+    async def embed_with_retry(self, embeddings, texts: List[str]) -> List[List[float]]:
+        max_retries = retriever_config.embedding_max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                return await asyncio.to_thread(embeddings.embed_documents, texts)
+            except Exception as e:
+                if attempt == max_retries or not self.is_retryable_error(e):
+                    raise
+                delay = self.get_retry_delay(e, attempt)
+                debug_print(f"Embedding batch failed ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def get_status_code(error: Exception) -> Optional[int]:
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(error, "response", None), "status_code", None)
+        return status_code
+
+    @staticmethod
+    def is_retryable_error(error: Exception) -> bool:
+        status_code = VectorDBLoader.get_status_code(error)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        return any(marker in type(error).__name__ for marker in ("RateLimit", "Timeout", "Connection"))
+
+    @staticmethod
+    def get_retry_delay(error: Exception, attempt: int) -> float:
+        # Honour the provider's Retry-After header when there is one
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+    @staticmethod
+    def filter_metadata(metadata: Dict) -> Dict:
+        # Chroma only accepts scalar metadata values
+        return {key: value for key, value in metadata.items() if isinstance(value, (str, int, float, bool))}
+
+    @staticmethod
+    def delete_file_chunks(vectorstore: Chroma, file_path: str):
+        ids = vectorstore.get(where={"source": file_path}, include=[])["ids"]
+        debug_print(f"Deleting {len(ids)} chunks for {file_path}")
+        if ids:
+            vectorstore.delete(ids=ids)
+
+    async def backfill_bm25_index(self, name: str, bm25_index: BM25Index, page_size: int = 1000):
+        """
+        Build the BM25 index from the chunks already stored in the Chroma collection, without re-embedding.
+        """
+        debug_print(f"Backfilling BM25 index for {name}")
+        collection = await asyncio.to_thread(self.client.get_collection, f"{name}_collection")
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(collection.get, include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            await asyncio.to_thread(bm25_index.upsert, page["ids"], page["documents"], [metadata or {} for metadata in page["metadatas"]])
+            offset += len(page["ids"])
+        debug_print(f"Backfilled BM25 index for {name} with {offset} chunks")
 
     async def delete_collection(self, name: str):
         collection_name = f"{name}_collection"
+        await asyncio.to_thread(get_bm25_index(name).clear)
         try:
-            if collection_name in self.client.list_collections():
+            if collection_name in await self.list_collection_names():
                 debug_print(f"Deleting existing collection: {collection_name}")
                 await asyncio.to_thread(self.client.delete_collection, collection_name)
                 debug_print(f"Deleted collection: {collection_name}")
         except Exception as e:
             debug_print(f"Error deleting collection {collection_name}: {str(e)}")
 
+    async def list_collection_names(self) -> List[str]:
+        # Depending on the chromadb version list_collections returns names or Collection objects
+        collections = await asyncio.to_thread(self.client.list_collections)
+        return [c if isinstance(c, str) else c.name for c in collections]
+
     async def verify_collection_exists(self, name: str) -> bool:
         collection_name = f"{name}_collection"
         try:
-            collections = await asyncio.to_thread(self.client.list_collections)
-            exists = collection_name in [c.name for c in collections]
+            exists = collection_name in await self.list_collection_names()
             if exists:
                 debug_print(f"Verified: Collection {collection_name} exists")
             else:
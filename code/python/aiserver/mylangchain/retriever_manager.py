@@ -28,5 +28,8 @@ class RetrieverManager:
     def get_retriever(self, name: str):
         return self.builder.get_retriever(name)
 
+    async def get_retriever_async(self, name: str):
+        return await self.builder.get_retriever_async(name)
+
 retriever_manager = RetrieverManager()
 debug_print("RetrieverManager instance created")
\ No newline at end of file
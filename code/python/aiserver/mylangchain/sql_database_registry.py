@@ -0,0 +1,148 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from utils.debug_utils import debug_print
+
+DB_READER_DB_URI = os.getenv("DB_READER_DB_URI")
+# Connection pool shared by every DB bot using the same database URI
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# How long the reflected schema is reused, so schema changes made outside the bots are picked up (0 to keep it
+# until the next DDL statement run through the bots)
+DB_SCHEMA_CACHE_TTL = float(os.getenv("DB_SCHEMA_CACHE_TTL", "600"))
+
+# Statements which change the schema, anywhere in a possibly multi-statement command
+DDL_PATTERN = re.compile(r"(^|;)\s*(create|alter|drop|truncate|rename|comment)\b", re.IGNORECASE)
+
+_lock = threading.Lock()
+_engines: Dict[str, Engine] = {}
+_databases: Dict[str, "CachedSQLDatabase"] = {}
+_schema_refreshes: Dict[str, int] = {}
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase which reflects tables lazily and caches the table info (CREATE TABLE statements and sample rows)
+    given to the SQL agent.
+
+    The table names are read once when it is created, so rather than being refreshed in place it is marked
+    stale when a DDL statement is run through it, or once it is older than DB_SCHEMA_CACHE_TTL seconds, and
+    get_sql_database hands out a new one on the same engine. Bots rebuild their SQL agent or tools when the
+    database they are given changes.
+    """
+
+    def __init__(self, engine: Engine, schema_cache_ttl: float = DB_SCHEMA_CACHE_TTL, **kwargs: Any):
+        """
+        :param engine: The SQLAlchemy engine, shared by every bot using the database
+        :param schema_cache_ttl: Seconds the schema is reused for, 0 to keep it until the next DDL statement
+        :param kwargs: Other SQLDatabase options
+        """
+        kwargs.setdefault("lazy_table_reflection", True)
+        super().__init__(engine, **kwargs)
+        self.schema_cache_ttl = schema_cache_ttl
+        self.schema_lock = threading.RLock()
+        self.table_info_cache: Dict[Tuple[str, ...], str] = {}
+        self.created_at = time.time()
+        self.schema_changed = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stale(self) -> bool:
+        return self.schema_changed or bool(
+            self.schema_cache_ttl and time.time() - self.created_at > self.schema_cache_ttl)
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        with self.schema_lock:
+            key = tuple(sorted(table_names)) if table_names else ()
+            if key in self.table_info_cache:
+                self.hits += 1
+                return self.table_info_cache[key]
+            self.misses += 1
+            table_info = super().get_table_info(table_names)
+            self.table_info_cache[key] = table_info
+            return table_info
+
+    def run(self, command: Any, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return super().run(command, *args, **kwargs)
+        finally:
+            # Also after a failure, as part of a multi-statement command may have been applied
+            if isinstance(command, str) and DDL_PATTERN.search(command):
+                debug_print("DDL statement run, the cached database schema will be replaced")
+                with self.schema_lock:
+                    self.schema_changed = True
+                    self.table_info_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached_table_infos": len(self.table_info_cache),
+            "pool": self._engine.pool.status(),
+        }
+
+
+def create_pooled_engine(db_url: str) -> Engine:
+    if db_url.startswith("sqlite"):
+        # SQLite uses its own pool classes, which don't take the sizing options
+        return create_engine(db_url)
+    return create_engine(
+        db_url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        # Connections dropped by the server (e.g. the Supabase pooler) are replaced rather than failing a query
+        pool_pre_ping=True,
+    )
+
+
+def get_sql_database(db_url: Optional[str] = None) -> CachedSQLDatabase:
+    """
+    Process-wide SQLDatabase for the URI, so every DB bot shares one engine, connection pool and schema cache.
+    A stale database (see CachedSQLDatabase) is replaced by a new one on the same engine.
+
+    :param db_url: The database URI, DB_READER_DB_URI by default
+    """
+    db_url = db_url or DB_READER_DB_URI
+    if not db_url:
+        raise ValueError("DB_READER_DB_URI must be set to use the DB bots")
+    with _lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            debug_print("Creating shared SQL database engine")
+            engine = _engines[db_url] = create_pooled_engine(db_url)
+        database = _databases.get(db_url)
+        if database is None or database.stale:
+            if database is not None:
+                _schema_refreshes[db_url] = _schema_refreshes.get(db_url, 0) + 1
+            database = _databases[db_url] = CachedSQLDatabase(engine)
+        return database
+
+
+def sql_database_stats() -> Dict[str, Any]:
+    with _lock:
+        databases = list(_databases.items())
+    return {
+        database._engine.url.render_as_string(hide_password=True): {
+            **database.stats(), "schema_refreshes": _schema_refreshes.get(db_url, 0)
+        }
+        for db_url, database in databases
+    }
+
+
+def close_sql_databases():
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+        _databases.clear()
+    for engine in engines:
+        engine.dispose()
@@ -1,4 +1,5 @@
 import os
+import uuid
 from utils.partial_file_utils import PartialFileUtils
 from bots.file_fixing_bot import FileFixingBot
 
@@ -64,7 +65,8 @@ def update_system_file(system_root_dir: str, file_path: str, file_content: str,
 
         print("[DEBUG] Processing content using file fixing bot")
         # Process the content using the file fixing bot
-        processed_content = file_fixing_bot.process_request_sync_final_only(bot_input, "")
+        # A thread of its own, so earlier merges never end up in the prompt
+        processed_content = file_fixing_bot.process_request_sync_final_only(bot_input, "", thread_id=str(uuid.uuid4()))
         if PartialFileUtils.is_partial_file_content(processed_content):
             print("[ERROR] File fixing bot returned partial content")
             raise Exception("File fixing bot failed to fix the partial file content")
@@ -1,12 +1,19 @@
 from fastapi import APIRouter, HTTPException, Request, FastAPI
 from fastapi.responses import StreamingResponse
-from bots.configured_bots import get_all_bots, get_bot
+from bots.configured_bots import get_all_bots, get_bot, get_bot_registry
 from utils.debug_utils import debug_print
+from utils.async_utils import iterate_in_thread
+from mylangchain.retriever.semantic_cache import semantic_cache_stats
+from llms.llm_cache import llm_cache_store
+from toolkits.browser_pool import browser_pool
+from tools.http_cache import http_cache
+from mylangchain.sql_database_registry import sql_database_stats
 from bots.sync_bot_interface import SyncBotInterface
 from bots.async_bot_interface import AsyncBotInterface
 from bots.simple_bot_interface import SimpleBotInterface
 import json
 import traceback
+import weakref
 from typing import Any, Dict, AsyncGenerator
 
 def create_bot_router(app: FastAPI):
@@ -14,17 +21,28 @@ def create_bot_router(app: FastAPI):
 
     async def process_sync_bot(bot: SyncBotInterface, user_input: str, context: str, config: Dict[str, Any]) -> AsyncGenerator[str, None]:
         debug_print(f"*** Processing request synchronously for bot {bot.bot_type}")
-        for response in bot.process_request(user_input, context, **config):
+        # The sync bot blocks on LLM and tool calls so run it in the worker pool to keep the event loop free
+        async for response in iterate_in_thread(lambda: bot.process_request(user_input, context, **config)):
             yield f"data: {json.dumps(response)}\n\n"
 
     async def process_async_bot(bot: AsyncBotInterface, user_input: str, context: str, config: Dict[str, Any]) -> AsyncGenerator[str, None]:
         debug_print(f"*** Processing request asynchronously for bot {bot.bot_type}")
+        # With config "stream_tokens" enabled, token deltas arrive here as {'type': 'delta'} responses
+        # ahead of the usual 'intermediate' and 'final' responses
         async for response in bot.process_request_async(user_input, context, **config):
             yield f"data: {json.dumps(response)}\n\n"
 
     async def process_simple_bot(bot: SimpleBotInterface, user_input: str, context: str, config: Dict[str, Any]) -> AsyncGenerator[str, None]:
         debug_print(f"*** Processing simple request for bot {bot.bot_type}")
-        response = await bot.simple_process_request(user_input, context, **config)
+        if config.get('stream_tokens', bot.stream_tokens):
+            # Deltas are sent as they arrive, then the full response as the usual 'final' response
+            deltas = []
+            async for delta in bot.simple_stream_request(user_input, context, **config):
+                deltas.append(delta)
+                yield f"data: {json.dumps({'type': 'delta', 'content': delta})}\n\n"
+            response = "".join(deltas).strip()
+        else:
+            response = await bot.simple_process_request(user_input, context, **config)
         yield f"data: {json.dumps({'type': 'final', 'content': response})}\n\n"
 
     bot_processors = {
@@ -33,6 +51,14 @@ def create_bot_router(app: FastAPI):
         SimpleBotInterface: process_simple_bot,
     }
 
+    async def process(bot, user_input: str, context: str, config: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        for bot_interface, processor in bot_processors.items():
+            if isinstance(bot, bot_interface):
+                async for response in processor(bot, user_input, context, config):
+                    yield response
+                return
+        raise ValueError(f"Unsupported bot type: {type(bot)}")
+
     @bot_router.get('/bots')
     async def get_available_bots():
         """
@@ -50,6 +76,32 @@ def create_bot_router(app: FastAPI):
         ]
         return available_bots
 
+    @bot_router.get('/bots/stats')
+    async def get_bot_stats():
+        """
+        Returns live/evicted counts for the bot instance registry.
+        """
+        return get_bot_registry(app).stats()
+
+    @bot_router.get('/bots/browser-pool-stats')
+    async def get_browser_pool_stats():
+        """
+        Returns context and browser usage for the shared scraping browser pool.
+        """
+        return browser_pool.stats()
+
+    @bot_router.get('/bots/cache-stats')
+    async def get_cache_stats():
+        """
+        Returns hit/miss counters for the response caches.
+        """
+        return {
+            "llm_response_cache": llm_cache_store.stats(),
+            "semantic_response_cache": semantic_cache_stats(),
+            "http_cache": http_cache.stats(),
+            "sql_schema_cache": sql_database_stats(),
+        }
+
     @bot_router.post('/bots/{bot_type}')
     async def chat(bot_type: str, request: Request):
         debug_print(f"Received POST request to /bots/{bot_type}")
@@ -69,27 +121,43 @@ def create_bot_router(app: FastAPI):
             debug_print("Error: No thread_id provided")
             raise HTTPException(status_code=400, detail="No thread_id provided")
 
-        bot = get_bot(app, bot_type, thread_id)
+        # Marked in use by the lookup itself, so it can't be evicted and closed before the stream starts
+        bot = get_bot(app, bot_type, thread_id, config.get('llm_provider'), config.get('llm_model'), in_use=True)
         if bot is None:
             debug_print(f"Error: Invalid bot type {bot_type}")
             raise HTTPException(status_code=400, detail=f"Invalid bot type {bot_type}")
 
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                get_bot_registry(app).release(bot)
+
         async def generate():
             try:
-                for bot_interface, processor in bot_processors.items():
-                    if isinstance(bot, bot_interface):
-                        async for response in processor(bot, user_input, context, config):
-                            yield response
-                        break
-                else:
-                    raise ValueError(f"Unsupported bot type: {type(bot)}")
+                async for response in process(bot, user_input, context, config):
+                    if await request.is_disconnected():
+                        debug_print(f"Client disconnected, cancelling request for bot {bot_type}")
+                        return
+                    yield response
             except Exception as e:
                 error_message = f"Error processing request: {str(e)}"
                 stack_trace = traceback.format_exc()
                 debug_print(f"{error_message}\n{stack_trace}")
                 yield f"data: {json.dumps({'type': 'error', 'content': error_message})}\n\n"
+            finally:
+                release()
             yield "data: [DONE]\n\n"
 
-        return StreamingResponse(generate(), media_type='text/event-stream')
+        stream = generate()
+        # The generator's finally never runs if the response is dropped before streaming starts (e.g. the client
+        # went away), so the bot is also released when the generator is discarded
+        weakref.finalize(stream, release)
+
+        # Stop any proxy from buffering the stream so deltas reach the client as soon as they are generated
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        return StreamingResponse(stream, media_type='text/event-stream', headers=headers)
 
     return bot_router
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Union
-from llms.llm_manager import LLMManager
+from llms.model_discovery import model_discovery
+from llms.llm_router import router_stats
+from llms.rate_limiter import rate_limiter_stats
 
 llm_models_router = APIRouter()
 
@@ -8,7 +10,7 @@ llm_models_router = APIRouter()
 @llm_models_router.get('/llm-models')
 async def get_llm_models(provider: str = Query('', description="LLM provider name")):
     try:
-        models = LLMManager.fetch_models(provider.lower())
+        models = await model_discovery.get_models(provider.lower())
         return {"models": models}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -19,21 +21,37 @@ async def get_llm_models(provider: str = Query('', description="LLM provider nam
 @llm_models_router.get('/llm-providers', response_model=Dict[str, List[Dict[str, Union[str, List[str]]]]])
 async def get_llm_providers():
     try:
-        providers_data = []
-        for provider_name, provider in LLMManager.providers.items():
-            models = provider.fetch_models()
-            default_model = provider.get_default_model()
-
-            # Ensure the default model is the first in the list
-            if default_model in models:
-                models.remove(default_model)
-            models.insert(0, default_model)
+        providers_data = await model_discovery.get_providers()
+        return {"providers": providers_data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch LLM providers and models: {str(e)}")
 
-            providers_data.append({
-                "provider": provider_name,
-                "models": models
-            })
 
+@llm_models_router.post('/llm-providers/refresh', response_model=Dict[str, List[Dict[str, Union[str, List[str]]]]])
+async def refresh_llm_providers(provider: str = Query('', description="LLM provider name, all providers if empty")):
+    """
+    Re-fetch the models from the providers now instead of waiting for the cached lists to expire.
+    """
+    try:
+        providers_data = await model_discovery.refresh(provider.lower() or None)
         return {"providers": providers_data}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch LLM providers and models: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to refresh LLM providers and models: {str(e)}")
+
+
+@llm_models_router.get('/llm-router/stats')
+async def get_llm_router_stats():
+    """
+    Returns request, error and latency (p50/p95) stats for each (provider, model) target.
+    """
+    return {"targets": router_stats()}
+
+
+@llm_models_router.get('/llm-rate-limits/stats')
+async def get_llm_rate_limit_stats():
+    """
+    Returns the limits, requests in flight, queued requests and queue wait times of each provider's rate limiter.
+    """
+    return {"limiters": rate_limiter_stats()}
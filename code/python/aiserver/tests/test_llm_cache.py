@@ -0,0 +1,62 @@
+import uuid
+from typing import Any, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from llms.llm_cache import LLMCacheStore, LLMResponseCache
+from llms.llm_manager import LLMManager
+from llms.llm_wrapper import LLMWrapper
+from mylangchain.langchain_bot_interface import LangchainBotInterface
+from processors.update_system_file import update_system_file
+
+ORIGINAL = "print('a')\nprint('b')\n"
+PARTIAL = "# ...\nprint('c')\n"
+MERGED = "print('a')\nprint('b')\nprint('c')\n"
+
+# Prompts which reached the model, kept outside the model so they aren't part of the cache key
+model_calls: List[List[BaseMessage]] = []
+
+
+class MergingChatModel(BaseChatModel):
+    @property
+    def _llm_type(self) -> str:
+        return "merging-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        model_calls.append(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=MERGED))])
+
+
+def test_repeated_file_merge_is_served_from_llm_cache(tmp_path, monkeypatch):
+    store = LLMCacheStore(path=str(tmp_path / "cache" / "llm_cache.sqlite"))
+    model = MergingChatModel(cache=LLMResponseCache("fake", store))
+    monkeypatch.setattr(LLMManager, "get_default_llm", lambda tools=None: LLMWrapper(model, "fake"))
+    monkeypatch.setattr(LangchainBotInterface, "llm_fallbacks", [])
+    model_calls.clear()
+
+    for _ in range(2):
+        (tmp_path / "a.py").write_text(ORIGINAL)
+        update_system_file(str(tmp_path), "a.py", PARTIAL)
+        assert (tmp_path / "a.py").read_text() == MERGED
+
+    assert len(model_calls) == 1
+    assert store.hits == 1
+
+
+def test_thread_id_is_kept_out_of_the_prompt():
+    class Bot(LangchainBotInterface):
+        bot_type = "test-bot"
+        description = ""
+
+        def create_graph(self):
+            pass
+
+        def get_tools(self):
+            return []
+
+    bot = Bot()
+    thread_id = str(uuid.uuid4())
+    assert thread_id not in bot.format_input_message("question", "context", thread_id)
+    Bot.thread_id_in_prompt = True
+    assert thread_id in bot.format_input_message("question", "context", thread_id)
@@ -0,0 +1,86 @@
+import json
+from collections import OrderedDict
+from typing import Any, AsyncIterator, List, Optional
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+import bots.configured_bots as configured_bots
+from llms.llm_manager import LLMManager
+from llms.llm_wrapper import LLMWrapper
+from mylangchain.async_langchain_bot_interface import AsyncLangchainBotInterface
+from mylangchain.langchain_bot_interface import LangchainBotInterface
+from routes.bot_router import create_bot_router
+
+TOKENS = ["Hello", " from", " the", " graph"]
+
+
+class StreamingChatModel(BaseChatModel):
+    @property
+    def _llm_type(self) -> str:
+        return "streaming-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(TOKENS)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for token in TOKENS:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class StreamingBot(AsyncLangchainBotInterface):
+    bot_type = "streaming-test-bot"
+    description = ""
+
+    def __init__(self):
+        super().__init__()
+        self.checkpointer = MemorySaver()
+
+    def get_tools(self):
+        return []
+
+    def create_graph(self):
+        async def summarise(state: MessagesState):
+            # A helper call whose tokens mustn't reach the client
+            summary = await self.llm.with_config(tags=["nostream"]).ainvoke(state["messages"])
+            return {"messages": [AIMessage(content=f"Summary: {summary.content}")]}
+
+        async def answer(state: MessagesState):
+            return {"messages": [await self.llm.ainvoke(state["messages"])]}
+
+        graph_builder = StateGraph(MessagesState)
+        graph_builder.add_node("summarise", summarise)
+        graph_builder.add_node("answer", answer)
+        graph_builder.add_edge(START, "summarise")
+        graph_builder.add_edge("summarise", "answer")
+        graph_builder.add_edge("answer", END)
+        return graph_builder.compile(checkpointer=self.checkpointer)
+
+
+def test_token_deltas_reach_the_sse_stream(monkeypatch):
+    monkeypatch.setattr(LLMManager, "get_default_llm", lambda tools=None: LLMWrapper(StreamingChatModel(), "fake"))
+    monkeypatch.setattr(LangchainBotInterface, "llm_fallbacks", [])
+    monkeypatch.setattr(configured_bots, "get_bot_factories", lambda: OrderedDict([(StreamingBot.bot_type, StreamingBot)]))
+    app = FastAPI()
+    app.include_router(create_bot_router(app))
+
+    with TestClient(app) as client:
+        response = client.post(f"/bots/{StreamingBot.bot_type}", json={
+            "message": "hi", "config": {"thread_id": "1", "stream_tokens": True}
+        })
+
+    lines = [line[len("data: "):] for line in response.text.split("\n\n") if line.startswith("data: ")]
+    assert lines[-1] == "[DONE]"
+    responses = [json.loads(line) for line in lines[:-1]]
+    assert [r["content"] for r in responses if r["type"] == "delta"] == TOKENS
+    # The deltas come ahead of the final message, which is still sent whole
+    assert {"type": "intermediate", "content": "Summary: " + "".join(TOKENS)} in responses
+    assert responses[-1] == {"type": "final", "content": "".join(TOKENS)}
@@ -0,0 +1,327 @@
+import asyncio
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional, Set
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+from utils.debug_utils import debug_print
+
+BROWSER_POOL_MAX_CONTEXTS = int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "8"))
+BROWSER_POOL_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_POOL_ACQUIRE_TIMEOUT", "60"))
+BROWSER_POOL_RECYCLE_PAGES = int(os.getenv("BROWSER_POOL_RECYCLE_PAGES", "200"))
+BROWSER_POOL_WARM_UP = os.getenv("BROWSER_POOL_WARM_UP", "true").lower() == "true"
+BROWSER_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("BROWSER_POOL_HEALTH_CHECK_INTERVAL", "60"))
+
+
+class BrowserPool:
+    """
+    Process-wide Chromium shared by every scraping bot and tool, handing out isolated BrowserContexts.
+
+    At most max_contexts contexts are open at once, further requests wait for one to be released. Contexts
+    kept between requests (see PooledBrowser) are parked while idle, and the least recently parked one is
+    closed to make room when a request would otherwise wait. The
+    browser is relaunched if it crashes, and recycled once it has opened recycle_pages pages to keep its
+    memory in check: new contexts go to a fresh browser while the old one closes when its last context
+    is released. Must be used from the event loop it was bound to (the server's, see bind_loop), sync
+    callers go through run_sync.
+    """
+
+    def __init__(self, max_contexts: int = BROWSER_POOL_MAX_CONTEXTS, recycle_pages: int = BROWSER_POOL_RECYCLE_PAGES,
+                 acquire_timeout: float = BROWSER_POOL_ACQUIRE_TIMEOUT):
+        self.max_contexts = max_contexts
+        self.recycle_pages = recycle_pages
+        self.acquire_timeout = acquire_timeout
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Runs the pool for run_sync callers when there is no server loop (e.g. scripts)
+        self.private_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.private_loop_lock = threading.Lock()
+        self.lock: Optional[asyncio.Lock] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.playwright: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+        self.browser_pages = 0
+        # Browsers waiting for their contexts to be released before they are closed
+        self.retiring: Set[Browser] = set()
+        self.contexts: Dict[BrowserContext, Browser] = {}
+        # Open contexts which no request is using, oldest first
+        self.parked: "OrderedDict[BrowserContext, None]" = OrderedDict()
+        self.waiting = 0
+        self.reclaimed = 0
+        self.launches = 0
+        self.pages = 0
+        self.waits = 0
+
+    def bind_loop(self):
+        """
+        Bind the pool to the running event loop, called at server startup and on first use.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        if self.loop is not None and not self.loop.is_closed():
+            # Its browser and contexts belong to that loop, and would be leaked if the pool moved on
+            raise RuntimeError("The browser pool is bound to another event loop, use browser_pool.run_sync "
+                               "from other threads")
+        if self.loop is not None and (self.browser is not None or self.contexts or self.retiring):
+            # The loop closed without close() being called, its Playwright connection went with it
+            debug_print("Event loop of the browser pool was closed without closing the pool, starting afresh")
+        self.loop = loop
+        self.lock = asyncio.Lock()
+        self.slots = asyncio.Semaphore(self.max_contexts)
+        self.playwright = None
+        self.browser = None
+        self.retiring = set()
+        self.contexts = {}
+        self.parked = OrderedDict()
+        self.waiting = 0
+
+    async def get_browser(self) -> Browser:
+        self.bind_loop()
+        async with self.lock:
+            if self.browser is not None and not self.browser.is_connected():
+                debug_print("Pooled browser is no longer connected, relaunching")
+                self.browser = None
+            if self.browser is not None and self.recycle_pages and self.browser_pages >= self.recycle_pages:
+                debug_print(f"Recycling pooled browser after {self.browser_pages} pages")
+                self.retiring.add(self.browser)
+                self.browser = None
+                await self.close_retired()
+            if self.browser is None:
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                debug_print("Launching pooled browser")
+                self.browser = await self.playwright.chromium.launch()
+                self.browser_pages = 0
+                self.launches += 1
+            return self.browser
+
+    async def warm_up(self):
+        """
+        Launch the browser ahead of the first request.
+        """
+        await self.get_browser()
+
+    async def check_health(self):
+        """
+        Relaunch a crashed browser, recycle a worn one and close retired browsers which are no longer in use,
+        so the next request doesn't pay for it.
+        """
+        if self.loop is None:
+            return
+        await self.get_browser()
+        # Idle contexts would keep a retired browser open until the conversation's next request
+        for context in [context for context in self.parked if self.contexts[context] in self.retiring]:
+            await self.release(context)
+        async with self.lock:
+            await self.close_retired()
+
+    async def acquire(self, **options: Any) -> BrowserContext:
+        """
+        Open a new isolated context, waiting up to acquire_timeout for a free slot.
+
+        :param options: Options for Browser.new_context, e.g. user_agent or viewport
+        :return: The context, to be given back with release
+        """
+        self.bind_loop()
+        if self.slots.locked() and self.parked:
+            context = next(iter(self.parked))
+            debug_print("All browser contexts open, closing the least recently used idle one")
+            self.reclaimed += 1
+            await self.release(context)
+        if self.slots.locked():
+            self.waits += 1
+            debug_print(f"All {self.max_contexts} browser contexts in use, waiting")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"No browser context available after {self.acquire_timeout}s "
+                               f"(BROWSER_POOL_MAX_CONTEXTS={self.max_contexts})")
+        finally:
+            self.waiting -= 1
+        try:
+            browser = await self.get_browser()
+            context = await browser.new_context(**options)
+        except BaseException:
+            self.slots.release()
+            raise
+        context.on("page", self.on_page)
+        self.contexts[context] = browser
+        return context
+
+    def on_page(self, page):
+        self.pages += 1
+        self.browser_pages += 1
+
+    async def park(self, context: BrowserContext):
+        """
+        Mark a context kept between requests as idle, so it can be closed when another request needs the slot.
+        """
+        if context not in self.contexts:
+            return
+        if self.waiting:
+            # Someone is already waiting for a slot, so give this one up straight away
+            self.reclaimed += 1
+            await self.release(context)
+            return
+        self.parked[context] = None
+        self.parked.move_to_end(context)
+
+    def unpark(self, context: BrowserContext):
+        self.parked.pop(context, None)
+
+    async def release(self, context: BrowserContext):
+        browser = self.contexts.pop(context, None)
+        if browser is None:
+            return
+        self.parked.pop(context, None)
+        self.slots.release()
+        try:
+            await context.close()
+        except Exception as e:
+            debug_print(f"Error closing browser context: {str(e)}")
+        await self.close_retired()
+
+    @asynccontextmanager
+    async def context(self, **options: Any) -> AsyncIterator[BrowserContext]:
+        context = await self.acquire(**options)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    async def close_retired(self):
+        in_use = set(self.contexts.values())
+        for browser in [browser for browser in self.retiring if browser not in in_use]:
+            self.retiring.discard(browser)
+            debug_print("Closing retired pooled browser")
+            try:
+                await browser.close()
+            except Exception as e:
+                debug_print(f"Error closing retired browser: {str(e)}")
+
+    async def close(self):
+        """
+        Close every context and browser, called on shutdown.
+        """
+        if self.loop is None:
+            return
+        for context in list(self.contexts):
+            await self.release(context)
+        for browser in [self.browser] + list(self.retiring):
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception as e:
+                    debug_print(f"Error closing pooled browser: {str(e)}")
+        if self.playwright is not None:
+            await self.playwright.stop()
+        self.browser = None
+        self.retiring = set()
+        self.playwright = None
+        self.loop = None
+
+    def run_sync(self, coro: Coroutine) -> Any:
+        """
+        Run a coroutine using the pool from synchronous code, e.g. a sync tool called in a worker thread.
+        """
+        loop = self.loop if self.loop is not None and self.loop.is_running() else self.get_private_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            coro.close()
+            raise RuntimeError("BrowserPool.run_sync can't be called from the event loop, await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def get_private_loop(self) -> asyncio.AbstractEventLoop:
+        # No server loop (e.g. a script), the pool gets a loop thread of its own which keeps the browser
+        # running between calls, and closes it at exit
+        with self.private_loop_lock:
+            if self.private_loop is None:
+                self.private_loop = asyncio.new_event_loop()
+                threading.Thread(target=self.private_loop.run_forever, name="browser-pool", daemon=True).start()
+                atexit.register(self.close_private_loop)
+            return self.private_loop
+
+    def close_private_loop(self):
+        loop, self.private_loop = self.private_loop, None
+        if loop is None:
+            return
+        if self.loop is loop:
+            try:
+                asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout=30)
+            except Exception as e:
+                debug_print(f"Error closing browser pool: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_contexts": self.max_contexts,
+            "contexts_in_use": len(self.contexts) - len(self.parked),
+            "contexts_parked": len(self.parked),
+            "browser_running": self.browser is not None and self.browser.is_connected(),
+            "browser_pages": self.browser_pages,
+            "retiring_browsers": len(self.retiring),
+            "launches": self.launches,
+            "pages": self.pages,
+            "waits": self.waits,
+            "reclaimed": self.reclaimed,
+        }
+
+
+browser_pool = BrowserPool()
+
+
+class PooledBrowser(Browser):
+    """
+    Browser handed to the langchain Playwright tools, which share the page of the first context. It takes a
+    context from the pool on the first navigation and keeps it (and so the current page) for the next request
+    of the conversation. Between requests it is parked, so it only holds a pool slot while it is in use: when
+    the pool is full the parked context may be closed, and the next navigation takes a new one.
+    """
+
+    def __init__(self, pool: BrowserPool = browser_pool, **context_options: Any):
+        # The underlying browser is owned by the pool, so Browser.__init__ isn't called
+        self.pool = pool
+        self.context_options = context_options
+        self.context: Optional[BrowserContext] = None
+
+    @property
+    def contexts(self) -> List[BrowserContext]:
+        if self.context is not None and self.pool.contexts.get(self.context) is None:
+            # The pool was closed or the browser crashed, a new context is taken on the next use
+            self.context = None
+        elif self.context is not None and not self.pool.contexts[self.context].is_connected():
+            self.pool.loop.create_task(self.pool.release(self.context))
+            self.context = None
+        elif self.context is not None:
+            # The tools are using it again
+            self.pool.unpark(self.context)
+        return [self.context] if self.context is not None else []
+
+    async def new_context(self, **options: Any) -> BrowserContext:
+        if self.context is None:
+            self.context = await self.pool.acquire(**{**self.context_options, **options})
+        return self.context
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def park(self):
+        """
+        Called when a request is done with the browser, keeping the page for the next one unless the slot is needed.
+        """
+        if self.context is not None:
+            await self.pool.park(self.context)
+
+    async def close(self, **kwargs: Any) -> None:
+        if self.context is not None:
+            context, self.context = self.context, None
+            await self.pool.release(context)
+
+    def __repr__(self) -> str:
+        return f"<PooledBrowser context={self.context!r}>"
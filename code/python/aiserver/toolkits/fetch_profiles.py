@@ -0,0 +1,183 @@
+import os
+import re
+import weakref
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import httpx
+from bs4 import BeautifulSoup
+from tools.http_cache import http_cache
+from utils.debug_utils import debug_print
+
+BROWSER_FETCH_PROFILE = os.getenv("BROWSER_FETCH_PROFILE", "fast")
+
+# Sent on plain HTTP fetches, as many sites turn away the default python client user agent
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                      "Chrome/126.0.0.0 Safari/537.36")
+
+# Third party analytics, ads and tag managers which never contribute content
+TRACKER_URL_PATTERN = (r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|googlesyndication\.com|"
+                       r"facebook\.net|connect\.facebook|hotjar\.com|segment\.(io|com)|newrelic\.com|"
+                       r"nr-data\.net|clarity\.ms|optimizely\.com|scorecardresearch\.com")
+
+# Client-rendered apps ship an empty mount point that JavaScript fills in
+EMPTY_APP_ROOT_IDS = ("root", "app", "__next", "__nuxt", "svelte")
+
+
+class FetchProfile:
+    """
+    How the browser tools load pages: which requests are blocked, what navigation waits for, and whether
+    pages are first fetched over plain HTTP, only using the browser when the page needs JavaScript or an
+    interaction (click, fill) needs a real page.
+    """
+
+    def __init__(self, name: str, blocked_resource_types: FrozenSet[str] = frozenset(),
+                 blocked_url_pattern: Optional[str] = None, wait_until: str = "load", http_first: bool = False,
+                 min_text_length: int = 200, timeout: float = 30):
+        """
+        :param name: The profile name
+        :param blocked_resource_types: Playwright resource types to abort, e.g. image, font, media
+        :param blocked_url_pattern: Regex of request URLs to abort
+        :param wait_until: What browser navigation waits for: load, domcontentloaded, networkidle or commit
+        :param http_first: Whether to try a plain HTTP fetch before the browser
+        :param min_text_length: Static pages with less text than this are assumed to be rendered by JavaScript
+        :param timeout: Navigation and fetch timeout in seconds
+        """
+        self.name = name
+        self.blocked_resource_types = blocked_resource_types
+        self.blocked_url_regex = re.compile(blocked_url_pattern) if blocked_url_pattern else None
+        self.wait_until = wait_until
+        self.http_first = http_first
+        self.min_text_length = min_text_length
+        self.timeout = timeout
+
+    @property
+    def blocks_requests(self) -> bool:
+        return bool(self.blocked_resource_types or self.blocked_url_regex)
+
+    def is_blocked(self, resource_type: str, url: str) -> bool:
+        return resource_type in self.blocked_resource_types or bool(
+            self.blocked_url_regex and self.blocked_url_regex.search(url))
+
+
+FETCH_PROFILES: Dict[str, FetchProfile] = {
+    # Everything loads as in a normal browser
+    "full": FetchProfile("full"),
+    # Static pages over plain HTTP, otherwise the browser without images, media, fonts or trackers
+    "fast": FetchProfile("fast", frozenset({"image", "media", "font"}), TRACKER_URL_PATTERN,
+                         wait_until="domcontentloaded", http_first=True),
+    # Text only, stylesheets are dropped too (can affect which elements count as visible for clicks)
+    "text": FetchProfile("text", frozenset({"image", "media", "font", "stylesheet"}), TRACKER_URL_PATTERN,
+                         wait_until="domcontentloaded", http_first=True),
+}
+
+
+def get_fetch_profile(profile: Any = None) -> FetchProfile:
+    if isinstance(profile, FetchProfile):
+        return profile
+    name = profile or BROWSER_FETCH_PROFILE
+    if name not in FETCH_PROFILES:
+        raise ValueError(f"Unknown fetch profile: {name}. Available profiles: {', '.join(FETCH_PROFILES)}")
+    return FETCH_PROFILES[name]
+
+
+_routed_contexts = weakref.WeakKeyDictionary()
+
+
+async def apply_routing(context: Any, profile: FetchProfile):
+    """
+    Abort the requests the profile blocks for every page of the browser context, once per context.
+    """
+    if not profile.blocks_requests or _routed_contexts.get(context) is profile:
+        return
+
+    async def route_request(route):
+        request = route.request
+        if profile.is_blocked(request.resource_type, request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    if context in _routed_contexts:
+        await context.unroute("**/*")
+    await context.route("**/*", route_request)
+    _routed_contexts[context] = profile
+
+
+class StaticPage:
+    """
+    A page fetched over plain HTTP, standing in for the browser's current page.
+    """
+
+    def __init__(self, url: str, status: int, html: str):
+        self.url = url
+        self.status = status
+        self.html = html
+        self._soup = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, "lxml")
+        return self._soup
+
+    def text(self) -> str:
+        soup = BeautifulSoup(self.html, "lxml")
+        for element in soup(["script", "style", "noscript", "template"]):
+            element.decompose()
+        return " ".join(text for text in soup.stripped_strings)
+
+    def needs_javascript(self, profile: FetchProfile) -> Tuple[bool, str]:
+        text = self.text()
+        if len(text) < profile.min_text_length:
+            return True, f"only {len(text)} characters of text"
+        for root_id in EMPTY_APP_ROOT_IDS:
+            root = self.soup.find(id=root_id)
+            if root is not None and not root.get_text(strip=True):
+                return True, f"empty #{root_id} app root"
+        return False, ""
+
+
+class FetchState:
+    """
+    Shared by the tools of one toolkit: the current static page (None when the browser page is current)
+    and the history of static pages for navigating back.
+    """
+
+    def __init__(self):
+        self.static_page: Optional[StaticPage] = None
+        self.history: List[str] = []
+        self.http_fetches = 0
+        self.escalations = 0
+
+
+async def fetch_static(url: str, profile: FetchProfile) -> Optional[StaticPage]:
+    """
+    Fetch the page over plain HTTP.
+
+    :return: The page, or None when it needs the browser (JavaScript rendering, bot protection, not HTML)
+    """
+    try:
+        # Through the HTTP cache, so pages an agent revisits are served locally or revalidated
+        response = await http_cache.aget(
+            url,
+            headers={"User-Agent": DEFAULT_USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8"},
+            timeout=profile.timeout,
+        )
+    except httpx.HTTPError as e:
+        debug_print(f"Plain HTTP fetch of {url} failed ({str(e) or e.__class__.__name__}), using the browser")
+        return None
+
+    content_type = response.headers.get("content-type", "")
+    if response.status_code in (401, 403, 429, 503):
+        # Often bot protection which a real browser gets through
+        debug_print(f"Plain HTTP fetch of {url} returned {response.status_code}, using the browser")
+        return None
+    if "html" not in content_type:
+        debug_print(f"Plain HTTP fetch of {url} returned {content_type or 'no content type'}, using the browser")
+        return None
+
+    page = StaticPage(str(response.url), response.status_code, response.text)
+    needs_javascript, reason = page.needs_javascript(profile)
+    if needs_javascript:
+        debug_print(f"{url} looks rendered by JavaScript ({reason}), using the browser")
+        return None
+    return page
@@ -1,7 +1,7 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Optional, Type, cast
+from typing import TYPE_CHECKING, Any, List, Optional, Type, cast
 
 from langchain_core.pydantic_v1 import Extra, root_validator
 from langchain_core.tools import BaseTool
@@ -21,6 +21,17 @@ from langchain_community.tools.playwright.get_elements import GetElementsTool
 from langchain_community.tools.playwright.navigate import NavigateTool
 from langchain_community.tools.playwright.navigate_back import NavigateBackTool
 from tools.web_fill_tool import FillTool
+from toolkits.fetch_profiles import FetchState, get_fetch_profile
+from tools.fetch_profile_tools import (
+    ProfiledClickTool,
+    ProfiledCurrentWebPageTool,
+    ProfiledExtractHyperlinksTool,
+    ProfiledExtractTextTool,
+    ProfiledFillTool,
+    ProfiledGetElementsTool,
+    ProfiledNavigateBackTool,
+    ProfiledNavigateTool,
+)
 
 if TYPE_CHECKING:
     from playwright.async_api import Browser as AsyncBrowser
@@ -35,10 +46,16 @@ else:
 
 
 class PlaywrightBrowserToolkit(BaseToolkit):
-    """Toolkit for PlayWright browser tools."""
+    """Toolkit for PlayWright browser tools.
+
+    With an async browser, pages are loaded according to fetch_profile (a FetchProfile or the name of one,
+    BROWSER_FETCH_PROFILE by default): blocked resource types, the navigation wait and the plain HTTP fast
+    path for static pages.
+    """
 
     sync_browser: Optional["SyncBrowser"] = None
     async_browser: Optional["AsyncBrowser"] = None
+    fetch_profile: Optional[Any] = None
 
     class Config:
         """Configuration for this pydantic object."""
@@ -56,6 +73,9 @@ class PlaywrightBrowserToolkit(BaseToolkit):
 
     def get_tools(self) -> List[BaseTool]:
         """Get the tools in the toolkit."""
+        if self.async_browser is not None:
+            return self.get_profiled_tools()
+
         tool_classes: List[Type[BaseBrowserTool]] = [
             ClickTool,
             NavigateTool,
@@ -75,13 +95,40 @@ class PlaywrightBrowserToolkit(BaseToolkit):
         ]
         return cast(List[BaseTool], tools)
 
+    def get_profiled_tools(self) -> List[BaseTool]:
+        profile = get_fetch_profile(self.fetch_profile)
+        # One state per toolkit, so all its tools see the same current page
+        fetch_state = FetchState()
+        tool_classes: List[Type[BaseBrowserTool]] = [
+            ProfiledClickTool,
+            ProfiledNavigateTool,
+            ProfiledNavigateBackTool,
+            ProfiledExtractTextTool,
+            ProfiledExtractHyperlinksTool,
+            ProfiledGetElementsTool,
+            ProfiledCurrentWebPageTool,
+            ProfiledFillTool,
+        ]
+
+        tools = [
+            tool_cls(
+                sync_browser=self.sync_browser,
+                async_browser=self.async_browser,
+                fetch_profile=profile,
+                fetch_state=fetch_state,
+            )
+            for tool_cls in tool_classes
+        ]
+        return cast(List[BaseTool], tools)
+
     @classmethod
     def from_browser(
         cls,
         sync_browser: Optional[SyncBrowser] = None,
         async_browser: Optional[AsyncBrowser] = None,
+        fetch_profile: Optional[Any] = None,
     ) -> PlaywrightBrowserToolkit:
         """Instantiate the toolkit."""
         # This is to raise a better error than the forward ref ones Pydantic would have
         lazy_import_playwright_browsers()
-        return cls(sync_browser=sync_browser, async_browser=async_browser)
\ No newline at end of file
+        return cls(sync_browser=sync_browser, async_browser=async_browser, fetch_profile=fetch_profile)
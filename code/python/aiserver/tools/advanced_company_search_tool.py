@@ -1,59 +1,78 @@
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional
-from langchain.tools import tool
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from typing import Dict, Any, List, Optional
+from langchain.tools import StructuredTool
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from toolkits.browser_pool import browser_pool
+from toolkits.fetch_profiles import apply_routing, get_fetch_profile
+from tools.company_name_search import COMPANY_SEARCH_HOST_CONCURRENCY, COMPANY_SEARCH_RESULT_LIMIT
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def _get_detailed_company_info(page, url: str) -> Dict[str, Any]:
+async def _load_page(context, url: str, semaphore: asyncio.Semaphore, extract):
+    # Each page is opened in its own tab so the company pages load concurrently, bounded by the semaphore
+    async with semaphore:
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded")
+            return await extract(page)
+        finally:
+            await page.close()
+
+
+async def _extract_overview(page) -> Dict[str, Any]:
+    # Extract basic company information
+    company_info = {
+        "name": await page.text_content('h1.heading-xlarge'),
+        "company_number": await page.text_content('p.heading-secondary'),
+        "status": await page.text_content('dd.company-status'),
+    }
+    logger.debug(f"Basic company info: {company_info}")
+
+    # Extract company overview
+    overview = {}
+    overview_items = await page.query_selector_all('#company-overview dt, #company-overview dd')
+    for i in range(0, len(overview_items), 2):
+        key = (await overview_items[i].text_content()).strip().lower().replace(' ', '_')
+        value = (await overview_items[i + 1].text_content()).strip() if i + 1 < len(overview_items) else "N/A"
+        overview[key] = value
+    company_info['overview'] = overview
+    logger.debug(f"Company overview: {overview}")
+    return company_info
+
+
+async def _extract_filing_history(page) -> List[Dict[str, Any]]:
+    return await page.eval_on_selector_all('table.full-width-table tbody tr', """
+        (rows) => rows.slice(0, 5).map(row => ({
+            date: row.querySelector('td:nth-child(1)').textContent.trim(),
+            description: row.querySelector('td:nth-child(2)').textContent.trim(),
+        }))
+    """)
+
+
+async def _extract_people(page) -> List[Dict[str, Any]]:
+    return await page.eval_on_selector_all('.appointment-1', """
+        (appointments) => appointments.slice(0, 5).map(app => ({
+            name: app.querySelector('h2').textContent.trim(),
+            role: app.querySelector('dd.appointment-content').textContent.trim(),
+        }))
+    """)
+
+
+async def _get_detailed_company_info(context, url: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
     logger.debug(f"Fetching detailed company info from URL: {url}")
     try:
-        page.goto(url)
-        page.wait_for_load_state('networkidle')
-
-        # Extract basic company information
-        company_info = {
-            "name": page.text_content('h1.heading-xlarge'),
-            "company_number": page.text_content('p.heading-secondary'),
-            "status": page.text_content('dd.company-status'),
-        }
-        logger.debug(f"Basic company info: {company_info}")
-
-        # Extract company overview
-        overview = {}
-        overview_items = page.query_selector_all('#company-overview dt, #company-overview dd')
-        for i in range(0, len(overview_items), 2):
-            key = overview_items[i].text_content().strip().lower().replace(' ', '_')
-            value = overview_items[i + 1].text_content().strip() if i + 1 < len(overview_items) else "N/A"
-            overview[key] = value
-        company_info['overview'] = overview
-        logger.debug(f"Company overview: {overview}")
-
-        # Extract filing history
-        logger.debug("Extracting filing history")
-        page.click('a[href$="/filing-history"]')
-        page.wait_for_load_state('networkidle')
-        filing_history = page.eval_on_selector_all('table.full-width-table tbody tr', """
-            (rows) => rows.slice(0, 5).map(row => ({
-                date: row.querySelector('td:nth-child(1)').textContent.trim(),
-                description: row.querySelector('td:nth-child(2)').textContent.trim(),
-            }))
-        """)
+        # The overview, filing history and officers pages are server rendered, so they are loaded side by
+        # side without waiting for the network to go idle
+        company_info, filing_history, people = await asyncio.gather(
+            _load_page(context, url, semaphore, _extract_overview),
+            _load_page(context, f"{url}/filing-history", semaphore, _extract_filing_history),
+            _load_page(context, f"{url}/officers", semaphore, _extract_people),
+        )
         company_info['filing_history'] = filing_history
         logger.debug(f"Filing history: {filing_history}")
-
-        # Extract people information
-        logger.debug("Extracting people information")
-        page.click('a[href$="/officers"]')
-        page.wait_for_load_state('networkidle')
-        people = page.eval_on_selector_all('.appointment-1', """
-            (appointments) => appointments.slice(0, 5).map(app => ({
-                name: app.querySelector('h2').textContent.trim(),
-                role: app.querySelector('dd.appointment-content').textContent.trim(),
-            }))
-        """)
         company_info['people'] = people
         logger.debug(f"People information: {people}")
 
@@ -70,52 +89,51 @@ def _format_json_response(data: Dict[str, Any]) -> str:
     return json.dumps(data, indent=2)
 
 
-@tool("advanced_company_search")
-def advanced_company_search(company_name: Optional[str] = None) -> str:
-    """
-    Performs an advanced search for UK company information, including detailed overviews, filing history, and people information.
-    """
+async def _advanced_company_search(company_name: Optional[str] = None, limit: int = COMPANY_SEARCH_RESULT_LIMIT) -> str:
     logger.info(f"Starting advanced company search for: {company_name}")
     if company_name is None:
         logger.warning("Company name is required but was not provided.")
         return _format_json_response({"error": "Company name is required."})
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
+    # An isolated context from the shared browser pool rather than launching a browser per search
+    async with browser_pool.context() as context:
+        # Images, fonts and trackers aren't needed for the text we extract
+        await apply_routing(context, get_fetch_profile("fast"))
+        page = await context.new_page()
 
         try:
             # Navigate to the search page
             logger.debug("Navigating to the search page")
-            page.goto("https://find-and-update.company-information.service.gov.uk/advanced-search")
+            await page.goto("https://find-and-update.company-information.service.gov.uk/advanced-search")
 
             # Fill in the search form
             logger.debug(f"Filling in search form with company name: {company_name}")
-            page.fill('input[name="companyNameIncludes"]', company_name)
+            await page.fill('input[name="companyNameIncludes"]', company_name)
 
             logger.debug("Clicking the search button")
-            page.click('button[id="advanced-search-button"]')
+            await page.click('button[id="advanced-search-button"]')
 
             # Wait for the results to load
             logger.debug("Waiting for search results")
-            page.wait_for_selector('.results-list', timeout=10000)
+            await page.wait_for_selector('.results-list', timeout=10000)
 
             # Extract company links
             logger.debug("Extracting company links from search results")
-            company_links = page.eval_on_selector_all('.results-list a[href^="/company/"]', """
+            company_links = await page.eval_on_selector_all('.results-list a[href^="/company/"]', """
                 (elements) => elements.map(el => ({
                     name: el.textContent.trim(),
                     url: el.href
                 }))
             """)
             logger.debug(f"Found {len(company_links)} company links")
+            company_links = company_links[:limit]
 
-            companies = []
-            for link in company_links:
-                logger.info(f"Fetching detailed information for company: {link['name']}")
-                company_info = _get_detailed_company_info(page, link['url'])
-                if company_info:
-                    companies.append(company_info)
+            # All results are fetched at once, with at most COMPANY_SEARCH_HOST_CONCURRENCY pages loading
+            semaphore = asyncio.Semaphore(COMPANY_SEARCH_HOST_CONCURRENCY)
+            logger.info(f"Fetching detailed information for {len(company_links)} companies")
+            results = await asyncio.gather(
+                *(_get_detailed_company_info(context, link['url'], semaphore) for link in company_links))
+            companies = [company_info for company_info in results if company_info]
 
             if companies:
                 logger.info(f"Successfully retrieved information for {len(companies)} companies")
@@ -131,8 +149,19 @@ def advanced_company_search(company_name: Optional[str] = None) -> str:
         except Exception as e:
             logger.error(f"An error occurred: {str(e)}")
             return _format_json_response({"error": f"An error occurred: {str(e)}"})
-        finally:
-            browser.close()
+
+
+def _advanced_company_search_sync(company_name: Optional[str] = None, limit: int = COMPANY_SEARCH_RESULT_LIMIT) -> str:
+    return browser_pool.run_sync(_advanced_company_search(company_name, limit))
+
+
+advanced_company_search = StructuredTool.from_function(
+    func=_advanced_company_search_sync,
+    coroutine=_advanced_company_search,
+    name="advanced_company_search",
+    description="Performs an advanced search for UK company information, including detailed overviews, filing history, and people information. "
+                "Details are fetched for at most limit matching companies.",
+)
 
 # Add the main method to test the advanced company search tool
 if __name__ == "__main__":
@@ -141,5 +170,5 @@ if __name__ == "__main__":
     
     test_company_name = "Incept5 Limited"
     print(f"Testing advanced company search for: {test_company_name}")
-    result = advanced_company_search(test_company_name)
+    result = advanced_company_search.invoke({"company_name": test_company_name})
     print(result)
\ No newline at end of file
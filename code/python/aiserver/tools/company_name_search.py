@@ -1,47 +1,47 @@
-import requests
 from bs4 import BeautifulSoup
+import asyncio
 import json
+import os
+from urllib.parse import urlparse
+from tools.http_cache import http_cache
 
-def search_company(company_name):
-    print(f"Searching for company: {company_name}")
-    url = "https://find-and-update.company-information.service.gov.uk/advanced-search/get-results?companyNameIncludes=" + company_name
-    print(f"Search URL: {url}")
-    response = requests.get(url)
-    print(f"Search request status code: {response.status_code}")
-    print(f"Search response content: {response.text}")
-    soup = BeautifulSoup(response.text, 'html.parser')
-    #print(soup)
+# How many search results have their details scraped, and how many requests run at once against one host
+COMPANY_SEARCH_RESULT_LIMIT = int(os.getenv("COMPANY_SEARCH_RESULT_LIMIT", "10"))
+COMPANY_SEARCH_HOST_CONCURRENCY = int(os.getenv("COMPANY_SEARCH_HOST_CONCURRENCY", "4"))
+COMPANY_SEARCH_TIMEOUT = float(os.getenv("COMPANY_SEARCH_TIMEOUT", "30"))
+
+COMPANIES_HOUSE_URL = "https://find-and-update.company-information.service.gov.uk"
+
+def search_url(company_name):
+    return f"{COMPANIES_HOUSE_URL}/advanced-search/get-results?companyNameIncludes={company_name}"
+
+def parse_search_results(html):
+    soup = BeautifulSoup(html, 'html.parser')
     active_companies = []
     for row in soup.select('tr.govuk-table__row'):
-        #print(row)
         status = row.select_one('.status')
         if status and status.text.strip() == 'Active':
             company_link = row.select_one('a')
             if company_link:
                 active_companies.append({
                     'name': company_link.text.strip(),
-                    'url': f"https://find-and-update.company-information.service.gov.uk{company_link['href']}"
+                    'url': f"{COMPANIES_HOUSE_URL}{company_link['href']}"
                 })
-    print(f"Found {len(active_companies)} active companies")
     return active_companies
 
-def scrape_company_details(company_url):
-    print(f"Scraping company details from: {company_url}")
-    response = requests.get(company_url)
-    print(f"Company details request status code: {response.status_code}")
-    soup = BeautifulSoup(response.text, 'html.parser')
+def parse_overview(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    value = soup.select_one('.govuk-summary-list__value')
+    value = value.text.strip() if value else None
     overview = {}
-    overview['registered_office_address'] = soup.select_one('.govuk-summary-list__value').text.strip()
-    overview['company_status'] = soup.select_one('.govuk-summary-list__value')
-    overview['company_type'] = soup.select_one('.govuk-summary-list__value')
-    overview['incorporated_on'] = soup.select_one('.govuk-summary-list__value')
-    print("Scraped overview details:", overview)
+    overview['registered_office_address'] = value
+    overview['company_status'] = value
+    overview['company_type'] = value
+    overview['incorporated_on'] = value
+    return overview
 
-    people_url = f"{company_url}/officers"
-    print(f"Scraping people details from: {people_url}")
-    people_response = requests.get(people_url)
-    print(f"People details request status code: {people_response.status_code}")
-    people_soup = BeautifulSoup(people_response.text, 'html.parser')
+def parse_officers(html):
+    people_soup = BeautifulSoup(html, 'html.parser')
     people = []
     for officer in people_soup.select('.officer-name-with-appointment-type'):
         person = {
@@ -49,30 +49,106 @@ def scrape_company_details(company_url):
             'role': officer.select_one('span').text.strip()
         }
         people.append(person)
+    return people
+
+def search_company(company_name):
+    print(f"Searching for company: {company_name}")
+    url = search_url(company_name)
+    print(f"Search URL: {url}")
+    response = http_cache.get(url, timeout=COMPANY_SEARCH_TIMEOUT)
+    print(f"Search request status code: {response.status_code}")
+    active_companies = parse_search_results(response.text)
+    print(f"Found {len(active_companies)} active companies")
+    return active_companies
+
+def scrape_company_details(company_url):
+    print(f"Scraping company details from: {company_url}")
+    response = http_cache.get(company_url, timeout=COMPANY_SEARCH_TIMEOUT)
+    print(f"Company details request status code: {response.status_code}")
+    overview = parse_overview(response.text)
+    print("Scraped overview details:", overview)
+
+    people_url = f"{company_url}/officers"
+    print(f"Scraping people details from: {people_url}")
+    people_response = http_cache.get(people_url, timeout=COMPANY_SEARCH_TIMEOUT)
+    print(f"People details request status code: {people_response.status_code}")
+    people = parse_officers(people_response.text)
     print(f"Scraped {len(people)} people")
     return {
         'overview': overview,
         'people': people
     }
 
+class HostLimiter:
+    """
+    Caps the requests in flight per host, so scraping many results at once doesn't hammer one site.
+    """
+
+    def __init__(self, concurrency=COMPANY_SEARCH_HOST_CONCURRENCY):
+        self.concurrency = concurrency
+        self.semaphores = {}
+
+    def limit(self, url):
+        host = urlparse(url).hostname
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self.semaphores[host]
+
+async def afetch(url, limiter):
+    async with limiter.limit(url):
+        # The shared pooled client through the HTTP cache, so connections are reused across requests
+        response = await http_cache.aget(url, timeout=COMPANY_SEARCH_TIMEOUT)
+    print(f"Fetched {url}: {response.status_code}")
+    return response
+
+async def asearch_company(company_name, limiter=None):
+    limiter = limiter or HostLimiter()
+    response = await afetch(search_url(company_name), limiter)
+    active_companies = parse_search_results(response.text)
+    print(f"Found {len(active_companies)} active companies")
+    return active_companies
+
+async def ascrape_company_details(company_url, limiter=None):
+    limiter = limiter or HostLimiter()
+    # The overview and officers pages are independent, so they're fetched at the same time
+    response, people_response = await asyncio.gather(
+        afetch(company_url, limiter),
+        afetch(f"{company_url}/officers", limiter),
+    )
+    return {
+        'overview': parse_overview(response.text),
+        'people': parse_officers(people_response.text)
+    }
+
+async def ascrape_companies(company_name, limit=COMPANY_SEARCH_RESULT_LIMIT):
+    """
+    Search for the company and scrape the details of up to limit active results concurrently, taking about
+    as long as the slowest page rather than the sum of them.
+
+    :param company_name: The company name to search for
+    :param limit: The maximum number of search results to scrape
+    :return: The active companies with their overview and people
+    """
+    limiter = HostLimiter()
+    active_companies = (await asearch_company(company_name, limiter))[:limit]
+    details = await asyncio.gather(*(ascrape_company_details(company['url'], limiter) for company in active_companies))
+    return {
+        'active_companies': [
+            {
+                'name': company['name'],
+                'overview': company_details['overview'],
+                'people': company_details['people']
+            }
+            for company, company_details in zip(active_companies, details)
+        ]
+    }
+
 def main():
     company_name = "Incept5 Limited"
     print(f"Starting search for: {company_name}")
-    active_companies = search_company(company_name)
-    result = {
-        'active_companies': []
-    }
-    for company in active_companies:
-        print(f"Processing company: {company['name']}")
-        details = scrape_company_details(company['url'])
-        company_data = {
-            'name': company['name'],
-            'overview': details['overview'],
-            'people': details['people']
-        }
-        result['active_companies'].append(company_data)
+    result = asyncio.run(ascrape_companies(company_name))
     print("Final result:")
     print(json.dumps(result, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
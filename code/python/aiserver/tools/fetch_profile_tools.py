@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Optional, Sequence
+from urllib.parse import urlparse
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun
+from langchain_community.tools.playwright.base import BaseBrowserTool
+from langchain_community.tools.playwright.click import ClickTool
+from langchain_community.tools.playwright.current_page import CurrentWebPageTool
+from langchain_community.tools.playwright.extract_hyperlinks import ExtractHyperlinksTool
+from langchain_community.tools.playwright.extract_text import ExtractTextTool
+from langchain_community.tools.playwright.get_elements import GetElementsTool
+from langchain_community.tools.playwright.navigate import NavigateTool
+from langchain_community.tools.playwright.navigate_back import NavigateBackTool
+from langchain_community.tools.playwright.utils import aget_current_page
+from toolkits.fetch_profiles import FetchState, apply_routing, fetch_static, get_fetch_profile
+from tools.web_fill_tool import FillTool
+from utils.debug_utils import debug_print
+
+
+class FetchProfileBrowserTool(BaseBrowserTool):
+    """
+    Base for the browser tools which load pages according to a FetchProfile (async only, the sync tools
+    behave as before). The tools of a toolkit share a FetchState, so a page fetched over plain HTTP by
+    navigate_browser is what extract_text etc. read, and it is loaded in the browser when a tool needs
+    a real page.
+    """
+
+    fetch_profile: Any = None
+    fetch_state: Any = None
+
+    @property
+    def profile(self):
+        return get_fetch_profile(self.fetch_profile)
+
+    @property
+    def state(self) -> FetchState:
+        if self.fetch_state is None:
+            self.fetch_state = FetchState()
+        return self.fetch_state
+
+    async def browser_page(self):
+        """
+        The browser's current page, with the profile's request blocking. A current static page is loaded in
+        the browser first.
+        """
+        page = await aget_current_page(self.async_browser)
+        await apply_routing(page.context, self.profile)
+        static_page = self.state.static_page
+        if static_page is not None:
+            debug_print(f"Loading {static_page.url} in the browser for {self.name}")
+            self.state.static_page = None
+            self.state.escalations += 1
+            await page.goto(static_page.url, wait_until=self.profile.wait_until, timeout=self.profile.timeout * 1000)
+        return page
+
+    async def navigate(self, url: str) -> str:
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ("http", "https"):
+            raise ValueError("URL scheme must be 'http' or 'https'")
+
+        profile = self.profile
+        if profile.http_first:
+            static_page = await fetch_static(url, profile)
+            if static_page is not None:
+                self.state.static_page = static_page
+                self.state.history.append(static_page.url)
+                self.state.http_fetches += 1
+                return f"Navigating to {url} returned status code {static_page.status}"
+
+        self.state.static_page = None
+        self.state.history.clear()
+        page = await aget_current_page(self.async_browser)
+        await apply_routing(page.context, profile)
+        response = await page.goto(url, wait_until=profile.wait_until, timeout=profile.timeout * 1000)
+        status = response.status if response else "unknown"
+        return f"Navigating to {url} returned status code {status}"
+
+
+class ProfiledNavigateTool(FetchProfileBrowserTool, NavigateTool):
+    async def _arun(self, url: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        return await self.navigate(url)
+
+
+class ProfiledNavigateBackTool(FetchProfileBrowserTool, NavigateBackTool):
+    async def _arun(self, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        if self.state.static_page is None:
+            return await super()._arun(run_manager=run_manager)
+        if len(self.state.history) < 2:
+            return "Unable to navigate back; no previous page in the history"
+        self.state.history.pop()
+        url = self.state.history.pop()
+        result = await self.navigate(url)
+        return f"Navigated back to the previous page with URL '{url}'. {result}"
+
+
+class ProfiledExtractTextTool(FetchProfileBrowserTool, ExtractTextTool):
+    async def _arun(self, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        if self.state.static_page is not None:
+            return self.state.static_page.text()
+        # The rendered text, rather than serialising and re-parsing the whole DOM
+        page = await self.browser_page()
+        return await page.evaluate("() => document.body ? document.body.innerText : ''")
+
+
+class ProfiledExtractHyperlinksTool(FetchProfileBrowserTool, ExtractHyperlinksTool):
+    async def _arun(self, absolute_urls: bool = False,
+                    run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        static_page = self.state.static_page
+        if static_page is not None:
+            return self.scrape_page(static_page, static_page.html, absolute_urls)
+        await self.browser_page()
+        return await super()._arun(absolute_urls=absolute_urls, run_manager=run_manager)
+
+
+class ProfiledGetElementsTool(FetchProfileBrowserTool, GetElementsTool):
+    async def _arun(self, selector: str, attributes: Sequence[str] = ["innerText"],
+                    run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        static_page = self.state.static_page
+        if static_page is not None:
+            try:
+                elements = static_page.soup.select(selector)
+            except Exception:
+                # Playwright-only selector syntax (text=, >> etc.)
+                elements = None
+            if elements is not None:
+                results = []
+                for element in elements:
+                    result = {}
+                    for attribute in attributes:
+                        if attribute == "innerText":
+                            value = element.get_text(" ", strip=True)
+                        else:
+                            value = element.get(attribute)
+                            value = " ".join(value) if isinstance(value, list) else value
+                        if value is not None and value.strip() != "":
+                            result[attribute] = value
+                    if result:
+                        results.append(result)
+                return json.dumps(results, ensure_ascii=False)
+        await self.browser_page()
+        return await super()._arun(selector, attributes, run_manager=run_manager)
+
+
+class ProfiledCurrentWebPageTool(FetchProfileBrowserTool, CurrentWebPageTool):
+    async def _arun(self, run_manager: Optional[AsyncCallbackManagerForToolRun] = None) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        if self.state.static_page is not None:
+            return self.state.static_page.url
+        return await super()._arun(run_manager=run_manager)
+
+
+class ProfiledClickTool(FetchProfileBrowserTool, ClickTool):
+    async def _arun(self, *args: Any, **kwargs: Any) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        await self.browser_page()
+        return await super()._arun(*args, **kwargs)
+
+
+class ProfiledFillTool(FetchProfileBrowserTool, FillTool):
+    async def _arun(self, *args: Any, **kwargs: Any) -> str:
+        if self.async_browser is None:
+            raise ValueError(f"Asynchronous browser not provided to {self.name}")
+        await self.browser_page()
+        return await super()._arun(*args, **kwargs)
@@ -0,0 +1,309 @@
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from llms.http_clients import get_async_http_client, get_http_client
+from utils.debug_utils import debug_print
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "/data/http_cache/http_cache.sqlite")
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+HTTP_CACHE_DEFAULT_TTL = float(os.getenv("HTTP_CACHE_DEFAULT_TTL", "3600"))
+# Per domain TTLs in seconds, e.g. "find-and-update.company-information.service.gov.uk=86400,*.example.com=60"
+HTTP_CACHE_TTLS = os.getenv("HTTP_CACHE_TTLS", "")
+# cache: normal caching, record: also save every response as a fixture, replay: only serve fixtures (offline)
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "cache").lower()
+HTTP_FIXTURES_PATH = os.getenv("HTTP_FIXTURES_PATH", "/data/http_cache/fixtures.sqlite")
+
+
+class HTTPCacheMiss(httpx.HTTPError):
+    """
+    Raised in replay mode for a request which has no recorded fixture.
+    """
+
+    def __init__(self, url: str):
+        super().__init__(f"No recorded fixture for {url} (HTTP_CACHE_MODE=replay)")
+
+
+def parse_ttls(ttls: str) -> List[Tuple[str, float]]:
+    parsed = []
+    for entry in ttls.split(","):
+        domain, _, ttl = entry.strip().partition("=")
+        if domain and ttl:
+            parsed.append((domain.strip().lower(), float(ttl)))
+    return parsed
+
+
+class HTTPCacheStore:
+    """
+    Persistent store of GET responses in SQLite, keyed by URL and the values of the request headers the
+    response varies on.
+
+    Each URL's Vary header names are kept alongside, so the key for the next request can be built before
+    the response is known. With max_bytes set, the least recently used responses are evicted once the
+    stored bodies grow beyond it.
+    """
+
+    # How many writes between checks of the cache size
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        """
+        :param path: The SQLite database path
+        :param max_bytes: Size cap for the stored bodies, 0 to never evict (fixtures)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = None
+        self.writes_since_check = 0
+        self.evicted = 0
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self.conn is None:
+            debug_print(f"Opening HTTP cache: {self.path}")
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    stored_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS vary (url TEXT PRIMARY KEY, headers TEXT NOT NULL)")
+            self.conn.commit()
+        return self.conn
+
+    def make_key(self, url: str, request_headers: Mapping[str, str]) -> str:
+        with self.lock:
+            row = self.get_connection().execute("SELECT headers FROM vary WHERE url = ?", (url,)).fetchone()
+        vary = json.loads(row[0]) if row else []
+        values = [f"{name}={request_headers.get(name, '')}" for name in vary]
+        return hashlib.sha256("\0".join([url] + values).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            conn = self.get_connection()
+            row = conn.execute("SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        return {"url": row[0], "status": row[1], "headers": json.loads(row[2]), "body": row[3], "stored_at": row[4]}
+
+    def put(self, url: str, request_headers: Mapping[str, str], response: httpx.Response) -> bool:
+        """
+        :return: Whether the response could be stored (not for Vary: *)
+        """
+        vary = sorted({name.strip().lower() for name in response.headers.get("vary", "").split(",") if name.strip()})
+        if "*" in vary:
+            return False
+        now = time.time()
+        with self.lock:
+            conn = self.get_connection()
+            conn.execute("INSERT OR REPLACE INTO vary VALUES (?, ?)", (url, json.dumps(vary)))
+            conn.commit()
+        key = self.make_key(url, request_headers)
+        # The body is stored decoded, so the encoding headers no longer apply
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        with self.lock:
+            conn = self.get_connection()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, str(response.url), response.status_code, json.dumps(headers), response.content, now, now))
+            conn.commit()
+            self.writes_since_check += 1
+            if self.max_bytes and self.writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+                self.writes_since_check = 0
+                self._evict()
+        return True
+
+    def touch(self, key: str):
+        # A 304 revalidation makes the stored response fresh again
+        with self.lock:
+            conn = self.get_connection()
+            now = time.time()
+            conn.execute("UPDATE responses SET stored_at = ?, last_used = ? WHERE key = ?", (now, now, key))
+            conn.commit()
+
+    def clear(self):
+        with self.lock:
+            conn = self.get_connection()
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM vary")
+            conn.commit()
+
+    def _evict(self):
+        conn = self.conn
+        total_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+        if total_bytes > self.max_bytes:
+            # Evict down to 90% of the limit so we don't evict again on the next write
+            target = int(self.max_bytes * 0.9)
+            keys = []
+            for key, size in conn.execute("SELECT key, LENGTH(body) FROM responses ORDER BY last_used"):
+                if total_bytes <= target:
+                    break
+                keys.append((key,))
+                total_bytes -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+            self.evicted += len(keys)
+            debug_print(f"Evicted {len(keys)} entries from the HTTP cache")
+        conn.commit()
+
+
+class HTTPCache:
+    """
+    Caching GET for the scraping tools, on the shared HTTP clients.
+
+    Cached responses are served while younger than their domain's TTL. Stale ones with an ETag or
+    Last-Modified are revalidated with a conditional GET, and a 304 serves the stored body. Only successful
+    responses are cached. In record mode every response is also saved to the fixture store, which replay
+    mode serves exclusively so bots can be run and benchmarked offline.
+    """
+
+    def __init__(self, store: Optional[HTTPCacheStore] = None, fixtures: Optional[HTTPCacheStore] = None,
+                 enabled: bool = HTTP_CACHE_ENABLED, mode: str = HTTP_CACHE_MODE,
+                 default_ttl: float = HTTP_CACHE_DEFAULT_TTL, ttls: str = HTTP_CACHE_TTLS):
+        if mode not in ("cache", "record", "replay"):
+            raise ValueError(f"Unsupported HTTP cache mode: {mode}")
+        self.store = store or HTTPCacheStore(HTTP_CACHE_PATH, HTTP_CACHE_MAX_MB * 1024 * 1024)
+        self.fixtures = fixtures or HTTPCacheStore(HTTP_FIXTURES_PATH)
+        self.enabled = enabled
+        self.mode = mode
+        self.default_ttl = default_ttl
+        self.ttls = parse_ttls(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.replayed = 0
+        self.recorded = 0
+
+    def get_ttl(self, url: str) -> float:
+        host = (urlparse(url).hostname or "").lower()
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatch(host, pattern):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def to_response(url: str, cached: Dict[str, Any], from_cache: str) -> httpx.Response:
+        return httpx.Response(cached["status"], headers=cached["headers"], content=cached["body"],
+                              request=httpx.Request("GET", cached["url"] or url),
+                              extensions={"from_cache": from_cache})
+
+    @staticmethod
+    def normalize_headers(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+        return {name.lower(): value for name, value in (headers or {}).items()}
+
+    def lookup(self, url: str, headers: Dict[str, str]) -> Tuple[Optional[httpx.Response], Dict[str, str], Optional[str]]:
+        """
+        :return: A fresh cached response if there is one, otherwise the conditional request headers for the
+                 stale entry and its key
+        """
+        if self.mode == "replay":
+            cached = self.fixtures.get(self.fixtures.make_key(url, headers))
+            if cached is None:
+                raise HTTPCacheMiss(url)
+            self.replayed += 1
+            return self.to_response(url, cached, "fixture"), {}, None
+
+        if not self.enabled:
+            return None, {}, None
+        key = self.store.make_key(url, headers)
+        cached = self.store.get(key)
+        if cached is None:
+            self.misses += 1
+            return None, {}, None
+        if time.time() - cached["stored_at"] < self.get_ttl(url):
+            self.hits += 1
+            response = self.to_response(url, cached, "hit")
+            self.record(url, headers, response)
+            return response, {}, None
+
+        cached_headers = {name.lower(): value for name, value in cached["headers"].items()}
+        conditional = {}
+        if "etag" in cached_headers:
+            conditional["if-none-match"] = cached_headers["etag"]
+        if "last-modified" in cached_headers:
+            conditional["if-modified-since"] = cached_headers["last-modified"]
+        self.misses += 1
+        return None, conditional, key if conditional else None
+
+    def handle_response(self, url: str, headers: Dict[str, str], response: httpx.Response,
+                        stale_key: Optional[str]) -> httpx.Response:
+        if response.status_code == 304 and stale_key is not None:
+            self.store.touch(stale_key)
+            cached = self.store.get(stale_key)
+            if cached is not None:
+                self.revalidated += 1
+                response = self.to_response(url, cached, "revalidated")
+        elif self.enabled and response.is_success and "no-store" not in response.headers.get("cache-control", ""):
+            self.store.put(url, headers, response)
+
+        self.record(url, headers, response)
+        return response
+
+    def record(self, url: str, headers: Dict[str, str], response: httpx.Response):
+        if self.mode == "record" and self.fixtures.put(url, headers, response):
+            self.recorded += 1
+
+    def get(self, url: str, headers: Optional[Mapping[str, str]] = None, **kwargs: Any) -> httpx.Response:
+        """
+        GET the URL through the cache.
+
+        :param url: The URL
+        :param headers: Request headers, those named in the response's Vary header are part of the key
+        :param kwargs: Other httpx request options, e.g. timeout
+        :return: The response, with extensions["from_cache"] set to hit, revalidated or fixture when cached
+        """
+        headers = self.normalize_headers(headers)
+        cached, conditional, stale_key = self.lookup(url, headers)
+        if cached is not None:
+            return cached
+        kwargs.setdefault("follow_redirects", True)
+        response = get_http_client().get(url, headers={**headers, **conditional}, **kwargs)
+        return self.handle_response(url, headers, response, stale_key)
+
+    async def aget(self, url: str, headers: Optional[Mapping[str, str]] = None, **kwargs: Any) -> httpx.Response:
+        """
+        Async version of get, the SQLite work runs in a worker thread.
+        """
+        headers = self.normalize_headers(headers)
+        cached, conditional, stale_key = await asyncio.to_thread(self.lookup, url, headers)
+        if cached is not None:
+            return cached
+        kwargs.setdefault("follow_redirects", True)
+        response = await get_async_http_client().get(url, headers={**headers, **conditional}, **kwargs)
+        await response.aread()
+        return await asyncio.to_thread(self.handle_response, url, headers, response, stale_key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "revalidated": self.revalidated,
+            "evicted": self.store.evicted,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+        }
+
+
+http_cache = HTTPCache()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Iterator
+from utils.debug_utils import debug_print
+
+# Bounded pool used to run blocking generators (e.g. sync bots) off the event loop
+SYNC_BOT_MAX_WORKERS = int(os.getenv("SYNC_BOT_MAX_WORKERS", "8"))
+sync_executor = ThreadPoolExecutor(max_workers=SYNC_BOT_MAX_WORKERS, thread_name_prefix="sync-bot")
+
+_DONE = object()
+
+
+class _GeneratorError:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+async def iterate_in_thread(generator_factory: Callable[[], Iterator[Any]],
+                            executor: ThreadPoolExecutor = sync_executor) -> AsyncGenerator[Any, None]:
+    """
+    Drive a blocking generator in a worker thread and yield its items on the event loop.
+
+    Items are pumped back through an asyncio.Queue. If the consumer stops early (e.g. the client
+    disconnected and the response was cancelled) the worker is told to stop before pulling the next item
+    and the generator is closed in the worker thread.
+
+    :param generator_factory: A callable returning the blocking generator, called inside the worker thread
+    :param executor: The thread pool to run the generator in
+    :return: An async generator of the items produced by the blocking generator
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop has already been closed (e.g. during shutdown)
+            cancelled.set()
+
+    def run():
+        generator = None
+        try:
+            generator = generator_factory()
+            for item in generator:
+                if cancelled.is_set():
+                    debug_print("Consumer went away, stopping blocking generator")
+                    break
+                put(item)
+        except BaseException as e:
+            put(_GeneratorError(e))
+        finally:
+            if generator is not None and hasattr(generator, "close"):
+                generator.close()
+            put(_DONE)
+
+    worker = loop.run_in_executor(executor, run)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _GeneratorError):
+                raise item.exception
+            yield item
+    finally:
+        cancelled.set()
+        if not worker.done():
+            # Don't wait for the worker, it will stop as soon as its current blocking call returns
+            worker.add_done_callback(lambda f: f.exception())
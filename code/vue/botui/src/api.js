@@ -65,7 +65,8 @@ export const sendMessage = async (bot, message, llmProvider, llmModel, threadId)
           config: {
             llm_provider: llmProvider,
             llm_model: llmModel,
-            thread_id: threadId
+            thread_id: threadId,
+            stream_tokens: true
           }
         }),
       }